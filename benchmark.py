@@ -0,0 +1,689 @@
+"""Замеры производительности базы данных и обновления списков ToDoApp.
+
+Каждый замер выполняется на временной базе; рабочий tasks.db не затрагивается.
+
+Запуск:
+    python benchmark.py suite                               # 1k/10k/100k задач, JSON в stdout
+    python benchmark.py suite --sizes 1000 10000 --output results.json
+    python benchmark.py suite --baseline benchmark_baseline.json
+    python benchmark.py profiles                            # сравнение профилей хранения
+    python benchmark.py startup                             # запуск main.py до первого кадра
+    python benchmark.py startup --command dist/main         # то же для сборки PyInstaller
+    python benchmark.py server                              # нагрузка на HTTP API (server.py)
+
+С --baseline код возврата равен 1, если какой-либо замер стал медленнее
+базового больше чем на --tolerance (по умолчанию 25%). startup возвращает 1,
+если медиана запуска превышает цели STARTUP_TARGETS. server возвращает 1,
+если какой-либо запрос или прямая запись в базу во время нагрузки
+завершились ошибкой или подписчик /events получил не все уведомления.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import shlex
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+from urllib.parse import quote
+
+import db
+import recurrence
+import server
+
+
+@contextmanager
+def temporary_database(profile=None, name="benchmark.db"):
+    """Создает пустую временную базу и делает её текущей для db."""
+    saved_file, saved_profile = db.DB_FILE, db.STORAGE_PROFILE
+    with tempfile.TemporaryDirectory() as directory:
+        db.close_connections()
+        db.DB_FILE = os.path.join(directory, name)
+        if profile is not None:
+            db.STORAGE_PROFILE = profile
+        try:
+            # Сообщения о создании таблиц не нужны в выводе замеров
+            with redirect_stdout(io.StringIO()):
+                db.create_tables()
+            yield db.DB_FILE
+        finally:
+            db.close_connections()
+            db.DB_FILE, db.STORAGE_PROFILE = saved_file, saved_profile
+
+
+def timed(func, *args):
+    """Возвращает время выполнения func(*args) в секундах."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+# Слова синтетических описаний; частые и редкие слова дают разные по
+# размеру результаты поиска
+WORDS = [
+    "отчет", "встреча", "проект", "бюджет", "клиент", "договор", "релиз",
+    "ревью", "план", "звонок", "письмо", "презентация", "исследование",
+    "тестирование", "документация", "оплата", "поставка", "собеседование",
+]
+
+# (метка, строка поиска): частое слово, редкое сочетание, слово только из
+# подзадач, отсутствующее слово
+SEARCH_TERMS = [
+    ("common", "отчет"),
+    ("rare", "бюджет договор"),
+    ("subtasks", "черновик"),
+    ("missing", "несуществующее"),
+]
+
+# Дедлайн, относительно которого треть задач просрочена
+NOW = 2524608000  # 2050-01-01 UTC
+
+
+def synthetic_tasks(count, fanout, seed=0):
+    """Данные для db.add_tasks.
+
+    Число подзадач задачи случайно от 0 до 2 * fanout (в среднем fanout);
+    треть задач просрочена относительно NOW, у части дедлайна нет.
+    """
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(count):
+        description = " ".join(rng.sample(WORDS, rng.randint(2, 4))) + f" {i}"
+        roll = rng.random()
+        if roll < 1 / 3:
+            deadline = 946684800  # 2000-01-01 UTC
+        elif roll < 0.9:
+            deadline = 4070908800  # 2099-01-01 UTC
+        else:
+            deadline = None
+        subtasks = [
+            f"{rng.choice(WORDS)} шаг {j}" + (" черновик" if j == 0 and i % 50 == 0 else "")
+            for j in range(rng.randint(0, 2 * fanout))
+        ]
+        tasks.append((description, deadline, subtasks))
+    return tasks
+
+
+def seed_database(count, fanout, done_share=0.2):
+    """Наполняет текущую базу и отмечает часть задач выполненными."""
+    rows = db.add_tasks(synthetic_tasks(count, fanout))
+    done = [row[0] for row in rows[:int(count * done_share)]]
+    db.update_tasks_status(done, 1)
+
+
+def best_of(repeat, func, *args):
+    """Медиана времени нескольких запусков func(*args), в секундах."""
+    return statistics.median(timed(func, *args) for _ in range(repeat))
+
+
+def write_one_by_one(count):
+    for i in range(count):
+        db.add_task(f"Запись {i}", None)
+
+
+def read_during_writes(writes):
+    """Считает чтения, которые успел выполнить другой поток, пока шла запись."""
+    done = threading.Event()
+    reads = []
+
+    def reader():
+        while not done.is_set():
+            db.load_tasks()
+            reads.append(1)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        elapsed = timed(write_one_by_one, writes)
+    finally:
+        done.set()
+        thread.join()
+    return elapsed, len(reads)
+
+
+def bench_profile(profile, writes, dataset):
+    """Замеры одного профиля хранения; время в секундах."""
+    with temporary_database(profile):
+        results = {"profile": profile, "settings": db.storage_settings()}
+        results["single_writes_per_s"] = writes / timed(write_one_by_one, writes)
+        results["bulk_insert_s"] = timed(db.add_tasks, synthetic_tasks(dataset, 3))
+        load_s = min(timed(db.load_tasks_with_subtasks) for _ in range(5))
+        results["load_with_subtasks_s"] = load_s
+        elapsed, reads = read_during_writes(writes)
+        results["reads_per_s_during_writes"] = reads / elapsed
+        return results
+
+
+def run_profiles(args):
+    rows = [bench_profile(profile, args.writes, args.dataset) for profile in db.STORAGE_PROFILES]
+    columns = [
+        ("profile", "профиль", "{}"),
+        ("single_writes_per_s", "запись/с", "{:.0f}"),
+        ("bulk_insert_s", f"пакет {args.dataset}, с", "{:.3f}"),
+        ("load_with_subtasks_s", "загрузка, с", "{:.3f}"),
+        ("reads_per_s_during_writes", "чтений/с при записи", "{:.0f}"),
+    ]
+    widths = [max(len(title), 10) for _, title, _ in columns]
+    print("  ".join(title.ljust(width) for (_, title, _), width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(
+            fmt.format(row[key]).ljust(width) for (key, _, fmt), width in zip(columns, widths)
+        ))
+    print("\nДействующие PRAGMA:")
+    for row in rows:
+        settings = ", ".join(f"{pragma}={value}" for pragma, value in row["settings"].items())
+        print(f"  {row['profile']}: {settings}")
+    return 0
+
+
+def bench_database(count, fanout, repeat):
+    """Замеры функций db на наборе из count задач."""
+    results = {}
+    tasks = synthetic_tasks(count, fanout, seed=1)
+    results["seed_s"] = timed(seed_database, count, fanout)
+    results["bulk_insert_1000_s"] = timed(db.add_tasks, tasks[:1000])
+    results["load_tasks_s"] = best_of(repeat, db.load_tasks)
+    results["load_tasks_with_subtasks_s"] = best_of(repeat, db.load_tasks_with_subtasks)
+    results["check_overdue_tasks_s"] = best_of(repeat, db.check_overdue_tasks, NOW)
+    for label, term in SEARCH_TERMS:
+        results[f"search_tasks_{label}_s"] = best_of(repeat, db.search_tasks, term)
+    results["complete_recurring_1000_s"] = timed(db.update_tasks_status, make_recurring(1000), 1)
+    return results
+
+
+def make_recurring(count):
+    """Делает ежедневными count невыполненных задач с дедлайном и возвращает их ID."""
+    with db.transaction() as conn:
+        task_ids = [row[0] for row in conn.execute("""
+            SELECT id FROM tasks WHERE status = 0 AND deadline IS NOT NULL LIMIT ?
+        """, (count,))]
+        conn.executemany(
+            "UPDATE tasks SET recurrence = ? WHERE id = ?",
+            [(recurrence.DAILY, task_id) for task_id in task_ids]
+        )
+    return task_ids
+
+
+def bench_ui(repeat):
+    """Замеры ToDoApp на текущей базе под платформой Qt offscreen."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+
+    app = QApplication.instance() or QApplication(["benchmark"])
+    # Предупреждения о просроченных задачах не должны ждать нажатия кнопки
+    saved_warning = QMessageBox.warning
+    QMessageBox.warning = lambda *args, **kwargs: QMessageBox.Ok
+    try:
+        from ui import ToDoApp
+
+        loop = QEventLoop()
+        timeout = QTimer()
+        timeout.setSingleShot(True)
+        timeout.timeout.connect(loop.quit)
+
+        def wait_loaded():
+            timeout.start(600000)
+            loop.exec_()
+            timeout.stop()
+
+        results = {}
+        start = time.perf_counter()
+        window = ToDoApp()
+        window.tasksLoaded.connect(loop.quit)
+        # Задачи начинают загружаться после первого кадра окна
+        window.show()
+        wait_loaded()
+        results["todoapp_startup_s"] = time.perf_counter() - start
+        try:
+            def reload():
+                window.load_tasks()
+                wait_loaded()
+
+            results["todoapp_load_tasks_s"] = best_of(repeat, reload)
+            results["todoapp_show_all_tasks_s"] = best_of(repeat, window.show_all_tasks)
+            # Отрисовка видимых строк списка: делегат рисует задачи и иконки
+            viewport = window.incomplete_task_list.viewport()
+            app.processEvents()  # отложенная раскладка строк после show_all_tasks
+            results["todoapp_paint_list_s"] = best_of(repeat, viewport.grab)
+        finally:
+            window.shutdown()
+            window.deleteLater()
+            app.processEvents()
+        return results
+    finally:
+        QMessageBox.warning = saved_warning
+
+
+# Цели запуска main.py из исходников на наборе startup (по умолчанию 10k задач),
+# в секундах от старта процесса: первый кадр окна и загруженные задачи
+STARTUP_TARGETS = {"first_frame_s": 0.5, "interactive_s": 1.0}
+
+
+def launch(command, directory):
+    """Запускает приложение с --startup-report в каталоге с tasks.db.
+
+    Возвращает время от запуска процесса до первого кадра и до загрузки задач.
+    """
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.time()
+    completed = subprocess.run(
+        command + ["--startup-report"], cwd=directory, env=env,
+        capture_output=True, text=True, timeout=120,
+    )
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(
+            f"Приложение не сообщило о запуске (код {completed.returncode}):\n"
+            f"{completed.stdout}{completed.stderr}"
+        )
+    report = json.loads(lines[-1])
+    return {
+        "first_frame_s": report["first_frame"] - start,
+        "interactive_s": report["interactive"] - start,
+    }
+
+
+def run_startup(args):
+    if args.command:
+        command = shlex.split(args.command)
+    else:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")]
+    targets = {"first_frame_s": args.first_frame_target, "interactive_s": args.interactive_target}
+
+    with temporary_database(name="tasks.db") as path:
+        seed_database(args.tasks, 3)
+        # Приложение откроет базу само: закрываем соединения, чтобы сбросить WAL
+        db.close_connections()
+        # Первый запуск прогревает файловый кэш и не учитывается
+        launch(command, os.path.dirname(path))
+        runs = [launch(command, os.path.dirname(path)) for _ in range(args.repeat)]
+
+    results = {metric: statistics.median(run[metric] for run in runs) for metric in targets}
+    print(json.dumps({"command": command, "tasks": args.tasks, "results": results}, indent=2))
+    failed = False
+    for metric, target in targets.items():
+        ok = results[metric] <= target
+        failed = failed or not ok
+        print(f"{metric:<16} {results[metric]:8.3f} с  цель {target:.3f} с  {'ok' if ok else 'ПРЕВЫШЕНО'}",
+              file=sys.stderr)
+    return 1 if failed else 0
+
+
+# --- Нагрузочный тест HTTP API (server.py) ---
+
+# Доли запросов в смеси нагрузки: (вид, вес)
+SERVER_MIX = [("list", 45), ("get", 15), ("search", 10), ("add", 20), ("complete", 10)]
+
+
+class ApiClient:
+    """Клиент HTTP/1.1 с одним переиспользуемым соединением (keep-alive)."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+
+    async def request(self, method, path, body=None):
+        data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode()
+        head = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(data)}\r\n"
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        self.writer.write(head.encode() + b"\r\n" + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        payload = await self.reader.readexactly(length) if length else b""
+        return status, json.loads(payload) if payload else None
+
+    def close(self):
+        self.writer.close()
+
+
+def start_server(path):
+    """Запускает сервер на базе path в отдельном процессе; возвращает (процесс, порт)."""
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"),
+               "--db", path, "serve", "--port", "0"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith("API задач:"):
+            return process, int(line.rsplit(":", 1)[1])
+    process.wait()
+    raise RuntimeError(f"Сервер не запустился (код {process.returncode})")
+
+
+async def count_events(port, counts, ready):
+    """Подписывается на /events и считает события по видам."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+    await writer.drain()
+    ready.set()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"event: "):
+                name = line[7:].strip().decode()
+                counts[name] = counts.get(name, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load_client(port, requests, seed, latencies, errors):
+    """Выполняет requests запросов смеси SERVER_MIX через одно соединение."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*SERVER_MIX)
+    client = ApiClient(port)
+    await client.connect()
+    added = []
+    cursor = None
+    try:
+        for _ in range(requests):
+            kind = rng.choices(kinds, weights)[0]
+            if kind == "list":
+                # Листаем страницы дальше, пока они не кончатся
+                path = "/tasks?limit=50" + (f"&after={cursor}" if cursor else "")
+                call = ("GET", path, None)
+            elif kind == "get":
+                call = ("GET", f"/tasks/{rng.randint(1, 1000)}", None)
+            elif kind == "search":
+                call = ("GET", f"/search?q={quote(rng.choice(SEARCH_TERMS)[1])}&limit=50", None)
+            elif kind == "add" or not added:
+                kind = "add"
+                call = ("POST", "/tasks", {"description": f"{rng.choice(WORDS)} через API",
+                                           "deadline": NOW, "subtasks": ["шаг"]})
+            else:
+                call = ("PATCH", f"/tasks/{added.pop()}", {"status": 1})
+            start = time.perf_counter()
+            status, payload = await client.request(*call)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            if status >= 300 and status != 404:
+                errors.append((call[0], call[1], status, payload))
+            elif kind == "list":
+                cursor = payload["next"]
+            elif kind == "add":
+                added.append(payload["id"])
+    finally:
+        client.close()
+
+
+def write_alongside(done, counts):
+    """Пишет в базу напрямую, как окно приложения, пока идет нагрузка."""
+    while not done.is_set():
+        try:
+            db.add_task("Запись окна", None)
+            counts["writes"] += 1
+        except Exception:
+            counts["errors"] += 1
+        time.sleep(0.01)
+
+
+async def bench_batch(port, count, size):
+    """Время добавления count задач отдельными запросами и пакетами по size."""
+    client = ApiClient(port)
+    await client.connect()
+    try:
+        body = {"description": "пакет"}
+        start = time.perf_counter()
+        for _ in range(count):
+            await client.request("POST", "/tasks", body)
+        single = time.perf_counter() - start
+        operation = {"method": "POST", "path": "/tasks", "body": body}
+        start = time.perf_counter()
+        for _ in range(count // size):
+            status, _ = await client.request("POST", "/batch", {"requests": [operation] * size})
+            if status != 200:
+                raise RuntimeError(f"Пакет завершился с кодом {status}")
+        batched = time.perf_counter() - start
+    finally:
+        client.close()
+    return single, batched
+
+
+async def check_status_changes(port):
+    """Проверяет ответы PATCH /tasks/ID для повторяющихся задач; возвращает
+    описания несовпадений."""
+    client = ApiClient(port)
+    await client.connect()
+    failures = []
+
+    async def expect(expected, method, path, body=None, check=None, label=""):
+        status, payload = await client.request(method, path, body)
+        if status != expected or check is not None and not check(payload):
+            failures.append(f"{label}: {method} {path} {body} -> {status} {payload}")
+        return payload
+
+    try:
+        task = await expect(201, "POST", "/tasks",
+                            {"description": "повтор", "deadline": NOW, "recurrence": "daily"},
+                            label="создание")
+        path = f"/tasks/{task['id']}"
+        # Выполнение переносит дедлайн, а статус остается прежним и попадает в skipped
+        await expect(200, "PATCH", path, {"status": 1},
+                     check=lambda t: t["status"] == 0 and t["deadline"] > NOW
+                     and t["skipped"] == [task["id"]], label="перенос")
+        # Выполненную задачу с правилом повторения можно вернуть в работу
+        task = await expect(201, "POST", "/tasks", {"description": "разовая", "deadline": NOW},
+                            label="создание")
+        path = f"/tasks/{task['id']}"
+        await expect(200, "PATCH", path, {"status": 1},
+                     check=lambda t: t["status"] == 1 and t["skipped"] == [], label="выполнение")
+        await expect(200, "PATCH", path, {"recurrence": "daily"},
+                     check=lambda t: t["status"] == 1, label="правило выполненной задачи")
+        await expect(200, "PATCH", path, {"status": 0},
+                     check=lambda t: t["status"] == 0, label="возврат в работу")
+    finally:
+        client.close()
+    return failures
+
+
+async def server_load(port, args):
+    events = {}
+    ready = asyncio.Event()
+    listener = asyncio.create_task(count_events(port, events, ready))
+    await ready.wait()
+
+    latencies, errors = {}, []
+    alongside = {"writes": 0, "errors": 0}
+    done = threading.Event()
+    writer = threading.Thread(target=write_alongside, args=(done, alongside))
+    writer.start()
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            load_client(port, args.requests, seed, latencies, errors)
+            for seed in range(args.clients)
+        ))
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        writer.join()
+    single, batched = await bench_batch(port, args.batch, 100)
+    # События последних записей и опрос data_version приходят с задержкой
+    await asyncio.sleep(server.POLL_INTERVAL * 3)
+    listener.cancel()
+    # Проверки идут после подсчета событий и не влияют на него
+    errors.extend(await check_status_changes(port))
+
+    writes = sum(len(latencies.get(kind, [])) for kind in ("add", "complete"))
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "requests_per_s": total / elapsed,
+        "latency_ms": {
+            kind: {
+                "p50": statistics.median(values) * 1000,
+                "p99": sorted(values)[int(len(values) * 0.99)] * 1000,
+                "count": len(values),
+            }
+            for kind, values in sorted(latencies.items())
+        },
+        "errors": len(errors),
+        "task_events": events.get("task", 0),
+        "expected_task_events": writes + args.batch * 2,
+        "changed_events": events.get("changed", 0),
+        "direct_writes": alongside["writes"],
+        "direct_write_errors": alongside["errors"],
+        f"add_{args.batch}_single_s": single,
+        f"add_{args.batch}_batch_s": batched,
+    }, errors
+
+
+def run_server(args):
+    with temporary_database(name="tasks.db") as path:
+        seed_database(args.tasks, 3)
+        process, port = start_server(path)
+        try:
+            results, errors = asyncio.run(server_load(port, args))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(json.dumps({"tasks": args.tasks, "clients": args.clients,
+                      "requests_per_client": args.requests, "results": results},
+                     ensure_ascii=False, indent=2))
+    for error in errors[:5]:
+        print(f"Ошибка запроса: {error}", file=sys.stderr)
+    failed = (
+        results["errors"] or results["direct_write_errors"]
+        or results["task_events"] != results["expected_task_events"]
+        or results["direct_writes"] and not results["changed_events"]
+    )
+    return 1 if failed else 0
+
+
+def dataset_name(count, fanout):
+    size = f"{count // 1000}k" if count % 1000 == 0 else str(count)
+    return f"{size}x{fanout}"
+
+
+def run_suite(args):
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "profile": db.STORAGE_PROFILE,
+            "repeat": args.repeat,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": {},
+    }
+    for count in args.sizes:
+        for fanout in args.fanout:
+            name = dataset_name(count, fanout)
+            print(f"Набор {name}...", file=sys.stderr)
+            with temporary_database():
+                results = bench_database(count, fanout, args.repeat)
+                if not args.no_ui:
+                    results.update(bench_ui(args.repeat))
+            report["results"][name] = results
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+
+# Разница меньше этой считается шумом, даже если она велика в процентах
+NOISE_FLOOR_S = 0.002
+
+
+def compare(baseline, report, tolerance):
+    """Печатает сравнение с базовыми результатами и возвращает список регрессий."""
+    regressions = []
+    for name, results in report["results"].items():
+        base_results = baseline.get("results", {}).get(name)
+        if base_results is None:
+            print(f"{name}: нет базовых результатов", file=sys.stderr)
+            continue
+        for metric, value in results.items():
+            base = base_results.get(metric)
+            if base is None:
+                print(f"{name:>10} {metric:<32} нет базового значения", file=sys.stderr)
+                continue
+            ratio = value / base if base else float("inf")
+            regressed = ratio > 1 + tolerance and value - base > NOISE_FLOOR_S
+            mark = "РЕГРЕССИЯ" if regressed else "ok"
+            print(f"{name:>10} {metric:<32} {base:10.4f} -> {value:10.4f}  x{ratio:5.2f}  {mark}",
+                  file=sys.stderr)
+            if regressed:
+                regressions.append((name, metric, base, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности планировщика задач")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    suite = commands.add_parser("suite", help="замеры db.py и ToDoApp на синтетических данных")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                       help="число задач в наборах данных")
+    suite.add_argument("--fanout", type=int, nargs="+", default=[3],
+                       help="среднее число подзадач у задачи")
+    suite.add_argument("--repeat", type=int, default=5, help="число повторов каждого замера")
+    suite.add_argument("--no-ui", action="store_true", help="не замерять ToDoApp")
+    suite.add_argument("--output", help="файл для результатов JSON (по умолчанию stdout)")
+    suite.add_argument("--baseline", help="файл JSON с базовыми результатами для сравнения")
+    suite.add_argument("--tolerance", type=float, default=0.25,
+                       help="допустимое замедление относительно базовых результатов")
+    suite.set_defaults(run=run_suite)
+
+    profiles = commands.add_parser("profiles", help="сравнить профили хранения SQLite")
+    profiles.add_argument("--writes", type=int, default=500, help="число одиночных записей")
+    profiles.add_argument("--dataset", type=int, default=10000, help="число задач в пакетной вставке")
+    profiles.set_defaults(run=run_profiles)
+
+    startup = commands.add_parser("startup", help="время запуска приложения до первого кадра")
+    startup.add_argument("--command",
+                         help="команда запуска приложения (по умолчанию main.py текущим Python), "
+                              "например путь к сборке PyInstaller dist/main")
+    startup.add_argument("--tasks", type=int, default=10000, help="число задач в базе")
+    startup.add_argument("--repeat", type=int, default=5, help="число запусков")
+    startup.add_argument("--first-frame-target", type=float, default=STARTUP_TARGETS["first_frame_s"],
+                         help="цель для времени до первого кадра, с")
+    startup.add_argument("--interactive-target", type=float, default=STARTUP_TARGETS["interactive_s"],
+                         help="цель для времени до загрузки задач, с")
+    startup.set_defaults(run=run_startup)
+
+    load = commands.add_parser("server", help="нагрузочный тест HTTP API (server.py)")
+    load.add_argument("--tasks", type=int, default=10000, help="число задач в базе")
+    load.add_argument("--clients", type=int, default=16, help="число одновременных соединений")
+    load.add_argument("--requests", type=int, default=500, help="число запросов на соединение")
+    load.add_argument("--batch", type=int, default=1000,
+                      help="число задач для сравнения отдельных запросов и /batch")
+    load.set_defaults(run=run_server)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Проверка планов выполнения горячих запросов db.py.
+
+Скрипт создает временную базу, вызывает функции db.py, перехватывает
+выполненные ими SQL-запросы и проверяет через EXPLAIN QUERY PLAN, что
+запросы используют индексы, а не полный просмотр таблиц.
+
+Запуск:
+    python check_query_plans.py
+Код возврата отличен от нуля, если какой-либо план не соответствует ожиданиям.
+"""
+import os
+import sys
+import tempfile
+
+import db
+
+# Функция db, аргументы вызова и фрагменты, которые должны встретиться в плане
+EXPECTED_PLANS = [
+    ("load_tasks", (), ["USING INDEX idx_tasks_created"]),
+    ("load_subtasks", (1,), ["USING INDEX idx_sub_tasks_task_created (task_id=?)"]),
+    ("load_tasks_with_subtasks", (), [
+        "USING INDEX idx_tasks_created",
+        "USING INDEX idx_sub_tasks_task_created",
+    ]),
+    ("check_overdue_tasks", (946684800,), ["USING INDEX idx_tasks_pending_deadline"]),
+    ("load_tasks_page", (0,), ["USING INDEX idx_tasks_status_created (status=?)"]),
+    ("load_tasks_page", (0, (4102444800, 1000)), [
+        "USING INDEX idx_tasks_status_created (status=? AND created_at<?)",
+    ]),
+    ("load_pending_deadlines", (), ["USING INDEX idx_tasks_pending_deadline"]),
+]
+
+# Признаки плохого плана: сортировка во временном B-дереве
+FORBIDDEN = ["USE TEMP B-TREE"]
+
+
+def seed():
+    """Наполняет базу небольшим набором данных."""
+    for i in range(20):
+        task_id = db.add_task(f"Задача {i}", 946684800 if i % 2 else None)[0]
+        db.add_subtask(task_id, f"Подзадача {i}")
+
+
+def capture_statements(func, args):
+    """Вызывает функцию db и возвращает выполненные ею запросы."""
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        func(*args)
+    finally:
+        conn.set_trace_callback(None)
+    return [
+        sql for sql in statements
+        if sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))
+    ]
+
+
+def query_plan(sql):
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса."""
+    conn = db.get_connection()
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        db.DB_FILE = os.path.join(directory, "plans.db")
+        db.create_tables()
+        seed()
+
+        for name, args, expected in EXPECTED_PLANS:
+            plans = [query_plan(sql) for sql in capture_statements(getattr(db, name), args)]
+            details = [detail for plan in plans for detail in plan]
+            missing = [fragment for fragment in expected if not any(fragment in d for d in details)]
+            forbidden = [d for d in details if any(fragment in d for fragment in FORBIDDEN)]
+
+            status = "OK" if not missing and not forbidden else "FAIL"
+            print(f"[{status}] db.{name}")
+            for detail in details:
+                print(f"    {detail}")
+            for fragment in missing:
+                print(f"    ожидалось: {fragment}")
+            if missing or forbidden:
+                failures += 1
+
+        db.close_connections()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Командная строка планировщика задач (без графического интерфейса).
+
+Запуск: python main.py КОМАНДА ... (или python cli.py КОМАНДА ...)
+    add ОПИСАНИЕ [--deadline ДАТА] [--repeat ПРАВИЛО] [--subtask ТЕКСТ ...]
+    list [--status active|done|all] [--limit N] [--json]
+    search ТЕКСТ [--limit N] [--json]
+    complete ID [ID ...]
+    import ФАЙЛ [--format ndjson|csv]
+    export ФАЙЛ [--format ndjson|csv]
+    serve [--host 127.0.0.1] [--port 8765]   локальный HTTP/JSON API (server.py)
+
+Модуль работает через service.TaskService и не импортирует PyQt5.
+Результаты выводятся в stdout, ошибки и диагностика базы - в stderr
+(код возврата 1), поэтому вывод --json можно передавать другим программам.
+"""
+import argparse
+import json
+import sys
+from contextlib import redirect_stdout
+
+import db
+import recurrence
+import transfer
+from service import STATUSES, TaskService, format_timestamp, parse_deadline
+
+# Поля задачи в выводе --json
+JSON_FIELDS = ("id", "description", "status", "deadline", "created_at",
+               "subtask_total", "subtask_done", "recurrence")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Умный планировщик задач: командная строка")
+    parser.add_argument("--db", metavar="PATH", help="файл базы данных (по умолчанию tasks.db)")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="КОМАНДА")
+
+    add = commands.add_parser("add", help="добавить задачу")
+    add.add_argument("description", help="описание задачи")
+    add.add_argument("--deadline", help="дедлайн: ГГГГ-ММ-ДД [ЧЧ:ММ[:СС]] или Unix-время")
+    add.add_argument("--repeat", metavar="RULE",
+                     help="правило повторения: daily, weekly, weekdays или 'cron M H DOM MON DOW'")
+    add.add_argument("--subtask", action="append", default=[], metavar="TEXT",
+                     help="подзадача (можно указать несколько раз)")
+
+    list_ = commands.add_parser("list", help="вывести задачи")
+    list_.add_argument("--status", choices=(*STATUSES, "all"), default="all")
+    list_.add_argument("--limit", type=int, help="вывести не больше N задач")
+    list_.add_argument("--json", action="store_true", help="вывод в JSON Lines")
+
+    search = commands.add_parser("search", help="найти задачи по тексту задач и подзадач")
+    search.add_argument("term", help="текст для поиска")
+    search.add_argument("--limit", type=int, help="вывести не больше N задач")
+    search.add_argument("--json", action="store_true", help="вывод в JSON Lines")
+
+    complete = commands.add_parser("complete", help="отметить задачи выполненными")
+    complete.add_argument("ids", nargs="+", type=int, metavar="ID")
+
+    for name, action in (("import", "импортировать задачи из файла"),
+                         ("export", "экспортировать задачи в файл")):
+        command = commands.add_parser(name, help=action)
+        command.add_argument("file", help="файл .ndjson/.jsonl/.json или .csv")
+        command.add_argument("--format", choices=transfer.FORMATS,
+                             help="формат файла (по умолчанию - по расширению)")
+
+    serve = commands.add_parser("serve", help="запустить локальный HTTP/JSON API (см. server.py)")
+    serve.add_argument("--host", default="127.0.0.1", help="loopback-адрес (по умолчанию 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="порт (0 - любой свободный)")
+    return parser
+
+
+def format_task(task):
+    """Строка задачи для вывода: ID, статус, описание, дедлайн, повторение."""
+    parts = [f"{task['id']:>6}  [{'x' if task['status'] else ' '}] {task['description']}"]
+    if task["deadline"] is not None:
+        parts.append(f"до {format_timestamp(task['deadline'])}")
+    if task["recurrence"] is not None:
+        parts.append(f"({recurrence.describe(task['recurrence'])})")
+    if task["subtask_total"]:
+        parts.append(f"[{task['subtask_done']}/{task['subtask_total']}]")
+    return "  ".join(parts)
+
+
+def print_tasks(tasks, as_json, out):
+    for task in tasks:
+        if as_json:
+            out.write(json.dumps({field: task[field] for field in JSON_FIELDS},
+                                 ensure_ascii=False) + "\n")
+        else:
+            out.write(format_task(task) + "\n")
+
+
+def run(args, service, out):
+    """Выполняет команду args и пишет результат в out; возвращает код возврата."""
+    if args.command == "add":
+        task = service.add(args.description, parse_deadline(args.deadline),
+                           recurrence.validate(args.repeat), args.subtask)
+        out.write(f"{task['id']}\n")
+    elif args.command == "list":
+        status = STATUSES.get(args.status)
+        print_tasks(service.tasks(status, args.limit), args.json, out)
+    elif args.command == "search":
+        print_tasks(service.search(args.term, args.limit), args.json, out)
+    elif args.command == "complete":
+        tasks = service.complete(args.ids)
+        print_tasks(tasks, False, out)
+        missing = set(args.ids) - {task["id"] for task in tasks}
+        if missing:
+            print(f"Задачи не найдены: {', '.join(map(str, sorted(missing)))}", file=sys.stderr)
+            return 1
+    elif args.command == "import":
+        out.write(f"Импортировано задач: {service.import_file(args.file, args.format)}\n")
+    elif args.command == "export":
+        out.write(f"Экспортировано задач: {service.export_file(args.file, args.format)}\n")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command == "serve":
+        # asyncio нужен только серверу
+        import server
+        if args.db is not None:
+            db.DB_FILE = args.db
+        try:
+            return server.run(args.host, args.port)
+        except ValueError as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            return 1
+    out = sys.stdout
+    try:
+        # db.py сообщает об ошибках через print: уводим их из вывода команды
+        with redirect_stdout(sys.stderr):
+            service = TaskService(args.db)
+            try:
+                return run(args, service, out)
+            finally:
+                service.close()
+    except (ValueError, OSError) as e:
+        # Некорректный ввод: дата, правило повторения, файл импорта
+        print(f"Ошибка: {e}", file=sys.stderr)
+    except Exception as e:
+        print(f"Ошибка базы данных: {e}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
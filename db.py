@@ -1,42 +1,247 @@
 import sqlite3
-from datetime import datetime
+from contextlib import contextmanager
 import os
+import re
+import threading
+import time
 import traceback
 
+import profiling
+import recurrence
+
 # Создаем и подключаемся к базе данных SQLite
 DB_FILE = "tasks.db"
 
-def get_connection():
-    """Создает и возвращает соединение с базой данных."""
+# Сколько подготовленных выражений sqlite3 держит в кэше каждого соединения
+STATEMENT_CACHE_SIZE = 256
+
+# Профили хранения: PRAGMA, применяемые к каждому новому соединению.
+# journal_mode сохраняется в самом файле базы, остальные действуют в рамках
+# соединения. cache_size в отрицательных значениях задается в КиБ.
+STORAGE_PROFILES = {
+    # Как было изначально: журнал отката, полная синхронизация при каждом commit
+    "legacy": {
+        "journal_mode": "DELETE",
+    },
+    # Журнал упреждающей записи: читатели не блокируются писателем, а fsync
+    # выполняется при контрольной точке, а не при каждом commit. После сбоя
+    # питания могут потеряться последние транзакции, но база остается целой.
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    # WAL с синхронизацией при каждом commit - если важна каждая транзакция
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+# Профиль выбирается переменной окружения TASKS_DB_PROFILE или присваиванием
+# db.STORAGE_PROFILE до первого подключения
+STORAGE_PROFILE = os.environ.get("TASKS_DB_PROFILE", "wal")
+
+# Дедлайны и даты создания хранятся как целое Unix-время (секунды, UTC).
+# Текущее время в SQL-выражениях:
+EPOCH_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+# Соединения живут в течение всей работы приложения: по одному на поток,
+# потому что объект sqlite3.Connection нельзя использовать из разных потоков
+# одновременно. Соединения хранятся по идентификатору потока, а не в
+# threading.local: для потоков Qt (QThread, QThreadPool) Python заново создает
+# состояние потока при каждом вызове из C++, и данные threading.local
+# терялись бы после каждого запроса вместе с открытым соединением.
+class _ThreadConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.db_file = DB_FILE
+        self.generation = _generation
+        # Глубина вложенных блоков transaction()
+        self.depth = 0
+        # Есть ли в базе индекс FTS5 (None - еще не проверяли, см. _has_search_index)
+        self.search_index = None
+
+_pool = {}
+_pool_lock = threading.Lock()
+# Увеличивается в close_connections, чтобы потоки не использовали закрытые соединения
+_generation = 0
+# Передавать ли выполняемые запросы в profiling.count_query
+_trace_queries = False
+
+def _open_connection():
+    conn = sqlite3.connect(
+        DB_FILE,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,  # закрыть соединение может close_connections из другого потока
+    )
+    conn.execute("PRAGMA foreign_keys = ON")  # Включаем поддержку внешних ключей
+    _apply_storage_profile(conn, STORAGE_PROFILE)
+    if _trace_queries:
+        conn.set_trace_callback(profiling.count_query)
+    return conn
+
+def _apply_storage_profile(conn, name):
+    """Применяет к соединению PRAGMA профиля хранения."""
+    try:
+        pragmas = STORAGE_PROFILES[name]
+    except KeyError:
+        conn.close()
+        raise ValueError(
+            f"Неизвестный профиль хранения {name!r}, доступны: {', '.join(STORAGE_PROFILES)}"
+        ) from None
+    for pragma, value in pragmas.items():
+        if pragma == "journal_mode":
+            # Режим журнала хранится в файле: меняем его только при необходимости,
+            # потому что переключение требует монопольного доступа к базе
+            current = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if current.upper() == value:
+                continue
+            try:
+                conn.execute(f"PRAGMA journal_mode = {value}")
+            except sqlite3.OperationalError as e:
+                print(f"Не удалось переключить журнал базы данных в режим {value}: {str(e)}")
+            continue
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+def storage_settings():
+    """Возвращает действующие значения PRAGMA профиля для соединения текущего потока."""
+    with connection() as conn:
+        return {
+            pragma: conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+            for pragma in STORAGE_PROFILES["wal"]
+        }
+
+def _thread_connection():
+    thread_id = threading.get_ident()
+    current = _pool.get(thread_id)
+    if current is not None and current.generation == _generation:
+        if current.db_file == DB_FILE:
+            return current
+        # DB_FILE изменился (например, в бенчмарке) - старое соединение больше не нужно
+        _release(thread_id, current)
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.execute("PRAGMA foreign_keys = ON")  # Включаем поддержку внешних ключей
-        return conn
+        with profiling.span("db.connect"):
+            current = _ThreadConnection(_open_connection())
     except Exception as e:
         print(f"Ошибка подключения к базе данных: {str(e)}")
         raise
+    with _pool_lock:
+        _pool[thread_id] = current
+    return current
 
-def create_tables():
-    """Создает таблицы в базе данных, если они не существуют."""
-    conn = None
+def get_connection():
+    """Возвращает долгоживущее соединение текущего потока, открывая его при первом вызове."""
+    return _thread_connection().conn
+
+def _release(thread_id, current):
+    with _pool_lock:
+        if _pool.get(thread_id) is current:
+            del _pool[thread_id]
+    current.conn.close()
+
+@contextmanager
+def connection():
+    """Выдает соединение текущего потока для чтения. Соединение не закрывается."""
+    yield get_connection()
+
+@contextmanager
+def transaction():
+    """Выдает соединение текущего потока и фиксирует изменения по выходу из блока.
+
+    При исключении изменения откатываются. Вложенные блоки становятся частью
+    внешней транзакции: фиксирует или откатывает только самый внешний блок.
+    """
+    current = _thread_connection()
+    conn = current.conn
+    current.depth += 1
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        
-        # Проверяем существование временной таблицы и удаляем её, если она существует
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks_new'")
-        if c.fetchone():
-            print("Удаление временной таблицы tasks_new...")
-            c.execute("DROP TABLE tasks_new")
-        
-        # Проверяем существование таблицы tasks
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks'")
-        tasks_exists = c.fetchone() is not None
-        
-        if not tasks_exists:
-            print("Создание таблицы tasks...")
+        yield conn
+    except BaseException:
+        current.depth -= 1
+        if current.depth == 0:
+            conn.rollback()
+        raise
+    current.depth -= 1
+    if current.depth == 0:
+        conn.commit()
+
+class QueryCancelled(Exception):
+    """Запрос прерван, потому что его результат больше не нужен."""
+
+@contextmanager
+def cancellable(conn, is_cancelled):
+    """Позволяет прервать запросы внутри блока, если is_cancelled() вернет True.
+
+    SQLite периодически вызывает обработчик прогресса; прерванный запрос
+    завершается исключением QueryCancelled.
+    """
+    if is_cancelled is None:
+        yield conn
+        return
+    conn.set_progress_handler(lambda: 1 if is_cancelled() else 0, 1000)
+    try:
+        yield conn
+    except sqlite3.OperationalError:
+        if is_cancelled():
+            raise QueryCancelled()
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+def trace_queries(enabled=True):
+    """Включает подсчет SQL-запросов для profiling на всех соединениях."""
+    global _trace_queries
+    _trace_queries = enabled
+    with _pool_lock:
+        connections = [current.conn for current in _pool.values()]
+    for conn in connections:
+        conn.set_trace_callback(profiling.count_query if enabled else None)
+
+def close_connections():
+    """Закрывает все открытые соединения (вызывается при завершении приложения)."""
+    global _generation
+    with _pool_lock:
+        connections = [current.conn for current in _pool.values()]
+        _pool.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"Ошибка при закрытии соединения: {str(e)}")
+
+def _migrate_base_tables(c):
+    """Создает таблицы tasks и sub_tasks и обновляет их старые варианты."""
+    # Временная таблица могла остаться от прерванного обновления до появления версий схемы
+    c.execute("DROP TABLE IF EXISTS tasks_new")
+
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks'")
+    if c.fetchone() is None:
+        print("Создание таблицы tasks...")
+        c.execute("""
+            CREATE TABLE tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                description TEXT NOT NULL,
+                status INTEGER DEFAULT 0,
+                deadline TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    else:
+        c.execute("PRAGMA table_info(tasks)")
+        columns = [column[1] for column in c.fetchall()]
+        if 'created_at' not in columns:
+            # ALTER TABLE не умеет добавлять колонку со значением по умолчанию
+            # CURRENT_TIMESTAMP, поэтому таблица копируется
+            print("Обновление структуры таблицы tasks...")
             c.execute("""
-                CREATE TABLE tasks (
+                CREATE TABLE tasks_new (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     description TEXT NOT NULL,
                     status INTEGER DEFAULT 0,
@@ -44,267 +249,966 @@ def create_tables():
                     created_at TEXT DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-        else:
-            # Проверяем существование колонки created_at
-            c.execute("PRAGMA table_info(tasks)")
-            columns = [column[1] for column in c.fetchall()]
-            
-            if 'created_at' not in columns:
-                print("Обновление структуры таблицы tasks...")
-                # Создаем временную таблицу с новой структурой
-                c.execute("""
-                    CREATE TABLE tasks_new (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        description TEXT NOT NULL,
-                        status INTEGER DEFAULT 0,
-                        deadline TEXT,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Копируем данные из старой таблицы
-                c.execute("""
-                    INSERT INTO tasks_new (id, description, status, deadline)
-                    SELECT id, description, status, deadline FROM tasks
-                """)
-                
-                # Удаляем старую таблицу
-                c.execute("DROP TABLE tasks")
-                
-                # Переименовываем новую таблицу
-                c.execute("ALTER TABLE tasks_new RENAME TO tasks")
-                print("Структура таблицы tasks обновлена")
-        
-        # Проверяем существование таблицы sub_tasks
-        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sub_tasks'")
-        sub_tasks_exists = c.fetchone() is not None
-        
-        if not sub_tasks_exists:
-            print("Создание таблицы sub_tasks...")
             c.execute("""
-                CREATE TABLE sub_tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id INTEGER,
-                    description TEXT NOT NULL,
-                    status INTEGER DEFAULT 0,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+                INSERT INTO tasks_new (id, description, status, deadline)
+                SELECT id, description, status, deadline FROM tasks
+            """)
+            c.execute("DROP TABLE tasks")
+            c.execute("ALTER TABLE tasks_new RENAME TO tasks")
+            print("Структура таблицы tasks обновлена")
+
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sub_tasks'")
+    if c.fetchone() is None:
+        print("Создание таблицы sub_tasks...")
+        c.execute("""
+            CREATE TABLE sub_tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id INTEGER,
+                description TEXT NOT NULL,
+                status INTEGER DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+            )
+        """)
+    else:
+        c.execute("PRAGMA table_info(sub_tasks)")
+        columns = [column[1] for column in c.fetchall()]
+        if 'status' not in columns:
+            print("Обновление структуры таблицы sub_tasks...")
+            c.execute("ALTER TABLE sub_tasks ADD COLUMN status INTEGER DEFAULT 0")
+            print("Структура таблицы sub_tasks обновлена")
+
+def _migrate_indexes(c):
+    """Индексы для горячих запросов (проверяются скриптом check_query_plans.py):
+    подзадачи задачи по порядку создания (и каскадное удаление), список задач
+    по дате создания (весь и постранично по статусу) и просроченные
+    невыполненные задачи."""
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sub_tasks_task_created
+        ON sub_tasks (task_id, created_at)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_created
+        ON tasks (created_at)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_status_created
+        ON tasks (status, created_at)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_pending_deadline
+        ON tasks (deadline) WHERE status = 0
+    """)
+
+def _migrate_search_index(c):
+    """Создает полнотекстовый индекс FTS5 по задачам и подзадачам.
+
+    Одна строка tasks_fts соответствует одной задаче (rowid = id задачи):
+    в колонке subtasks хранится текст всех её подзадач. Индекс поддерживается
+    триггерами. Если SQLite собран без FTS5, поиск работает через LIKE.
+    """
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+    if c.fetchone() is None:
+        try:
+            c.execute("""
+                CREATE VIRTUAL TABLE tasks_fts USING fts5(
+                    description,
+                    subtasks,
+                    tokenize = 'unicode61 remove_diacritics 2'
                 )
             """)
-        else:
-            # Проверяем существование колонки status в таблице sub_tasks
-            c.execute("PRAGMA table_info(sub_tasks)")
-            columns = [column[1] for column in c.fetchall()]
-            
-            if 'status' not in columns:
-                print("Обновление структуры таблицы sub_tasks...")
-                # Создаем временную таблицу с новой структурой
-                c.execute("""
-                    CREATE TABLE sub_tasks_new (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        task_id INTEGER,
-                        description TEXT NOT NULL,
-                        status INTEGER DEFAULT 0,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
-                    )
-                """)
-                
-                # Копируем данные из старой таблицы
-                c.execute("""
-                    INSERT INTO sub_tasks_new (id, task_id, description, created_at)
-                    SELECT id, task_id, description, created_at FROM sub_tasks
-                """)
-                
-                # Удаляем старую таблицу
-                c.execute("DROP TABLE sub_tasks")
-                
-                # Переименовываем новую таблицу
-                c.execute("ALTER TABLE sub_tasks_new RENAME TO sub_tasks")
-                print("Структура таблицы sub_tasks обновлена")
-        
-        conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Полнотекстовый поиск недоступен, используется LIKE: {str(e)}")
+            return
+        print("Построение полнотекстового индекса...")
+        c.execute("""
+            INSERT INTO tasks_fts (rowid, description, subtasks)
+            SELECT t.id, t.description,
+                   COALESCE((SELECT group_concat(s.description, ' ')
+                             FROM sub_tasks s WHERE s.task_id = t.id), '')
+            FROM tasks t
+        """)
+
+    subtasks_text = """
+        COALESCE((SELECT group_concat(description, ' ')
+                  FROM sub_tasks WHERE task_id = {task}), '')
+    """
+    _create_triggers(c, [
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, description, subtasks)
+            VALUES (new.id, new.description, '');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF description ON tasks BEGIN
+            UPDATE tasks_fts SET description = new.description WHERE rowid = new.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM tasks_fts WHERE rowid = old.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sub_tasks_fts_insert AFTER INSERT ON sub_tasks BEGIN
+            UPDATE tasks_fts SET subtasks = {subtasks_text.format(task="new.task_id")}
+            WHERE rowid = new.task_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sub_tasks_fts_update
+        AFTER UPDATE OF description, task_id ON sub_tasks BEGIN
+            UPDATE tasks_fts SET subtasks = {subtasks_text.format(task="old.task_id")}
+            WHERE rowid = old.task_id;
+            UPDATE tasks_fts SET subtasks = {subtasks_text.format(task="new.task_id")}
+            WHERE rowid = new.task_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sub_tasks_fts_delete AFTER DELETE ON sub_tasks BEGIN
+            UPDATE tasks_fts SET subtasks = {subtasks_text.format(task="old.task_id")}
+            WHERE rowid = old.task_id;
+        END
+        """,
+    ])
+
+def _migrate_subtask_counters(c):
+    """Добавляет в tasks счетчики подзадач subtask_total и subtask_done.
+
+    Счетчики поддерживаются триггерами на sub_tasks, поэтому список задач с
+    прогрессом читается из одной таблицы. Колонки заполняются по текущим
+    подзадачам.
+    """
+    c.execute("PRAGMA table_info(tasks)")
+    columns = [column[1] for column in c.fetchall()]
+    if 'subtask_total' not in columns:
+        print("Добавление счетчиков подзадач...")
+        c.execute("ALTER TABLE tasks ADD COLUMN subtask_total INTEGER NOT NULL DEFAULT 0")
+        c.execute("ALTER TABLE tasks ADD COLUMN subtask_done INTEGER NOT NULL DEFAULT 0")
+        c.execute("""
+            UPDATE tasks SET
+                subtask_total = (SELECT COUNT(*) FROM sub_tasks s WHERE s.task_id = tasks.id),
+                subtask_done = (SELECT COUNT(*) FROM sub_tasks s
+                                WHERE s.task_id = tasks.id AND s.status = 1)
+        """)
+
+    _create_triggers(c, [
+        """
+        CREATE TRIGGER IF NOT EXISTS sub_tasks_counters_insert AFTER INSERT ON sub_tasks BEGIN
+            UPDATE tasks SET subtask_total = subtask_total + 1,
+                             subtask_done = subtask_done + (new.status = 1)
+            WHERE id = new.task_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS sub_tasks_counters_update
+        AFTER UPDATE OF status, task_id ON sub_tasks BEGIN
+            UPDATE tasks SET subtask_total = subtask_total - 1,
+                             subtask_done = subtask_done - (old.status = 1)
+            WHERE id = old.task_id;
+            UPDATE tasks SET subtask_total = subtask_total + 1,
+                             subtask_done = subtask_done + (new.status = 1)
+            WHERE id = new.task_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS sub_tasks_counters_delete AFTER DELETE ON sub_tasks BEGIN
+            UPDATE tasks SET subtask_total = subtask_total - 1,
+                             subtask_done = subtask_done - (old.status = 1)
+            WHERE id = old.task_id;
+        END
+        """,
+    ])
+
+def _migrate_epoch_timestamps(c):
+    """Переводит tasks.deadline, tasks.created_at и sub_tasks.created_at из
+    текста 'ГГГГ-ММ-ДД ЧЧ:ММ:СС' в целое Unix-время.
+
+    Дедлайны хранились в местном времени, даты создания (CURRENT_TIMESTAMP) -
+    в UTC. Целые числа сравниваются без разбора строк, а строки и индексы
+    становятся меньше. Тип колонки и выражение по умолчанию нельзя изменить
+    через ALTER TABLE, поэтому обе таблицы пересоздаются; триггеры и индексы
+    удаляются вместе со старыми таблицами и создаются заново. Полнотекстовый
+    индекс не меняется: ID задач сохраняются.
+    """
+    # Триггеры sub_tasks ссылаются на tasks: без удаления переименование
+    # новой таблицы в tasks не прошло бы проверку схемы
+    c.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type = 'trigger' AND tbl_name IN ('tasks', 'sub_tasks')
+    """)
+    for (name,) in c.fetchall():
+        c.execute(f'DROP TRIGGER "{name}"')
+
+    c.execute(f"""
+        CREATE TABLE tasks_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            status INTEGER DEFAULT 0,
+            deadline INTEGER,
+            created_at INTEGER NOT NULL DEFAULT ({EPOCH_NOW}),
+            subtask_total INTEGER NOT NULL DEFAULT 0,
+            subtask_done INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    c.execute(f"""
+        CREATE TABLE sub_tasks_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER,
+            description TEXT NOT NULL,
+            status INTEGER DEFAULT 0,
+            created_at INTEGER NOT NULL DEFAULT ({EPOCH_NOW}),
+            FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+        )
+    """)
+    # Модификатор 'utc' переводит местное время в UTC; некорректный текст
+    # дает NULL: дедлайн пропадает, дата создания заменяется текущей
+    converted = c.execute(f"""
+        INSERT INTO tasks_new
+        SELECT id, description, status,
+               CAST(strftime('%s', deadline, 'utc') AS INTEGER),
+               COALESCE(CAST(strftime('%s', created_at) AS INTEGER), {EPOCH_NOW}),
+               subtask_total, subtask_done
+        FROM tasks
+    """).rowcount
+    converted_subtasks = c.execute(f"""
+        INSERT INTO sub_tasks_new
+        SELECT id, task_id, description, status,
+               COALESCE(CAST(strftime('%s', created_at) AS INTEGER), {EPOCH_NOW})
+        FROM sub_tasks
+    """).rowcount
+    if converted or converted_subtasks:
+        print(f"Даты переведены в Unix-время: задач {converted}, подзадач {converted_subtasks}")
+    lost = c.execute("""
+        SELECT COUNT(*) FROM tasks JOIN tasks_new USING (id)
+        WHERE tasks.deadline != '' AND tasks_new.deadline IS NULL
+    """).fetchone()[0]
+    if lost:
+        print(f"Некорректные дедлайны удалены у задач: {lost}")
+
+    # Счетчики AUTOINCREMENT переносятся, чтобы ID удаленных записей не
+    # выдавались повторно
+    sequences = c.execute("""
+        SELECT name, seq FROM sqlite_sequence WHERE name IN ('tasks', 'sub_tasks')
+    """).fetchall()
+    c.execute("DROP TABLE sub_tasks")
+    c.execute("DROP TABLE tasks")
+    c.execute("ALTER TABLE tasks_new RENAME TO tasks")
+    c.execute("ALTER TABLE sub_tasks_new RENAME TO sub_tasks")
+    for name, seq in sequences:
+        c.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq, name))
+
+    _migrate_indexes(c)
+    _migrate_search_index(c)
+    _migrate_subtask_counters(c)
+
+def _migrate_recurrence(c):
+    """Добавляет в tasks правило повторения recurrence (см. recurrence.py).
+
+    У повторяющейся задачи дедлайн - ближайшее невыполненное повторение,
+    поэтому проверка просроченных задач по-прежнему использует частичный
+    индекс дедлайнов.
+    """
+    c.execute("ALTER TABLE tasks ADD COLUMN recurrence TEXT")
+
+def _create_triggers(c, statements):
+    # По одному запросу: executescript зафиксировал бы транзакцию миграции
+    for statement in statements:
+        c.execute(statement)
+
+# Шаги миграции схемы по порядку; номер версии схемы - число выполненных шагов,
+# он хранится в PRAGMA user_version. Новые изменения схемы добавляются в конец
+# списка, уже выпущенные шаги не меняются. Первые четыре шага пропускают
+# существующие объекты: базы, созданные до появления версий, уже могут
+# содержать часть схемы.
+MIGRATIONS = [
+    _migrate_base_tables,
+    _migrate_indexes,
+    _migrate_search_index,
+    _migrate_subtask_counters,
+    _migrate_epoch_timestamps,
+    _migrate_recurrence,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def _schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _migrate(conn):
+    # IMMEDIATE: другой процесс не начнет миграцию одновременно с нами
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = _schema_version(conn)
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Схема базы данных (версия {version}) новее поддерживаемой "
+                f"этой версией приложения ({SCHEMA_VERSION})"
+            )
+        c = conn.cursor()
+        for migration in MIGRATIONS[version:]:
+            migration(c)
+        c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+@profiling.profiled
+def create_tables():
+    """Создает или обновляет схему базы данных до SCHEMA_VERSION.
+
+    Если схема актуальна, выполняется единственный запрос PRAGMA user_version.
+    Иначе недостающие шаги MIGRATIONS выполняются в одной транзакции: при
+    ошибке база остается в прежнем состоянии.
+    """
+    try:
+        conn = get_connection()
+        if _schema_version(conn) == SCHEMA_VERSION:
+            return
+        # Внешние ключи отключаются на время миграции: иначе пересоздание
+        # таблицы tasks (DROP TABLE) каскадно удалило бы подзадачи. Внутри
+        # транзакции PRAGMA foreign_keys не действует, поэтому - до BEGIN.
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            _migrate(conn)
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+            _thread_connection().search_index = None
         print("Таблицы успешно созданы/обновлены")
     except Exception as e:
         print(f"Ошибка при создании таблиц: {str(e)}")
         print(traceback.format_exc())
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
-def add_task(description, deadline):
-    """Добавляет новую задачу в базу данных."""
-    conn = None
+def _has_search_index(c):
+    # Индекс создается только миграцией, поэтому результат запоминается
+    # в соединении потока до следующей миграции (см. create_tables)
+    current = _thread_connection()
+    if current.search_index is None:
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+        current.search_index = c.fetchone() is not None
+    return current.search_index
+
+def _search_query(c, search_term):
+    """Возвращает SQL-условие и параметры поиска, отбирающие ID задач.
+
+    С FTS5 каждое слово ищется как префикс, а результаты ранжируются по bm25
+    (совпадения в описании задачи весят больше, чем в подзадачах). Без FTS5
+    каждое слово ищется через LIKE в описании задачи и её подзадач.
+    Возвращает (None, None), если строка поиска пуста, и запрос без
+    результатов, если в непустой строке нет ни одного слова.
+    """
+    if not search_term.strip():
+        return None, None
+    words = re.findall(r"\w+", search_term)
+    if not words:
+        return "SELECT NULL AS task_id, 0 AS score WHERE 0", ()
+
+    if _has_search_index(c):
+        match = " AND ".join('"{}"*'.format(word) for word in words)
+        return """
+            SELECT rowid AS task_id, bm25(tasks_fts, 2.0, 1.0) AS score
+            FROM tasks_fts
+            WHERE tasks_fts MATCH ?
+        """, (match,)
+
+    conditions = []
+    params = []
+    for word in words:
+        conditions.append("""
+            (t.description LIKE ? OR EXISTS (
+                SELECT 1 FROM sub_tasks s
+                WHERE s.task_id = t.id AND s.description LIKE ?))
+        """)
+        params.extend([f"%{word}%"] * 2)
+    return f"""
+        SELECT t.id AS task_id, 0 AS score
+        FROM tasks t
+        WHERE {" AND ".join(conditions)}
+    """, tuple(params)
+
+# Колонки строки задачи со сводкой подзадач (таблица tasks под псевдонимом t):
+# id, описание, статус, дедлайн, дата создания, всего подзадач, выполнено подзадач,
+# правило повторения.
+# Сами подзадачи загружаются отдельно (load_subtasks), когда задачу раскрывают.
+# Счетчики хранятся в самой таблице tasks (см. _migrate_subtask_counters).
+# Дедлайн и дата создания - Unix-время (см. _migrate_epoch_timestamps).
+TASK_COLUMNS = """
+    t.id, t.description, t.status, t.deadline, t.created_at, t.subtask_total, t.subtask_done,
+    t.recurrence
+"""
+
+def _fetch_task(c, task_id):
+    """Возвращает строку задачи в формате TASK_COLUMNS или None."""
+    c.execute(f"""
+        SELECT {TASK_COLUMNS}
+        FROM tasks t
+        WHERE t.id = ?
+    """, (task_id,))
+    return c.fetchone()
+
+def _fetch_subtask(c, subtask_id):
+    """Возвращает строку подзадачи вместе с ID родительской задачи или None."""
+    c.execute("""
+        SELECT id, task_id, description, status
+        FROM sub_tasks
+        WHERE id = ?
+    """, (subtask_id,))
+    return c.fetchone()
+
+@profiling.profiled
+def add_task(description, deadline, rule=None):
+    """Добавляет новую задачу в базу данных и возвращает её строку.
+
+    deadline - Unix-время или None, rule - правило повторения (recurrence.py)
+    или None. Повторяющейся задаче нужен дедлайн - первое повторение.
+    """
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO tasks (description, status, deadline) VALUES (?, ?, ?)",
-            (description, 0, deadline)
-        )
-        conn.commit()
+        rule = _check_recurrence(rule, deadline)
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute(
+                "INSERT INTO tasks (description, status, deadline, recurrence) VALUES (?, ?, ?, ?)",
+                (description, 0, deadline, rule)
+            )
+            task = _fetch_task(c, c.lastrowid)
+            return task
     except Exception as e:
         print(f"Ошибка при добавлении задачи: {str(e)}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled
 def update_task_status(task_id, status):
-    """Обновляет статус задачи (выполнена/не выполнена)."""
-    conn = None
+    """Обновляет статус задачи (выполнена/не выполнена) и возвращает её строку.
+
+    Выполненная повторяющаяся задача остается невыполненной, а её дедлайн
+    переносится на следующее повторение (см. _advance_recurring). Снять
+    отметку о выполнении можно с любой задачи.
+    """
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("UPDATE tasks SET status = ? WHERE id = ?", (status, task_id))
-        conn.commit()
+        with transaction() as conn:
+            c = conn.cursor()
+            if status == 1:
+                _advance_recurring(c, [task_id])
+            c.execute(_STATUS_UPDATES[status], (status, task_id))
+            task = _fetch_task(c, task_id)
+            return task
     except Exception as e:
         print(f"Ошибка при обновлении статуса задачи: {str(e)}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled
+def update_task_recurrence(task_id, rule):
+    """Задает или снимает (rule=None) правило повторения задачи и
+    возвращает её строку."""
+    try:
+        with transaction() as conn:
+            c = conn.cursor()
+            task = _fetch_task(c, task_id)
+            if task is None:
+                return None
+            rule = _check_recurrence(rule, task[3])
+            c.execute("UPDATE tasks SET recurrence = ? WHERE id = ?", (rule, task_id))
+            return _fetch_task(c, task_id)
+    except Exception as e:
+        print(f"Ошибка при изменении повторения задачи: {str(e)}")
+        raise
+
+# Запросы смены статуса задачи. Невыполненная повторяющаяся задача при
+# выполнении остается невыполненной: её дедлайн уже перенесен
+# (_advance_recurring). Снятие отметки применяется к любой задаче, иначе
+# выполненную задачу, которой позже задали правило повторения, нельзя было
+# бы вернуть в работу.
+_STATUS_UPDATES = {
+    0: "UPDATE tasks SET status = ? WHERE id = ?",
+    1: "UPDATE tasks SET status = ? WHERE id = ? AND recurrence IS NULL",
+}
+
+def _check_recurrence(rule, deadline):
+    """Проверяет правило повторения задачи с дедлайном deadline и
+    возвращает его в сохраняемом виде."""
+    rule = recurrence.validate(rule)
+    if rule is not None and deadline is None:
+        raise recurrence.RecurrenceError("Для повторяющейся задачи нужен дедлайн")
+    return rule
+
+def _advance_recurring(c, task_ids, now=None):
+    """Переносит дедлайны невыполненных повторяющихся задач из task_ids на
+    следующее повторение и сбрасывает статус их подзадач.
+
+    Следующее повторение - первое позже текущего дедлайна и позже текущего
+    момента: пропущенные повторения не накапливаются. В базе остается одна
+    строка задачи, поэтому таблица не растет с каждым повторением.
+    """
+    now = int(time.time()) if now is None else now
+    updates = []
+    for chunk in _chunks(list(task_ids)):
+        placeholders = ", ".join("?" * len(chunk))
+        c.execute(f"""
+            SELECT id, deadline, recurrence
+            FROM tasks
+            WHERE id IN ({placeholders}) AND recurrence IS NOT NULL AND status = 0
+        """, chunk)
+        for task_id, deadline, rule in c.fetchall():
+            if deadline is None:
+                deadline = now
+            updates.append((recurrence.next_occurrence(rule, deadline, max(deadline, now)), task_id))
+    if updates:
+        c.executemany("UPDATE tasks SET deadline = ? WHERE id = ?", updates)
+        c.executemany(
+            "UPDATE sub_tasks SET status = 0 WHERE task_id = ? AND status = 1",
+            [(task_id,) for _, task_id in updates]
+        )
+
+@profiling.profiled
 def delete_task(task_id):
-    """Удаляет задачу и все её подзадачи из базы данных."""
-    conn = None
+    """Удаляет задачу и все её подзадачи из базы данных.
+
+    Возвращает ID удаленной задачи или None, если задача не найдена.
+    """
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-        conn.commit()
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            deleted = c.rowcount > 0
+            return task_id if deleted else None
     except Exception as e:
         print(f"Ошибка при удалении задачи: {str(e)}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled
 def load_tasks():
     """Загружает все задачи из базы данных."""
-    conn = None
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("""
-            SELECT id, description, status, deadline 
-            FROM tasks 
-            ORDER BY created_at DESC
-        """)
-        tasks = c.fetchall()
-        return tasks
+        with connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT id, description, status, deadline, created_at
+                FROM tasks 
+                ORDER BY created_at DESC, id DESC
+            """)
+            tasks = c.fetchall()
+            return tasks
     except Exception as e:
         print(f"Ошибка при загрузке задач: {str(e)}")
         raise
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled
 def load_subtasks(task_id):
     """Загружает подзадачи для заданной задачи."""
-    conn = None
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("""
-            SELECT id, description, status 
-            FROM sub_tasks 
-            WHERE task_id = ? 
-            ORDER BY created_at ASC
-        """, (task_id,))
-        subtasks = c.fetchall()
-        return subtasks
+        with connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT id, description, status 
+                FROM sub_tasks 
+                WHERE task_id = ? 
+                ORDER BY created_at ASC
+            """, (task_id,))
+            subtasks = c.fetchall()
+            return subtasks
     except Exception as e:
         print(f"Ошибка при загрузке подзадач: {str(e)}")
         raise
-    finally:
-        if conn:
-            conn.close()
 
+def _load_subtasks_grouped(c, where="", params=()):
+    """Загружает подзадачи одним запросом и группирует их по ID задачи."""
+    c.execute(f"""
+        SELECT task_id, id, description, status
+        FROM sub_tasks
+        {where}
+        ORDER BY task_id, created_at ASC
+    """, params)
+    grouped = {}
+    for task_id, subtask_id, description, status in c.fetchall():
+        grouped.setdefault(task_id, []).append((subtask_id, description, status))
+    return grouped
+
+@profiling.profiled
+def load_tasks_with_subtasks():
+    """Загружает все задачи вместе с подзадачами за два запроса.
+
+    Возвращает список пар (строка задачи, список подзадач).
+    """
+    try:
+        with connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT id, description, status, deadline, created_at
+                FROM tasks
+                ORDER BY created_at DESC, id DESC
+            """)
+            tasks = c.fetchall()
+            subtasks = _load_subtasks_grouped(c)
+            return [(task, subtasks.get(task[0], [])) for task in tasks]
+    except Exception as e:
+        print(f"Ошибка при загрузке задач: {str(e)}")
+        raise
+
+# Сколько задач загружается за одну страницу списка
+PAGE_SIZE = 200
+
+@profiling.profiled
+def load_tasks_page(status, after=None, limit=PAGE_SIZE):
+    """Загружает страницу задач со статусом (строки в формате TASK_COLUMNS).
+
+    Задачи упорядочены как в load_tasks (новые первыми). after - ключ
+    (created_at, id) последней задачи предыдущей страницы или None для первой
+    страницы. Возвращает (строки задач, есть ли еще задачи).
+    """
+    try:
+        with connection() as conn:
+            c = conn.cursor()
+            if after is None:
+                c.execute(f"""
+                    SELECT {TASK_COLUMNS}
+                    FROM tasks t
+                    WHERE t.status = ?
+                    ORDER BY t.created_at DESC, t.id DESC
+                    LIMIT ?
+                """, (status, limit + 1))
+            else:
+                c.execute(f"""
+                    SELECT {TASK_COLUMNS}
+                    FROM tasks t
+                    WHERE t.status = ? AND (t.created_at, t.id) < (?, ?)
+                    ORDER BY t.created_at DESC, t.id DESC
+                    LIMIT ?
+                """, (status, *after, limit + 1))
+            # Лишняя строка только показывает, что страница не последняя
+            rows = c.fetchall()
+            return rows[:limit], len(rows) > limit
+    except Exception as e:
+        print(f"Ошибка при загрузке страницы задач: {str(e)}")
+        raise
+
+@profiling.profiled
+def load_pending_deadlines():
+    """Возвращает пары (ID, дедлайн) всех невыполненных задач с дедлайном."""
+    try:
+        with connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT id, deadline
+                FROM tasks INDEXED BY idx_tasks_pending_deadline
+                WHERE status = 0 AND deadline IS NOT NULL
+            """)
+            return c.fetchall()
+    except Exception as e:
+        print(f"Ошибка при загрузке дедлайнов: {str(e)}")
+        raise
+
+@profiling.profiled
 def add_subtask(task_id, description):
-    """Добавляет подзадачу для указанной задачи."""
-    conn = None
+    """Добавляет подзадачу для указанной задачи.
+
+    Возвращает (строка подзадачи, строка задачи с обновленной сводкой подзадач).
+    """
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO sub_tasks (task_id, description) VALUES (?, ?)",
-            (task_id, description)
-        )
-        conn.commit()
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute(
+                "INSERT INTO sub_tasks (task_id, description) VALUES (?, ?)",
+                (task_id, description)
+            )
+            subtask = _fetch_subtask(c, c.lastrowid)
+            return subtask, _fetch_task(c, task_id)
     except Exception as e:
         print(f"Ошибка при добавлении подзадачи: {str(e)}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled
 def check_overdue_tasks(now):
-    """Проверяет задачи, у которых истек срок дедлайна."""
-    conn = None
+    """Проверяет задачи, у которых истек срок дедлайна (now - Unix-время)."""
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("""
-            SELECT description 
-            FROM tasks 
-            WHERE deadline < ? AND status = 0
-        """, (now,))
-        tasks = c.fetchall()
-        return tasks
+        with connection() as conn:
+            c = conn.cursor()
+            # Без статистики ANALYZE планировщик предпочел бы равенство по status
+            # в idx_tasks_status_created, хотя частичный индекс дедлайнов меньше
+            c.execute("""
+                SELECT description 
+                FROM tasks INDEXED BY idx_tasks_pending_deadline
+                WHERE deadline < ? AND status = 0
+            """, (now,))
+            tasks = c.fetchall()
+            return tasks
     except Exception as e:
         print(f"Ошибка при проверке просроченных задач: {str(e)}")
         raise
-    finally:
-        if conn:
-            conn.close()
 
-def search_tasks(search_term):
-    """Поиск задач по тексту."""
-    conn = None
+def _search_matching_tasks(c, search_term, limit=None):
+    """Выполняет поиск и возвращает не больше limit строк задач (None - все).
+
+    Пустая строка поиска возвращает все задачи.
+    """
+    # LIMIT -1 в SQLite снимает ограничение
+    limit = -1 if limit is None else limit
+    query, params = _search_query(c, search_term)
+    if query is None:
+        c.execute(f"""
+            SELECT {TASK_COLUMNS}
+            FROM tasks t
+            ORDER BY t.created_at DESC, t.id DESC
+            LIMIT ?
+        """, (limit,))
+        return c.fetchall()
+    c.execute(f"""
+        SELECT {TASK_COLUMNS}
+        FROM ({query}) AS found
+        JOIN tasks t ON t.id = found.task_id
+        ORDER BY found.score, t.created_at DESC, t.id DESC
+        LIMIT ?
+    """, (*params, limit))
+    return c.fetchall()
+
+@profiling.profiled
+def search_tasks(search_term, is_cancelled=None, limit=None):
+    """Поиск задач по тексту задачи и её подзадач.
+
+    Слова ищутся по префиксу, результаты (строки в формате TASK_COLUMNS)
+    упорядочены по релевантности; limit ограничивает их число в самом
+    запросе (None - без ограничения). is_cancelled - необязательная функция без
+    аргументов: если она вернет True, выполняемый запрос прерывается
+    исключением QueryCancelled.
+    """
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        search_pattern = f"%{search_term}%"
-        c.execute("""
-            SELECT id, description, status, deadline 
-            FROM tasks 
-            WHERE description LIKE ? 
-            ORDER BY created_at DESC
-        """, (search_pattern,))
-        tasks = c.fetchall()
-        return tasks
+        with connection() as conn, cancellable(conn, is_cancelled):
+            return _search_matching_tasks(conn.cursor(), search_term, limit)
+    except QueryCancelled:
+        raise
     except Exception as e:
         print(f"Ошибка при поиске задач: {str(e)}")
         raise
-    finally:
-        if conn:
-            conn.close()
 
+@profiling.profiled
 def update_subtask_status(subtask_id, status):
-    """Обновляет статус подзадачи."""
-    conn = None
+    """Обновляет статус подзадачи.
+
+    Возвращает (строка подзадачи, строка задачи с обновленной сводкой подзадач)
+    или None, если подзадача не найдена.
+    """
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("UPDATE sub_tasks SET status = ? WHERE id = ?", (status, subtask_id))
-        conn.commit()
+        with transaction() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE sub_tasks SET status = ? WHERE id = ?", (status, subtask_id))
+            subtask = _fetch_subtask(c, subtask_id)
+            if subtask is None:
+                return None
+            return subtask, _fetch_task(c, subtask[1])
     except Exception as e:
         print(f"Ошибка при обновлении статуса подзадачи: {str(e)}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
+
+# Сколько значений подставлять в один запрос IN (...): старые сборки SQLite
+# ограничивают число параметров запроса 999.
+BULK_CHUNK_SIZE = 500
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _fetch_tasks(c, task_ids):
+    """Возвращает строки задач с указанными ID в порядке возрастания ID."""
+    rows = []
+    for chunk in _chunks(list(task_ids)):
+        placeholders = ", ".join("?" * len(chunk))
+        c.execute(f"""
+            SELECT {TASK_COLUMNS}
+            FROM tasks t
+            WHERE t.id IN ({placeholders})
+            ORDER BY t.id
+        """, chunk)
+        rows.extend(c.fetchall())
+    return rows
+
+@profiling.profiled
+def load_tasks_by_id(task_ids):
+    """Загружает задачи с указанными ID (строки в формате TASK_COLUMNS).
+
+    Строки идут в порядке возрастания ID; несуществующие ID пропускаются.
+    """
+    try:
+        with connection() as conn:
+            return _fetch_tasks(conn.cursor(), task_ids)
+    except Exception as e:
+        print(f"Ошибка при загрузке задач: {str(e)}")
+        raise
+
+@profiling.profiled
+def add_tasks(tasks):
+    """Добавляет много задач с подзадачами одной транзакцией.
+
+    tasks - последовательность (описание, дедлайн, список описаний подзадач).
+    Возвращает строки задач (в формате TASK_COLUMNS) в порядке tasks.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    try:
+        with transaction() as conn:
+            c = conn.cursor()
+            c.executemany(
+                "INSERT INTO tasks (description, status, deadline) VALUES (?, 0, ?)",
+                [(description, deadline) for description, deadline, _ in tasks]
+            )
+            # Внутри одной транзакции записи захвачены нами, поэтому
+            # AUTOINCREMENT выдает задачам подряд идущие ID.
+            last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+            task_ids = range(last_id - len(tasks) + 1, last_id + 1)
+
+            c.executemany(
+                "INSERT INTO sub_tasks (task_id, description) VALUES (?, ?)",
+                [
+                    (task_id, subtask)
+                    for task_id, (_, _, subtasks) in zip(task_ids, tasks)
+                    for subtask in subtasks
+                ]
+            )
+
+            rows = _fetch_tasks(c, task_ids)
+            if [row[0] for row in rows] != list(task_ids):
+                raise sqlite3.DatabaseError("Не удалось определить ID добавленных задач")
+            return rows
+    except Exception as e:
+        print(f"Ошибка при добавлении задач: {str(e)}")
+        raise
+
+@profiling.profiled
+def update_tasks_status(task_ids, status):
+    """Обновляет статус многих задач одной транзакцией и возвращает их строки.
+
+    Повторяющиеся задачи обрабатываются как в update_task_status.
+    """
+    task_ids = list(task_ids)
+    try:
+        with transaction() as conn:
+            c = conn.cursor()
+            if status == 1:
+                _advance_recurring(c, task_ids)
+            c.executemany(_STATUS_UPDATES[status], [(status, task_id) for task_id in task_ids])
+            return _fetch_tasks(c, task_ids)
+    except Exception as e:
+        print(f"Ошибка при обновлении статуса задач: {str(e)}")
+        raise
+
+@profiling.profiled
+def delete_tasks(task_ids):
+    """Удаляет многие задачи (и их подзадачи) одной транзакцией.
+
+    Возвращает ID задач, которые действительно были удалены.
+    """
+    task_ids = list(task_ids)
+    try:
+        with transaction() as conn:
+            c = conn.cursor()
+            existing = [row[0] for row in _fetch_tasks(c, task_ids)]
+            c.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in existing])
+            return existing
+    except Exception as e:
+        print(f"Ошибка при удалении задач: {str(e)}")
+        raise
+
+# --- Импорт и экспорт (см. transfer.py) ---
+
+@profiling.profiled
+def count_tasks():
+    """Возвращает общее число задач."""
+    try:
+        with connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    except Exception as e:
+        print(f"Ошибка при подсчете задач: {str(e)}")
+        raise
+
+def iter_tasks_with_subtasks(batch_size=BULK_CHUNK_SIZE):
+    """Генератор всех задач с подзадачами по возрастанию ID задачи.
+
+    Выдает пары ((описание, статус, дедлайн, дата создания, правило повторения),
+    [(описание, статус, дата создания), ...]). Задачи и подзадачи читаются
+    двумя курсорами порциями по batch_size строк и сливаются по ID задачи,
+    поэтому в памяти одновременно находятся лишь несколько порций. Пока оба
+    запроса не завершены, они читают один снимок базы.
+    """
+    with connection() as conn:
+        tasks = conn.execute("""
+            SELECT id, description, status, deadline, created_at, recurrence
+            FROM tasks
+            ORDER BY id
+        """)
+        sub_tasks = conn.execute("""
+            SELECT task_id, description, status, created_at
+            FROM sub_tasks
+            ORDER BY task_id, created_at
+        """)
+        try:
+            pending = _iter_batches(sub_tasks, batch_size)
+            subtask = next(pending, None)
+            for task_id, *task in _iter_batches(tasks, batch_size):
+                # Подзадачи без задачи (task_id меньше текущего или NULL) пропускаются
+                while subtask is not None and (subtask[0] is None or subtask[0] < task_id):
+                    subtask = next(pending, None)
+                subtasks = []
+                while subtask is not None and subtask[0] == task_id:
+                    subtasks.append(tuple(subtask[1:]))
+                    subtask = next(pending, None)
+                yield tuple(task), subtasks
+        finally:
+            tasks.close()
+            sub_tasks.close()
+
+def _iter_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+@profiling.profiled
+def import_tasks(tasks):
+    """Добавляет порцию импортированных задач одной транзакцией.
+
+    tasks - последовательность (описание, статус, дедлайн, дата создания,
+    правило повторения, подзадачи), подзадачи - последовательность
+    (описание, статус, дата создания). Пустая дата создания заменяется
+    текущим временем. Правила повторения должны быть уже проверены
+    (recurrence.validate). Возвращает число добавленных задач.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return 0
+    try:
+        with transaction() as conn:
+            c = conn.cursor()
+            c.executemany(
+                f"""
+                INSERT INTO tasks (description, status, deadline, created_at, recurrence)
+                VALUES (?, ?, ?, COALESCE(?, {EPOCH_NOW}), ?)
+                """,
+                [task[:5] for task in tasks]
+            )
+            # Как и в add_tasks, ID задач транзакции идут подряд
+            last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+            task_ids = range(last_id - len(tasks) + 1, last_id + 1)
+            # Проверяем до вставки подзадач: иначе они молча достались бы чужим задачам
+            added = c.execute(
+                "SELECT COUNT(*) FROM tasks WHERE id BETWEEN ? AND ?", (task_ids[0], task_ids[-1])
+            ).fetchone()[0]
+            if added != len(tasks):
+                raise sqlite3.DatabaseError("Не удалось определить ID импортированных задач")
+            c.executemany(
+                f"""
+                INSERT INTO sub_tasks (task_id, description, status, created_at)
+                VALUES (?, ?, ?, COALESCE(?, {EPOCH_NOW}))
+                """,
+                [
+                    (task_id, *subtask)
+                    for task_id, task in zip(task_ids, tasks)
+                    for subtask in task[5]
+                ]
+            )
+            return len(tasks)
+    except Exception as e:
+        print(f"Ошибка при импорте задач: {str(e)}")
+        raise
@@ -0,0 +1,49 @@
+"""Общий кэш иконок qtawesome.
+
+Иконка qtawesome заново рисует символ шрифта при каждой отрисовке, поэтому
+иконки рендерятся один раз в растровые изображения и затем переиспользуются.
+Цвет - часть ключа кэша, так что иконки светлой и темной темы хранятся
+отдельно и при переключении темы не перерисовываются.
+
+qtawesome импортируется при первом запросе иконки: импорт и загрузка файлов
+шрифтов занимают заметную часть запуска, а первый кадр окна рисуется без
+иконок.
+"""
+from PyQt5.QtGui import QGuiApplication, QIcon
+
+# Размеры, в которых рендерятся иконки виджетов (кнопки, вкладки)
+ICON_SIZES = (16, 24, 32)
+
+_icons = {}
+_pixmaps = {}
+
+
+def _render(name, color, size):
+    import qtawesome as qta
+
+    ratio = QGuiApplication.instance().devicePixelRatio()
+    pixmap = qta.icon(name, color=color).pixmap(int(size * ratio), int(size * ratio))
+    pixmap.setDevicePixelRatio(ratio)
+    return pixmap
+
+
+def pixmap(name, color, size):
+    """Возвращает иконку размером size x size (в логических пикселях) для
+    рисования через QPainter.drawPixmap, рендеря её только один раз."""
+    key = (name, color, size)
+    cached = _pixmaps.get(key)
+    if cached is None:
+        cached = _pixmaps[key] = _render(name, color, size)
+    return cached
+
+
+def icon(name, color):
+    """Возвращает QIcon для виджетов, собранный из заранее отрендеренных
+    изображений размеров ICON_SIZES."""
+    key = (name, color)
+    cached = _icons.get(key)
+    if cached is None:
+        cached = _icons[key] = QIcon()
+        for size in ICON_SIZES:
+            cached.addPixmap(pixmap(name, color, size))
+    return cached
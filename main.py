@@ -1,25 +1,103 @@
+import time
+
+# Момент запуска для --startup-report: до импорта PyQt5 и модулей приложения
+STARTED = time.time()
+
+import argparse
+import json
 import sys
 import traceback
-from PyQt5.QtWidgets import QApplication, QMessageBox
-from ui import ToDoApp
-import db
+
+# Команды командной строки (cli.py) выполняются без PyQt5
+CLI_COMMANDS = ("add", "list", "search", "complete", "import", "export", "serve")
+
+
+def is_cli(argv):
+    """Проверяет, запрошена ли команда командной строки (возможно, после --db)."""
+    if argv[:1] == ["--db"]:
+        argv = argv[2:]
+    elif argv and argv[0].startswith("--db="):
+        argv = argv[1:]
+    return bool(argv) and argv[0] in CLI_COMMANDS
+
+
+def parse_args(argv):
+    """Разбирает собственные параметры приложения; остальные получает Qt."""
+    parser = argparse.ArgumentParser(description="Умный планировщик задач")
+    parser.add_argument("--profile", action="store_true",
+                        help="собирать статистику задержек и SQL-запросов (панель - F12) "
+                             "и вывести её при выходе")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="профилировать поток GUI через cProfile и сохранить результат в FILE")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="вывести в JSON время до первого кадра и до загрузки задач и выйти")
+    return parser.parse_known_args(argv)
+
+
+def report_startup(window, app):
+    """Выводит моменты первого кадра и готовности окна и завершает приложение.
+
+    В отчете абсолютное время (time.time()) - по нему замер запуска считает
+    время от старта процесса - и секунды от начала выполнения main.py.
+    """
+    report = {"started": STARTED}
+
+    def first_frame():
+        report["first_frame"] = time.time()
+
+    def interactive():
+        report["interactive"] = time.time()
+        report["first_frame_s"] = report["first_frame"] - STARTED
+        report["interactive_s"] = report["interactive"] - STARTED
+        print(json.dumps(report), flush=True)
+        app.quit()
+
+    window.firstFramePainted.connect(first_frame)
+    window.tasksLoaded.connect(interactive)
 
 
 def main():
+    # Командная строка: PyQt5 и модули интерфейса не импортируются вовсе
+    if is_cli(sys.argv[1:]):
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+    from ui import ToDoApp, set_profiling
+    import db
+    import profiling
+
     try:
-        app = QApplication(sys.argv)
-        
+        args, qt_args = parse_args(sys.argv[1:])
+        if args.profile or args.profile_output:
+            set_profiling(True)
+        if args.profile_output:
+            profiling.start_cprofile()
+
+        app = QApplication(sys.argv[:1] + qt_args)
+
         # Создаем таблицы базы данных
         try:
             db.create_tables()
         except Exception as e:
-            QMessageBox.critical(None, "Ошибка базы данных", 
+            QMessageBox.critical(None, "Ошибка базы данных",
                 f"Не удалось создать таблицы базы данных:\n{str(e)}")
             return
-        
+
         window = ToDoApp()
+        # Сначала дожидаемся фоновых потоков, затем закрываем соединения
+        app.aboutToQuit.connect(window.shutdown)
+        app.aboutToQuit.connect(db.close_connections)
+        if args.startup_report:
+            report_startup(window, app)
         window.show()
-        sys.exit(app.exec_())
+        exit_code = app.exec_()
+
+        if profiling.is_enabled():
+            print(profiling.report())
+        if args.profile_output and profiling.dump_cprofile(args.profile_output):
+            print(f"Профиль cProfile сохранен в {args.profile_output}")
+        sys.exit(exit_code)
     except Exception as e:
         error_msg = f"Произошла ошибка:\n{str(e)}\n\n{traceback.format_exc()}"
         print(error_msg)  # Выводим в консоль для отладки
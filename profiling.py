@@ -0,0 +1,198 @@
+"""Легковесное профилирование горячих путей приложения.
+
+Функции отмечаются декоратором profiled, участки кода - контекстом span.
+Пока профилирование выключено, обертки только проверяют флаг. Включенное
+профилирование собирает для каждого имени число вызовов, задержки
+p50/p99 и число SQL-запросов, выполненных внутри (запросы считает
+db.trace_queries). Запросы, выполненные потоком базы данных по заданию
+действия интерфейса, засчитываются этому действию (см. attributed).
+"""
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Сколько последних замеров каждого имени хранится для расчета процентилей
+MAX_SAMPLES = 10000
+
+_enabled = False
+_lock = threading.Lock()
+_stats = {}
+# Стек активных участков потока: списки [имя, число запросов]
+_local = threading.local()
+_profiler = None
+
+
+class SpanStats:
+    """Накопленная статистика одного имени."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.queries = 0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def percentile(self, percent):
+        """Процентиль задержки в секундах по последним замерам."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Сбрасывает накопленную статистику."""
+    with _lock:
+        _stats.clear()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _record(name, elapsed, queries):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = SpanStats()
+        if elapsed is not None:
+            stats.count += 1
+            stats.total += elapsed
+            stats.samples.append(elapsed)
+        stats.queries += queries
+
+
+@contextmanager
+def span(name):
+    """Замеряет время выполнения блока и число SQL-запросов в нем."""
+    if not _enabled:
+        yield
+        return
+    frame = [name, 0]
+    stack = _stack()
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        _record(name, elapsed, frame[1])
+
+
+def profiled(func):
+    """Декоратор: каждый вызов функции - участок с именем модуль.функция."""
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def current_action():
+    """Имя самого внешнего активного участка потока или None."""
+    stack = getattr(_local, "stack", None)
+    return stack[0][0] if stack else None
+
+
+@contextmanager
+def attributed(action):
+    """Засчитывает запросы блока действию action, начатому в другом потоке.
+
+    Время блока действию не добавляется: оно уже учтено в других участках.
+    """
+    if not _enabled or action is None:
+        yield
+        return
+    frame = [action, 0]
+    stack = _stack()
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        _record(action, None, frame[1])
+
+
+def count_query(statement):
+    """Обработчик трассировки sqlite3: учитывает запрос во всех активных участках.
+
+    Внутренние запросы SQLite (триггеры FTS5 и т.п.) приходят как комментарии
+    "-- ..." и не учитываются.
+    """
+    stack = getattr(_local, "stack", None)
+    if stack and not statement.startswith("--"):
+        for frame in stack:
+            frame[1] += 1
+
+
+def snapshot():
+    """Статистика по всем именам: список словарей, самые затратные первыми."""
+    with _lock:
+        rows = [
+            {
+                "name": name,
+                "count": stats.count,
+                "total": stats.total,
+                "p50": stats.percentile(50),
+                "p99": stats.percentile(99),
+                "queries": stats.queries,
+            }
+            for name, stats in _stats.items()
+        ]
+    rows.sort(key=lambda row: row["total"], reverse=True)
+    return rows
+
+
+def report():
+    """Статистика в виде текстовой таблицы."""
+    lines = [
+        f"{'участок':<44} {'вызовов':>8} {'всего, мс':>10} {'p50, мс':>9} {'p99, мс':>9} {'запросов':>9}"
+    ]
+    for row in snapshot():
+        lines.append(
+            f"{row['name']:<44} {row['count']:>8} {row['total'] * 1000:>10.1f} "
+            f"{row['p50'] * 1000:>9.2f} {row['p99'] * 1000:>9.2f} {row['queries']:>9}"
+        )
+    return "\n".join(lines)
+
+
+def start_cprofile():
+    """Запускает cProfile в текущем потоке (обычно в потоке GUI)."""
+    global _profiler
+    if _profiler is None:
+        # cProfile нужен только при профилировании: не замедляем им запуск
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def dump_cprofile(path):
+    """Останавливает cProfile и сохраняет результат для pstats/snakeviz."""
+    global _profiler
+    if _profiler is None:
+        return False
+    _profiler.disable()
+    _profiler.dump_stats(path)
+    _profiler = None
+    return True
@@ -0,0 +1,182 @@
+"""Правила повторения задач.
+
+Правило хранится в tasks.recurrence строкой:
+    daily                   - каждый день во время дедлайна
+    weekly                  - каждую неделю в день и время дедлайна
+    weekdays                - по будням во время дедлайна
+    cron M H DOM MON DOW    - по расписанию в синтаксисе cron (местное время):
+                              минута, час, день месяца, месяц, день недели
+                              (0 или 7 - воскресенье); поддерживаются *, списки
+                              через запятую, диапазоны a-b и шаг /n
+
+У повторяющейся задачи в базе одна строка: дедлайн - ближайшее
+невыполненное повторение. Остальные повторения не сохраняются, а
+вычисляются по требованию (occurrences); при выполнении задачи дедлайн
+переносится на следующее повторение (next_occurrence).
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
+
+DAILY = "daily"
+WEEKLY = "weekly"
+WEEKDAYS = "weekdays"
+CRON_PREFIX = "cron "
+
+# Названия правил для интерфейса
+NAMES = {
+    DAILY: "ежедневно",
+    WEEKLY: "еженедельно",
+    WEEKDAYS: "по будням",
+}
+
+# Поля cron: (название, минимум, максимум)
+CRON_FIELDS = (
+    ("минута", 0, 59),
+    ("час", 0, 23),
+    ("день месяца", 1, 31),
+    ("месяц", 1, 12),
+    ("день недели", 0, 7),
+)
+
+# Сколько дней вперед ищется совпадение с расписанием cron: достаточно для
+# любого выполнимого расписания, включая 29 февраля
+CRON_SEARCH_DAYS = 8 * 366
+
+
+class RecurrenceError(ValueError):
+    """Некорректное правило повторения."""
+
+
+def _parse_field(text, name, low, high):
+    values = set()
+    for part in text.split(","):
+        value_range, _, step = part.partition("/")
+        try:
+            step = int(step) if step else 1
+            if value_range == "*":
+                start, end = low, high
+            elif "-" in value_range:
+                start, end = (int(value) for value in value_range.split("-", 1))
+            else:
+                start = int(value_range)
+                end = high if step > 1 else start
+        except ValueError:
+            raise RecurrenceError(f"Некорректное поле cron ({name}): {text}") from None
+        if step < 1 or not low <= start <= end <= high:
+            raise RecurrenceError(f"Значение вне диапазона {low}-{high} в поле cron ({name}): {text}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@lru_cache(maxsize=256)
+def _parse_cron(expression):
+    fields = expression.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise RecurrenceError(f"В расписании cron должно быть 5 полей: {expression}")
+    minutes, hours, days, months, weekdays = (
+        _parse_field(text, *field) for text, field in zip(fields, CRON_FIELDS)
+    )
+    # В cron воскресенье - 0 или 7, в Python - 6; понедельник - 1 и 0
+    weekdays = frozenset((day - 1) % 7 for day in weekdays)
+    # Как в cron: если ограничены и день месяца, и день недели, подходит любой из них
+    either_day = fields[2] != "*" and fields[4] != "*"
+    return sorted(minutes), sorted(hours), days, months, weekdays, either_day
+
+
+def _cron_next(expression, after):
+    """Первое совпадение с расписанием позже after (datetime)."""
+    minutes, hours, days, months, weekdays, either_day = _parse_cron(expression)
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    date = start.date()
+    for _ in range(CRON_SEARCH_DAYS):
+        day_matches = date.day in days
+        weekday_matches = date.weekday() in weekdays
+        if either_day:
+            matches = day_matches or weekday_matches
+        else:
+            matches = day_matches and weekday_matches
+        if date.month in months and matches:
+            for hour in hours:
+                for minute in minutes:
+                    candidate = datetime(date.year, date.month, date.day, hour, minute)
+                    if candidate >= start:
+                        return candidate
+        date += timedelta(days=1)
+    raise RecurrenceError(f"Расписание cron никогда не выполняется: {expression}")
+
+
+def validate(rule):
+    """Проверяет правило и возвращает его без лишних пробелов (None, если
+    правило пустое). Некорректное правило - RecurrenceError."""
+    if rule is None or not rule.strip():
+        return None
+    rule = " ".join(rule.split())
+    if rule in NAMES:
+        return rule
+    if rule.startswith(CRON_PREFIX):
+        expression = rule[len(CRON_PREFIX):]
+        _parse_cron(expression)
+        # Расписание, которое никогда не выполняется (например, 31 февраля)
+        _cron_next(expression, datetime(2000, 1, 1))
+        return rule
+    raise RecurrenceError(
+        f"Неизвестное правило повторения: {rule} "
+        f"(допустимо: {', '.join(NAMES)} или cron M H DOM MON DOW)"
+    )
+
+
+def describe(rule):
+    """Название правила для интерфейса."""
+    if rule.startswith(CRON_PREFIX):
+        return f"по расписанию {rule[len(CRON_PREFIX):]}"
+    return NAMES.get(rule, rule)
+
+
+def next_occurrence(rule, deadline, after):
+    """Возвращает первое повторение позже after.
+
+    deadline - текущий дедлайн задачи (Unix-время): повторения daily, weekly
+    и weekdays идут в его время суток (и день недели для weekly). Время
+    считается в местном часовом поясе, поэтому при переходе на летнее время
+    повторение остается в то же время по часам.
+    """
+    anchor = datetime.fromtimestamp(deadline)
+    after_time = datetime.fromtimestamp(after)
+    if rule == DAILY or rule == WEEKLY:
+        step = 1 if rule == DAILY else 7
+        if anchor > after_time:
+            return deadline
+        # Пропускаем целые периоды сразу, а не по одному
+        periods = (after_time - anchor).days // step
+        candidate = anchor + timedelta(days=periods * step)
+        while candidate <= after_time:
+            candidate += timedelta(days=step)
+        return int(candidate.timestamp())
+    if rule == WEEKDAYS:
+        # cron считает с точностью до минуты; секунды дедлайна сохраняются
+        offset = timedelta(seconds=anchor.second)
+        expression = f"{anchor.minute} {anchor.hour} * * 1-5"
+        return int((_cron_next(expression, after_time - offset) + offset).timestamp())
+    if rule.startswith(CRON_PREFIX):
+        return int(_cron_next(rule[len(CRON_PREFIX):], after_time).timestamp())
+    raise RecurrenceError(f"Неизвестное правило повторения: {rule}")
+
+
+def occurrences(rule, deadline, start, end=None):
+    """Генератор повторений задачи от start (включительно) до end (не
+    включительно, None - без ограничения) по возрастанию.
+
+    Повторения вычисляются по одному по мере перебора, поэтому окно любой
+    длины не требует памяти, а неограниченный генератор можно обрезать
+    (см. upcoming).
+    """
+    current = deadline if deadline >= start else next_occurrence(rule, deadline, start - 1)
+    while end is None or current < end:
+        yield current
+        current = next_occurrence(rule, deadline, current)
+
+
+def upcoming(rule, deadline, count):
+    """Ближайшие count повторений, начиная с текущего дедлайна."""
+    return list(islice(occurrences(rule, deadline, deadline), count))
@@ -0,0 +1,98 @@
+import heapq
+import time
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+# QTimer принимает интервал в int32 миллисекунд, поэтому дальние дедлайны
+# ждем частями: таймер перевзводится не реже раза в сутки.
+MAX_TIMER_INTERVAL_MS = 24 * 60 * 60 * 1000
+
+
+class DeadlineScheduler(QObject):
+    """Сообщает о наступлении дедлайнов без периодического опроса базы.
+
+    Дедлайны - Unix-время из базы данных. Ближайшие хранятся в куче;
+    однократный таймер взводится на ближайший из них. Изменения задач
+    применяются по одной через schedule и cancel. Каждый дедлайн задачи
+    срабатывает ровно один раз.
+    """
+
+    # список ID задач, дедлайн которых только что наступил
+    due = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # (дедлайн, id задачи); устаревшие записи пропускаются при извлечении
+        self._heap = []
+        # id задачи -> текущий дедлайн, за которым следит планировщик
+        self._deadlines = {}
+        # id задачи -> дедлайн, о котором уже сообщено; запись удаляется,
+        # когда задача выполнена, удалена или получила другой дедлайн
+        self._fired = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire)
+
+    def reset(self, deadlines):
+        """Заменяет все отслеживаемые дедлайны парами (id задачи, дедлайн)."""
+        self._heap = []
+        self._deadlines = {}
+        fired = {}
+        for task_id, deadline in deadlines:
+            if deadline is None:
+                continue
+            if self._fired.get(task_id) == deadline:
+                fired[task_id] = deadline
+                continue
+            self._heap.append((deadline, task_id))
+            self._deadlines[task_id] = deadline
+        heapq.heapify(self._heap)
+        self._fired = fired
+        self._arm()
+
+    def schedule(self, task_id, deadline):
+        """Начинает следить за дедлайном задачи (или обновляет его)."""
+        if deadline is None:
+            self.cancel(task_id)
+            return
+        if self._deadlines.get(task_id) == deadline or self._fired.get(task_id) == deadline:
+            return
+        self._fired.pop(task_id, None)
+        entry = (deadline, task_id)
+        self._deadlines[task_id] = deadline
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._arm()
+
+    def cancel(self, task_id):
+        """Перестает следить за задачей (выполнена или удалена)."""
+        # Запись остается в куче и будет пропущена при извлечении
+        self._deadlines.pop(task_id, None)
+        self._fired.pop(task_id, None)
+
+    def stop(self):
+        self._timer.stop()
+
+    def _arm(self):
+        # Убираем с вершины кучи записи отмененных и измененных задач
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            self._timer.stop()
+            return
+        delay_ms = int((self._heap[0][0] - time.time()) * 1000)
+        self._timer.start(min(max(delay_ms, 0), MAX_TIMER_INTERVAL_MS))
+
+    def _fire(self):
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, task_id = heapq.heappop(self._heap)
+            if self._deadlines.get(task_id) != deadline:
+                continue
+            del self._deadlines[task_id]
+            self._fired[task_id] = deadline
+            due.append(task_id)
+        self._arm()
+        if due:
+            self.due.emit(due)
@@ -0,0 +1,597 @@
+"""Локальный HTTP/JSON API к базе задач (asyncio, только localhost).
+
+Запуск: python main.py [--db PATH] serve [--host 127.0.0.1] [--port 8765]
+
+Запросы и ответы - JSON (UTF-8), даты - Unix-время, как в базе. Задача
+передается объектом с полями TASK_FIELDS.
+
+    GET    /tasks?status=active|done&limit=N&after=CURSOR
+                                    страница задач (новые первыми): {"tasks": [...],
+                                    "next": CURSOR или null}; next передается в
+                                    after для следующей страницы
+    GET    /tasks/ID                задача с подзадачами ("subtasks")
+    POST   /tasks                   {"description", "deadline", "recurrence",
+                                    "subtasks": [текст, ...]} -> 201 и задача
+    PATCH  /tasks/ID                {"status": 0|1, "recurrence": правило|null}
+                                    -> задача и "skipped"; см. ниже
+    DELETE /tasks/ID                -> 204
+    POST   /tasks/ID/subtasks       {"description"} -> 201, {"subtask", "task"}
+    PATCH  /subtasks/ID             {"status": 0|1} -> {"subtask", "task"}
+    GET    /search?q=ТЕКСТ&limit=N  задачи по релевантности: {"tasks": [...]}
+    GET    /overdue                 описания просроченных задач
+    POST   /batch                   {"requests": [{"method", "path", "body"}, ...]}
+                                    -> {"results": [{"status", "body"}, ...]}
+    GET    /events                  уведомления об изменениях (server-sent events)
+
+Статус меняется так же, как в окне приложения и команде complete:
+невыполненная повторяющаяся задача не отмечается выполненной, а её дедлайн
+переносится на следующее повторение. В ответе PATCH /tasks/ID список
+"skipped" содержит ID задачи, если её статус не стал запрошенным, и пуст,
+если статус применен.
+
+Пакет /batch выполняется одной транзакцией: при первой ошибке ни одна
+операция не сохраняется, а ответ содержит ошибку и номер операции
+("index"). Пакет многих записей быстрее отдельных запросов - одна фиксация
+вместо многих.
+
+/events присылает событие task ({"action": "added|updated|deleted", "ids"})
+после каждой записи через этот сервер и событие changed, когда базу
+изменил другой процесс (например, окно приложения): сервер опрашивает
+PRAGMA data_version раз в POLL_INTERVAL, пока есть подписчики. Клиент,
+который не успевает читать события, отключается и может подключиться снова.
+
+Соединения HTTP/1.1 переиспользуются (keep-alive). Запросы к базе
+выполняются в потоках: чтения - в пуле READ_THREADS потоков, записи - в
+одном потоке по очереди, у каждого потока свое долгоживущее соединение
+(db.get_connection). Окно приложения может работать с той же базой
+одновременно: в профиле WAL чтения не ждут записей, а запись, заставшая
+чужую транзакцию, ждет её завершения (тайм-аут sqlite3). Изменения,
+сделанные через API, окно покажет после перезагрузки списка.
+
+Сервер принимает подключения только на loopback-адресе. Запросы с чужим
+заголовком Host отклоняются (защита от DNS rebinding), а тело запроса
+принимается только с Content-Type: application/json - такой запрос
+страница в браузере не может отправить на другой сайт без разрешения CORS,
+которого сервер не дает.
+"""
+import asyncio
+import ipaddress
+import itertools
+import json
+import re
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import db
+import recurrence
+from service import STATUSES, parse_deadline
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Потоки чтения; запись всегда выполняется одним потоком
+READ_THREADS = 4
+# Наибольший размер тела запроса, байт
+MAX_BODY = 8 * 1024 * 1024
+# Наибольшее число задач на странице и операций в пакете
+MAX_PAGE = 1000
+MAX_BATCH = 1000
+# Через сколько секунд простоя закрывается соединение keep-alive
+KEEPALIVE_TIMEOUT = 60
+# Как часто проверять изменения базы другими процессами, с
+POLL_INTERVAL = 0.5
+# Как часто отправлять подписчикам комментарий, чтобы соединение не
+# закрылось по простою, с
+HEARTBEAT_INTERVAL = 15
+# Сколько событий может ждать отправки одному подписчику
+EVENT_QUEUE_SIZE = 256
+
+# Поля задачи в ответах (столбцы db.TASK_COLUMNS)
+TASK_FIELDS = ("id", "description", "status", "deadline", "created_at",
+               "subtask_total", "subtask_done", "recurrence")
+
+# Допустимые значения заголовка Host (без порта)
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+class HttpError(Exception):
+    """Ошибка запроса с кодом ответа HTTP."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """Разобранный запрос: метод, путь, параметры строки запроса и тело JSON."""
+
+    def __init__(self, method, path, query=None, body=None, keep_alive=True):
+        self.method = method
+        self.path = path
+        self.query = query or {}
+        self.body = body
+        self.keep_alive = keep_alive
+        # Изменения для подписчиков /events: (действие, ID задач)
+        self.changes = []
+
+
+# --- Обработчики ---
+# Выполняются в потоке базы данных и возвращают (код ответа, тело ответа).
+# Записи выполняются внутри db.transaction(), поэтому ошибка в середине
+# обработчика откатывает все его изменения.
+
+def _task(row):
+    return dict(zip(TASK_FIELDS, row))
+
+
+def _subtask(row):
+    subtask_id, task_id, description, status = row
+    return {"id": subtask_id, "task_id": task_id, "description": description, "status": status}
+
+
+def _int_param(query, name, default, low, high):
+    value = query.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HttpError(400, f"Параметр {name} должен быть целым числом") from None
+    if not low <= value <= high:
+        raise HttpError(400, f"Параметр {name} должен быть от {low} до {high}")
+    return value
+
+
+def _body(request):
+    if not isinstance(request.body, dict):
+        raise HttpError(400, "Ожидается тело запроса - объект JSON")
+    return request.body
+
+
+def _text(body, name):
+    value = body.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise HttpError(400, f"Поле {name} должно быть непустой строкой")
+    return value.strip()
+
+
+def _status(body):
+    status = body.get("status")
+    if status not in (0, 1) or isinstance(status, bool):
+        raise HttpError(400, "Поле status должно быть 0 или 1")
+    return status
+
+
+def _deadline(value):
+    if value is None or isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return parse_deadline(value)
+    raise HttpError(400, "Поле deadline должно быть Unix-временем или строкой даты")
+
+
+def _rule(value):
+    if value is not None and not isinstance(value, str):
+        raise HttpError(400, "Поле recurrence должно быть строкой или null")
+    return recurrence.validate(value)
+
+
+def list_tasks(request):
+    status = request.query.get("status", "active")
+    if status not in STATUSES:
+        raise HttpError(400, f"Параметр status: {' или '.join(STATUSES)}")
+    limit = _int_param(request.query, "limit", db.PAGE_SIZE, 1, MAX_PAGE)
+    after = request.query.get("after")
+    if after is not None:
+        # Курсор - ключ сортировки (created_at, id) последней задачи страницы
+        try:
+            created_at, task_id = (int(part) for part in after.split(":"))
+        except ValueError:
+            raise HttpError(400, "Некорректный параметр after") from None
+        after = (created_at, task_id)
+    rows, has_more = db.load_tasks_page(STATUSES[status], after, limit)
+    cursor = f"{rows[-1][4]}:{rows[-1][0]}" if has_more else None
+    return 200, {"tasks": [_task(row) for row in rows], "next": cursor}
+
+
+def get_task(request, task_id):
+    rows = db.load_tasks_by_id([task_id])
+    if not rows:
+        raise HttpError(404, f"Задача {task_id} не найдена")
+    task = _task(rows[0])
+    task["subtasks"] = [
+        {"id": subtask_id, "description": description, "status": status}
+        for subtask_id, description, status in db.load_subtasks(task_id)
+    ]
+    return 200, task
+
+
+def add_task(request):
+    body = _body(request)
+    subtasks = body.get("subtasks") or []
+    if not isinstance(subtasks, list) or not all(
+            isinstance(text, str) and text.strip() for text in subtasks):
+        raise HttpError(400, "Поле subtasks должно быть списком непустых строк")
+    row = db.add_task(_text(body, "description"), _deadline(body.get("deadline")),
+                      _rule(body.get("recurrence")))
+    for text in subtasks:
+        _, row = db.add_subtask(row[0], text.strip())
+    request.changes.append(("added", [row[0]]))
+    return 201, _task(row)
+
+
+def update_task(request, task_id):
+    body = _body(request)
+    if "status" not in body and "recurrence" not in body:
+        raise HttpError(400, "Нужно поле status или recurrence")
+    row = None
+    skipped = []
+    if "recurrence" in body:
+        row = db.update_task_recurrence(task_id, _rule(body["recurrence"]))
+        if row is None:
+            raise HttpError(404, f"Задача {task_id} не найдена")
+    if "status" in body:
+        status = _status(body)
+        row = db.update_task_status(task_id, status)
+        if row is None:
+            raise HttpError(404, f"Задача {task_id} не найдена")
+        # Выполненная повторяющаяся задача остается невыполненной с новым дедлайном
+        if row[2] != status:
+            skipped.append(task_id)
+    request.changes.append(("updated", [task_id]))
+    return 200, {**_task(row), "skipped": skipped}
+
+
+def delete_task(request, task_id):
+    if db.delete_task(task_id) is None:
+        raise HttpError(404, f"Задача {task_id} не найдена")
+    request.changes.append(("deleted", [task_id]))
+    return 204, None
+
+
+def add_subtask(request, task_id):
+    description = _text(_body(request), "description")
+    if not db.load_tasks_by_id([task_id]):
+        raise HttpError(404, f"Задача {task_id} не найдена")
+    subtask, task = db.add_subtask(task_id, description)
+    request.changes.append(("updated", [task_id]))
+    return 201, {"subtask": _subtask(subtask), "task": _task(task)}
+
+
+def update_subtask(request, subtask_id):
+    result = db.update_subtask_status(subtask_id, _status(_body(request)))
+    if result is None:
+        raise HttpError(404, f"Подзадача {subtask_id} не найдена")
+    subtask, task = result
+    request.changes.append(("updated", [task[0]]))
+    return 200, {"subtask": _subtask(subtask), "task": _task(task)}
+
+
+def search(request):
+    term = request.query.get("q")
+    if not term:
+        raise HttpError(400, "Нужен параметр q")
+    limit = _int_param(request.query, "limit", MAX_PAGE, 1, MAX_PAGE)
+    return 200, {"tasks": [_task(row) for row in db.search_tasks(term, limit=limit)]}
+
+
+def overdue(request):
+    rows = db.check_overdue_tasks(int(time.time()))
+    return 200, {"descriptions": [description for description, in rows]}
+
+
+def batch(request):
+    items = _body(request).get("requests")
+    if not isinstance(items, list) or not items:
+        raise HttpError(400, "Поле requests должно быть непустым списком")
+    if len(items) > MAX_BATCH:
+        raise HttpError(413, f"В пакете не больше {MAX_BATCH} операций")
+    results = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+                raise HttpError(400, "Операция должна быть объектом с полями method и path")
+            url = urlsplit(item["path"])
+            if url.path in ("/batch", "/events"):
+                raise HttpError(400, f"{url.path} нельзя вызвать в пакете")
+            operation = Request(str(item.get("method", "GET")).upper(), url.path,
+                                _query(url.query), item.get("body"))
+            status, payload = dispatch(operation)
+        except (HttpError, ValueError) as e:
+            e.index = index
+            raise
+        request.changes.extend(operation.changes)
+        results.append({"status": status, "body": payload})
+    return 200, {"results": results}
+
+
+# (метод, шаблон пути, обработчик); числа из пути передаются обработчику
+ROUTES = [
+    ("GET", r"/tasks", list_tasks),
+    ("POST", r"/tasks", add_task),
+    ("GET", r"/tasks/(\d+)", get_task),
+    ("PATCH", r"/tasks/(\d+)", update_task),
+    ("DELETE", r"/tasks/(\d+)", delete_task),
+    ("POST", r"/tasks/(\d+)/subtasks", add_subtask),
+    ("PATCH", r"/subtasks/(\d+)", update_subtask),
+    ("GET", r"/search", search),
+    ("GET", r"/overdue", overdue),
+    ("POST", r"/batch", batch),
+]
+_ROUTES = [(method, re.compile(pattern), handler) for method, pattern, handler in ROUTES]
+
+
+def dispatch(request):
+    """Находит обработчик запроса и выполняет его в текущем потоке."""
+    allowed = []
+    for method, pattern, handler in _ROUTES:
+        match = pattern.fullmatch(request.path)
+        if match is None:
+            continue
+        if method != request.method:
+            allowed.append(method)
+            continue
+        args = [int(value) for value in match.groups()]
+        if method == "GET":
+            return handler(request, *args)
+        with db.transaction():
+            return handler(request, *args)
+    if allowed:
+        raise HttpError(405, f"Метод {request.method} не поддерживается, доступны: {', '.join(allowed)}")
+    raise HttpError(404, f"Нет такого адреса: {request.path}")
+
+
+def _query(text):
+    return {name: values[-1] for name, values in parse_qs(text).items()}
+
+
+def _data_version():
+    """Счетчик изменений базы другими соединениями (PRAGMA data_version)."""
+    with db.connection() as conn:
+        return conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+# --- Сервер ---
+
+class TaskServer:
+    """HTTP-сервер API задач; запускается start и останавливается close
+    в цикле событий asyncio."""
+
+    def __init__(self, host=HOST, port=PORT, read_threads=READ_THREADS):
+        if host != "localhost" and not ipaddress.ip_address(host).is_loopback:
+            raise ValueError(f"Сервер принимает подключения только на localhost, а не {host}")
+        self.host = host
+        self.port = port
+        self._readers = ThreadPoolExecutor(read_threads, thread_name_prefix="api-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="api-write")
+        self._server = None
+        self._connections = set()
+        self._subscribers = set()
+        self._event_ids = itertools.count(1)
+        self._poller = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, db.create_tables)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        for queue in list(self._subscribers):
+            self._unsubscribe(queue)
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._poller is not None:
+            self._poller.cancel()
+        self._readers.shutdown()
+        self._writer.shutdown()
+        db.close_connections()
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEPALIVE_TIMEOUT)
+                except HttpError as e:
+                    await self._respond(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if request.path == "/events" and request.method == "GET":
+                    await self._stream_events(writer)
+                    break
+                status, payload = await self._execute(request)
+                await self._respond(writer, status, payload, request.keep_alive)
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # Простой, обрыв соединения или строка длиннее буфера StreamReader
+            pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Читает запрос; None - клиент закрыл соединение."""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Некорректная строка запроса") from None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= 100:
+                raise HttpError(431, "Слишком много заголовков")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        host = headers.get("host", "")
+        host = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+        if host.strip("[]") not in LOCAL_HOSTS:
+            raise HttpError(403, "Недопустимый заголовок Host")
+        if "transfer-encoding" in headers:
+            raise HttpError(411, "Нужен заголовок Content-Length")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Некорректный Content-Length") from None
+        if length > MAX_BODY:
+            raise HttpError(413, f"Тело запроса больше {MAX_BODY} байт")
+
+        body = None
+        if length:
+            data = await reader.readexactly(length)
+            if not headers.get("content-type", "").startswith("application/json"):
+                raise HttpError(415, "Тело запроса должно быть application/json")
+            try:
+                body = json.loads(data)
+            except ValueError as e:
+                raise HttpError(400, f"Некорректный JSON: {e}") from None
+
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.1":
+            keep_alive = connection != "close"
+        else:
+            keep_alive = connection == "keep-alive"
+        url = urlsplit(target)
+        return Request(method.upper(), unquote(url.path), _query(url.query), body, keep_alive)
+
+    async def _execute(self, request):
+        executor = self._readers if request.method == "GET" else self._writer
+        try:
+            status, payload = await asyncio.get_running_loop().run_in_executor(
+                executor, dispatch, request)
+        except (HttpError, ValueError) as e:
+            # ValueError - некорректные данные: дата, правило повторения
+            error = {"error": getattr(e, "message", str(e))}
+            if hasattr(e, "index"):
+                error["index"] = e.index
+            return getattr(e, "status", 400), error
+        except Exception as e:
+            print(f"Ошибка при выполнении запроса {request.method} {request.path}: {str(e)}")
+            return 500, {"error": str(e)}
+        for action, ids in request.changes:
+            self._publish("task", {"action": action, "ids": ids})
+        return status, payload
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode()
+        head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        if payload is not None:
+            head.append("Content-Type: application/json; charset=utf-8")
+        head.append(f"Content-Length: {len(body)}")
+        head.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    # --- Уведомления ---
+
+    async def _stream_events(self, writer):
+        queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_changes())
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n\r\n"
+                b"retry: 1000\n\n"
+            )
+            await writer.drain()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                else:
+                    if event is None:
+                        break
+                    event_id, name, data = event
+                    writer.write(f"id: {event_id}\nevent: {name}\ndata: {data}\n\n".encode())
+                await writer.drain()
+        finally:
+            self._subscribers.discard(queue)
+
+    def _publish(self, name, data):
+        if not self._subscribers:
+            return
+        event = (next(self._event_ids), name, json.dumps(data, ensure_ascii=False))
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Подписчик не успевает читать события: отключаем его
+                self._unsubscribe(queue)
+
+    def _unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def _poll_changes(self):
+        """Сообщает подписчикам об изменениях базы другими процессами.
+
+        Опрос идет в потоке записи: data_version его соединения не меняется
+        от собственных записей сервера, о которых подписчики уже знают.
+        """
+        loop = asyncio.get_running_loop()
+        version = await loop.run_in_executor(self._writer, _data_version)
+        while self._subscribers:
+            await asyncio.sleep(POLL_INTERVAL)
+            try:
+                current = await loop.run_in_executor(self._writer, _data_version)
+            except Exception as e:
+                print(f"Ошибка при проверке изменений базы данных: {str(e)}")
+                continue
+            if current != version:
+                version = current
+                self._publish("changed", {"source": "external"})
+
+
+async def _serve(host, port):
+    server = TaskServer(host, port)
+    await server.start()
+    loop = asyncio.get_running_loop()
+    serving = asyncio.current_task()
+    try:
+        # По SIGTERM сервер завершается так же аккуратно, как по Ctrl+C
+        loop.add_signal_handler(signal.SIGTERM, serving.cancel)
+    except (NotImplementedError, AttributeError):
+        pass  # Windows
+    print(f"API задач: http://{host}:{server.port}", flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def run(host=HOST, port=PORT):
+    """Запускает сервер до Ctrl+C; база - db.DB_FILE."""
+    try:
+        asyncio.run(_serve(host, port))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
@@ -0,0 +1,145 @@
+"""Ядро работы с задачами без графического интерфейса.
+
+TaskService выполняет операции синхронно в текущем потоке и возвращает
+записи задач в том же виде, что и кэш GUI (store.make_task). Модуль не
+импортирует PyQt5, поэтому подходит для командной строки (cli.py),
+пакетных заданий и замеров: запуск занимает миллисекунды.
+"""
+import time
+from datetime import datetime
+from itertools import islice
+
+import db
+import transfer
+from store import make_task
+
+# Форматы дедлайна, которые принимает parse_deadline (местное время)
+DEADLINE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+# Статусы задач по названию
+STATUSES = {"active": 0, "done": 1}
+
+
+def parse_deadline(text):
+    """Переводит дедлайн из текста (местное время, форматы DEADLINE_FORMATS)
+    или Unix-времени в строке в Unix-время. Пустая строка - None."""
+    if text is None or not str(text).strip():
+        return None
+    text = str(text).strip()
+    if text.lstrip("-").isdigit():
+        return int(text)
+    for fmt in DEADLINE_FORMATS:
+        try:
+            return int(datetime.strptime(text, fmt).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Некорректный дедлайн: {text} (ожидается ГГГГ-ММ-ДД [ЧЧ:ММ[:СС]])")
+
+
+def format_timestamp(timestamp):
+    """Unix-время в местном времени для вывода; None - пустая строка."""
+    if timestamp is None:
+        return ""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+class TaskService:
+    """Операции над задачами поверх db.py.
+
+    db_file - путь к базе данных (по умолчанию db.DB_FILE). Схема создается
+    или обновляется при создании объекта.
+    """
+
+    def __init__(self, db_file=None):
+        if db_file is not None and db_file != db.DB_FILE:
+            db.close_connections()
+            db.DB_FILE = db_file
+        db.create_tables()
+
+    def close(self):
+        db.close_connections()
+
+    # --- Чтение ---
+
+    def tasks(self, status=None, limit=None):
+        """Генератор задач со статусом (0, 1 или None - все), новые первыми;
+        без status - сначала невыполненные. Задачи читаются страницами
+        db.load_tasks_page по мере перебора."""
+        statuses = (0, 1) if status is None else (status,)
+        records = (task for status in statuses for task in self._pages(status))
+        return islice(records, limit)
+
+    def _pages(self, status):
+        after = None
+        while True:
+            rows, has_more = db.load_tasks_page(status, after)
+            for row in rows:
+                yield make_task(row)
+            if not has_more:
+                return
+            after = (rows[-1][4], rows[-1][0])
+
+    def task(self, task_id):
+        """Задача по ID или None."""
+        rows = db.load_tasks_by_id([task_id])
+        return make_task(rows[0]) if rows else None
+
+    def subtasks(self, task_id):
+        """Подзадачи задачи: список (ID, описание, статус)."""
+        return db.load_subtasks(task_id)
+
+    def search(self, term, limit=None):
+        """Задачи, найденные по тексту задачи и подзадач, по релевантности."""
+        if limit is not None and limit < 0:
+            raise ValueError("Число задач не может быть отрицательным")
+        return [make_task(row) for row in db.search_tasks(term, limit=limit)]
+
+    def overdue(self, now=None):
+        """Описания невыполненных задач с истекшим дедлайном."""
+        now = int(time.time()) if now is None else now
+        return [description for description, in db.check_overdue_tasks(now)]
+
+    # --- Запись ---
+
+    def add(self, description, deadline=None, rule=None, subtasks=()):
+        """Добавляет задачу с подзадачами одной транзакцией и возвращает её
+        запись. rule - правило повторения (recurrence.py) или None."""
+        description = description.strip()
+        if not description:
+            raise ValueError("Задача не может быть пустой")
+        with db.transaction():
+            row = db.add_task(description, deadline, rule)
+            for subtask in subtasks:
+                _, row = db.add_subtask(row[0], subtask)
+        return make_task(row)
+
+    def set_status(self, task_ids, status):
+        """Меняет статус задач и возвращает их записи (несуществующие ID
+        пропускаются). Выполненные повторяющиеся задачи переносятся на
+        следующее повторение."""
+        return [make_task(row) for row in db.update_tasks_status(task_ids, status)]
+
+    def complete(self, task_ids):
+        return self.set_status(task_ids, 1)
+
+    def reopen(self, task_ids):
+        return self.set_status(task_ids, 0)
+
+    def set_recurrence(self, task_id, rule):
+        """Задает или снимает правило повторения; возвращает запись задачи."""
+        row = db.update_task_recurrence(task_id, rule)
+        return make_task(row) if row is not None else None
+
+    def delete(self, task_ids):
+        """Удаляет задачи; возвращает ID действительно удаленных."""
+        return db.delete_tasks(task_ids)
+
+    # --- Импорт и экспорт ---
+
+    def import_file(self, path, fmt=None, progress=None):
+        """Импортирует задачи из файла (см. transfer.py); возвращает их число."""
+        return transfer.import_file(path, fmt, progress)
+
+    def export_file(self, path, fmt=None, progress=None):
+        """Экспортирует все задачи в файл (см. transfer.py); возвращает их число."""
+        return transfer.export_file(path, fmt, progress)
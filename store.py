@@ -0,0 +1,375 @@
+import bisect
+from collections import OrderedDict
+
+import db
+import profiling
+
+# Сколько групп подзадач держать в памяти после сворачивания задач
+SUBTASK_CACHE_SIZE = 32
+
+
+def make_task(row, subtasks=None):
+    """Создает запись задачи из строки базы данных (столбцы db.TASK_COLUMNS).
+
+    Задача создается свернутой; subtasks - список подзадач или None, если
+    они еще не загружены.
+    """
+    task_id, description, status, deadline, created_at, subtask_total, subtask_done, rule = row
+    return {
+        "id": task_id,
+        "description": description,
+        "status": status,
+        "deadline": deadline,
+        "created_at": created_at,
+        "subtask_total": subtask_total,
+        "subtask_done": subtask_done,
+        "recurrence": rule,
+        "subtasks": subtasks,
+        "expanded": False,
+    }
+
+
+def sort_key(task):
+    """Ключ сортировки задач: списки отображаются по нему по убыванию."""
+    return (task["created_at"], task["id"])
+
+
+def call_now(func, *args, on_done=None, on_error=None, **kwargs):
+    """Выполняет функцию сразу в текущем потоке.
+
+    Повторяет интерфейс DbWorker.submit, чтобы TaskStore можно было
+    использовать и без фонового потока.
+    """
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        if on_error is None:
+            raise
+        on_error(e)
+        return
+    if on_done is not None:
+        on_done(result)
+
+
+class TaskStore:
+    """Кэш задач в памяти с записью через кэш в SQLite.
+
+    Задачи каждого статуса загружаются страницами (db.load_tasks_page) от
+    новых к старым: при запуске - первая страница, дальше - по запросу
+    load_more. Пока загружены не все задачи, списки показывают только
+    загруженный диапазон. Задачи хранятся свернутыми, с числом подзадач;
+    сами подзадачи загружаются при раскрытии задачи (expand), и последние
+    SUBTASK_CACHE_SIZE групп остаются в памяти после сворачивания.
+    Изменения сначала записываются в базу через submit (например,
+    DbWorker.submit), а после успешной записи применяются к кэшу. Кэш
+    изменяется только в потоке, в котором вызываются обработчики on_done.
+    """
+
+    def __init__(self, submit=None):
+        self._submit = submit or call_now
+        self._reset()
+
+    def _reset(self):
+        self._tasks = {}
+        # Ключи sort_key задач каждого статуса по возрастанию
+        self._by_status = {0: [], 1: []}
+        # sort_key последней загруженной задачи каждого статуса или None, если
+        # загружены все задачи статуса. Задачи старше этого ключа могут быть в
+        # кэше (найдены поиском), но в списках не показываются.
+        self._loaded_until = {0: None, 1: None}
+        self._loading = set()
+        # id задачи -> список подзадач; от давно раскрытых к недавним
+        self._subtasks = OrderedDict()
+        # Увеличивается при перезагрузке, чтобы отбросить устаревшие страницы
+        self._generation = 0
+
+    # --- Чтение ---
+
+    def task(self, task_id):
+        """Возвращает запись задачи по ID или None."""
+        return self._tasks.get(task_id)
+
+    def tasks(self, status):
+        """Возвращает загруженные задачи со статусом в порядке отображения."""
+        keys = self._by_status[status]
+        loaded_until = self._loaded_until[status]
+        start = 0 if loaded_until is None else bisect.bisect_left(keys, loaded_until)
+        return [self._tasks[key[1]] for key in reversed(keys[start:])]
+
+    def has_more(self, status):
+        """Остались ли в базе незагруженные задачи со статусом."""
+        return self._loaded_until[status] is not None
+
+    def is_loaded(self, task):
+        """Попадает ли задача в загруженный диапазон своего статуса."""
+        loaded_until = self._loaded_until[task["status"]]
+        return loaded_until is None or sort_key(task) >= loaded_until
+
+    # --- Индексы ---
+
+    def _index(self, task):
+        self._tasks[task["id"]] = task
+        bisect.insort(self._by_status[task["status"]], sort_key(task))
+
+    def _unindex(self, task):
+        del self._tasks[task["id"]]
+        keys = self._by_status[task["status"]]
+        del keys[bisect.bisect_left(keys, sort_key(task))]
+
+    def _apply_task_row(self, row):
+        """Обновляет задачу в кэше по строке из базы и возвращает её запись."""
+        if row is None:
+            return None
+        task = self._tasks.get(row[0])
+        if task is None:
+            task = make_task(row, self._subtasks.get(row[0]))
+        else:
+            # Запись изменяется на месте: её же показывают модели списков
+            self._unindex(task)
+            (_, task["description"], task["status"], task["deadline"], task["created_at"],
+             task["subtask_total"], task["subtask_done"], task["recurrence"]) = row
+        self._index(task)
+        return task
+
+    def apply_rows(self, rows):
+        """Кэширует строки задач (например, результаты поиска в базе) и
+        возвращает их записи в том же порядке."""
+        return [self._apply_task_row(row) for row in rows]
+
+    def _apply_completed_rows(self, rows):
+        """Как apply_rows, но для строк задач, отмеченных выполненными.
+
+        Повторяющаяся задача при этом остается невыполненной, а база
+        сбрасывает статус её подзадач (db.update_task_status) - так же
+        обновляются и подзадачи в кэше.
+        """
+        for row in rows:
+            if row is not None and row[7] is not None and row[2] == 0:
+                subtasks = self._subtasks.get(row[0])
+                if subtasks is not None:
+                    subtasks[:] = [(subtask_id, description, 0) for subtask_id, description, _ in subtasks]
+        return self.apply_rows(rows)
+
+    def _apply_task_deleted(self, task_id):
+        task = self._tasks.get(task_id) if task_id is not None else None
+        if task is not None:
+            self._unindex(task)
+        self._subtasks.pop(task_id, None)
+        return task_id
+
+    def _apply_subtask_row(self, result):
+        """Обновляет подзадачу и счетчики её задачи; возвращает запись задачи."""
+        if result is None:
+            return None
+        (subtask_id, task_id, description, status), task_row = result
+        subtasks = self._subtasks.get(task_id)
+        if subtasks is not None:
+            subtask = (subtask_id, description, status)
+            for position, existing in enumerate(subtasks):
+                if existing[0] == subtask_id:
+                    subtasks[position] = subtask
+                    break
+            else:
+                subtasks.append(subtask)
+        if task_id not in self._tasks:
+            return None
+        return self._apply_task_row(task_row)
+
+    # --- Подзадачи ---
+
+    def expand(self, task_id, on_done=None, on_error=None):
+        """Раскрывает задачу и загружает её подзадачи, если их нет в кэше.
+
+        Запись сразу помечается раскрытой (её subtasks может быть еще None);
+        on_done получает запись задачи, когда подзадачи загружены.
+        """
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        task["expanded"] = True
+        if task_id in self._subtasks:
+            self._subtasks.move_to_end(task_id)
+            task["subtasks"] = self._subtasks[task_id]
+            if on_done is not None:
+                on_done(task)
+            return
+        generation = self._generation
+
+        def loaded(rows):
+            if generation != self._generation:
+                return
+            self._cache_subtasks(task_id, rows)
+            if on_done is not None:
+                on_done(self._tasks.get(task_id))
+
+        def failed(error):
+            task["expanded"] = False
+            if on_error is not None:
+                on_error(error)
+
+        self._submit(db.load_subtasks, task_id, on_done=loaded, on_error=failed)
+
+    def collapse(self, task_id):
+        """Сворачивает задачу; её подзадачи остаются в кэше, пока их не вытеснят."""
+        task = self._tasks.get(task_id)
+        if task is not None:
+            task["expanded"] = False
+        self._evict()
+
+    def _cache_subtasks(self, task_id, rows):
+        subtasks = self._subtasks[task_id] = list(rows)
+        self._subtasks.move_to_end(task_id)
+        task = self._tasks.get(task_id)
+        if task is not None:
+            task["subtasks"] = subtasks
+        self._evict()
+
+    def _evict(self):
+        """Забывает подзадачи давно свернутых задач сверх SUBTASK_CACHE_SIZE.
+
+        Подзадачи раскрытых задач не вытесняются.
+        """
+        excess = len(self._subtasks) - SUBTASK_CACHE_SIZE
+        for task_id in list(self._subtasks):
+            if excess <= 0:
+                break
+            task = self._tasks.get(task_id)
+            if task is not None and task["expanded"]:
+                continue
+            del self._subtasks[task_id]
+            if task is not None:
+                task["subtasks"] = None
+            excess -= 1
+
+    # --- Загрузка и запись ---
+
+    def load(self, on_done=None, on_error=None):
+        """Сбрасывает кэш и загружает первые страницы задач обоих статусов.
+
+        on_done вызывается без аргументов, когда загружены обе страницы.
+        """
+        self._reset()
+        generation = self._generation = self._generation + 1
+        pending = {0, 1}
+
+        def page_loaded(status):
+            def loaded(result):
+                if generation != self._generation:
+                    return
+                self._apply_page(status, *result)
+                pending.discard(status)
+                if not pending and on_done is not None:
+                    on_done()
+            return loaded
+
+        for status in (0, 1):
+            self._submit(
+                db.load_tasks_page, status,
+                on_done=page_loaded(status), on_error=on_error,
+            )
+
+    def load_more(self, status, on_done=None, on_error=None):
+        """Загружает следующую страницу задач со статусом.
+
+        on_done получает записи задач страницы в порядке отображения. Пока
+        страница загружается, повторные вызовы для того же статуса ничего не делают.
+        """
+        loaded_until = self._loaded_until[status]
+        if loaded_until is None:
+            if on_done is not None:
+                on_done([])
+            return
+        if status in self._loading:
+            return
+        self._loading.add(status)
+        generation = self._generation
+
+        def loaded(result):
+            if generation != self._generation:
+                return
+            self._loading.discard(status)
+            tasks = self._apply_page(status, *result)
+            if on_done is not None:
+                on_done(tasks)
+
+        def failed(error):
+            self._loading.discard(status)
+            if on_error is not None:
+                on_error(error)
+
+        # ключ sort_key - это (created_at, id), как и курсор db.load_tasks_page
+        self._submit(db.load_tasks_page, status, loaded_until, on_done=loaded, on_error=failed)
+
+    def _apply_page(self, status, rows, has_more):
+        with profiling.span("store.TaskStore.load.index"):
+            tasks = self.apply_rows(rows)
+        if has_more and tasks:
+            self._loaded_until[status] = sort_key(tasks[-1])
+        else:
+            self._loaded_until[status] = None
+        return tasks
+
+    def fetch_tasks(self, task_ids, on_done=None, on_error=None):
+        """Кэширует задачи по ID (даже вне загруженных страниц);
+        on_done получает записи найденных задач."""
+        self._write(db.load_tasks_by_id, (list(task_ids),), self.apply_rows, on_done, on_error)
+
+    def pending_deadlines(self, on_done, on_error=None):
+        """Передает в on_done пары (ID, дедлайн) всех невыполненных задач из базы."""
+        self._submit(db.load_pending_deadlines, on_done=on_done, on_error=on_error)
+
+    def _write(self, func, args, apply, on_done, on_error):
+        def written(result):
+            changed = apply(result)
+            if on_done is not None:
+                on_done(changed)
+
+        self._submit(func, *args, on_done=written, on_error=on_error)
+
+    def add_task(self, description, deadline, rule=None, on_done=None, on_error=None):
+        """Добавляет задачу (rule - правило повторения или None); on_done
+        получает её запись."""
+        self._write(db.add_task, (description, deadline, rule), self._apply_task_row, on_done, on_error)
+
+    def set_task_status(self, task_id, status, on_done=None, on_error=None):
+        """Меняет статус задачи; on_done получает её запись или None.
+
+        Выполненная повторяющаяся задача переносится на следующее повторение.
+        """
+        def apply(row):
+            return self._apply_completed_rows([row])[0] if status == 1 else self._apply_task_row(row)
+
+        self._write(db.update_task_status, (task_id, status), apply, on_done, on_error)
+
+    def set_task_recurrence(self, task_id, rule, on_done=None, on_error=None):
+        """Задает или снимает правило повторения; on_done получает запись задачи."""
+        self._write(db.update_task_recurrence, (task_id, rule), self._apply_task_row, on_done, on_error)
+
+    def delete_task(self, task_id, on_done=None, on_error=None):
+        """Удаляет задачу; on_done получает её ID или None, если задачи не было."""
+        self._write(db.delete_task, (task_id,), self._apply_task_deleted, on_done, on_error)
+
+    def add_subtask(self, task_id, description, on_done=None, on_error=None):
+        """Добавляет подзадачу; on_done получает запись задачи или None,
+        если задачи нет в кэше."""
+        self._write(db.add_subtask, (task_id, description), self._apply_subtask_row, on_done, on_error)
+
+    def set_subtask_status(self, subtask_id, status, on_done=None, on_error=None):
+        """Меняет статус подзадачи; on_done получает запись задачи."""
+        self._write(
+            db.update_subtask_status, (subtask_id, status), self._apply_subtask_row, on_done, on_error
+        )
+
+    # --- Массовые операции ---
+
+    def _apply_tasks_deleted(self, task_ids):
+        return [self._apply_task_deleted(task_id) for task_id in task_ids]
+
+    def set_tasks_status(self, task_ids, status, on_done=None, on_error=None):
+        """Меняет статус многих задач; on_done получает список их записей."""
+        apply = self._apply_completed_rows if status == 1 else self.apply_rows
+        self._write(db.update_tasks_status, (list(task_ids), status), apply, on_done, on_error)
+
+    def delete_tasks(self, task_ids, on_done=None, on_error=None):
+        """Удаляет многие задачи; on_done получает ID действительно удаленных."""
+        self._write(db.delete_tasks, (list(task_ids),), self._apply_tasks_deleted, on_done, on_error)
@@ -0,0 +1,583 @@
+import time
+from functools import lru_cache
+
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle, QToolTip, QAbstractItemView
+from PyQt5.QtCore import (
+    Qt,
+    QAbstractListModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    QRect,
+    QSize,
+    QEvent,
+    pyqtSignal,
+)
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter, QPen
+import icons
+import recurrence
+from store import sort_key
+
+# Роль, по которой делегат получает полную запись задачи
+TaskRole = Qt.UserRole + 1
+
+# Действия, которые делегат сообщает окну приложения
+ACTION_ADD_SUBTASK = "add_subtask"
+ACTION_COMPLETE = "complete"
+ACTION_UNDO = "undo"
+ACTION_DELETE = "delete"
+ACTION_COMPLETE_SUBTASK = "complete_subtask"
+ACTION_UNDO_SUBTASK = "undo_subtask"
+ACTION_TOGGLE_SUBTASKS = "toggle_subtasks"
+ACTION_STOP_RECURRENCE = "stop_recurrence"
+
+# Сколько ближайших повторений показывать в подсказке повторяющейся задачи
+UPCOMING_COUNT = 5
+
+
+@lru_cache(maxsize=4096)
+def format_deadline(deadline):
+    """Текст дедлайна (Unix-время) в местном времени; у многих задач дедлайны
+    совпадают, а строка нужна при каждой отрисовке, поэтому она кэшируется."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(deadline))
+
+
+class TaskListModel(QAbstractListModel):
+    """Модель списка задач. Хранит только данные, виджеты не создаются.
+
+    Список может быть загружен не полностью: когда представление
+    прокручивается к концу, модель испускает fetchMoreRequested, а
+    загруженная страница добавляется через append_tasks.
+    """
+
+    # представление дошло до конца неполного списка
+    fetchMoreRequested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tasks = []
+        self._by_id = {}
+        # False, если строки идут не по sort_key (например, по релевантности поиска)
+        self._ordered = True
+        # Есть ли еще незагруженные задачи и ожидается ли страница
+        self._has_more = False
+        self._fetching = False
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self._tasks[index.row()]
+        if role == Qt.DisplayRole:
+            return task["description"]
+        if role == Qt.UserRole:
+            return task["id"]
+        if role == TaskRole:
+            return task
+        return None
+
+    def set_tasks(self, tasks, ordered=True, has_more=False):
+        """Полностью заменяет содержимое модели.
+
+        ordered=False означает, что задачи идут не по sort_key (результаты
+        поиска упорядочены по релевантности): тогда новые задачи добавляются
+        в конец списка, а поиск строки выполняется перебором. has_more=True -
+        в списке показана только первая часть задач.
+        """
+        self.beginResetModel()
+        self._tasks = list(tasks)
+        self._by_id = {task["id"]: task for task in self._tasks}
+        self._ordered = ordered
+        self._has_more = has_more
+        self._fetching = False
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._fetching = True
+            self.fetchMoreRequested.emit()
+
+    def append_tasks(self, tasks, has_more):
+        """Добавляет в конец списка страницу, запрошенную через fetchMoreRequested.
+
+        Если модель с тех пор была заполнена заново, страница отбрасывается.
+        """
+        if not self._fetching:
+            return
+        self._fetching = False
+        self._has_more = has_more
+        tasks = [task for task in tasks if task["id"] not in self._by_id]
+        if not tasks:
+            return
+        first = len(self._tasks)
+        self.beginInsertRows(QModelIndex(), first, first + len(tasks) - 1)
+        self._tasks.extend(tasks)
+        for task in tasks:
+            self._by_id[task["id"]] = task
+        self.endInsertRows()
+
+    def fetch_failed(self):
+        """Страница не загрузилась: её можно будет запросить снова."""
+        self._fetching = False
+
+    def _position(self, key):
+        """Бинарный поиск позиции ключа в списке, отсортированном по убыванию."""
+        low, high = 0, len(self._tasks)
+        while low < high:
+            middle = (low + high) // 2
+            if sort_key(self._tasks[middle]) > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _row_of(self, task):
+        if not self._ordered:
+            for row, candidate in enumerate(self._tasks):
+                if candidate is task:
+                    return row
+            return -1
+        row = self._position(sort_key(task))
+        if row < len(self._tasks) and self._tasks[row] is task:
+            return row
+        return -1
+
+    def insert_task(self, task):
+        """Вставляет задачу на её место в порядке сортировки."""
+        if task["id"] in self._by_id:
+            self.remove_task(task["id"])
+        row = self._position(sort_key(task)) if self._ordered else len(self._tasks)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._tasks.insert(row, task)
+        self._by_id[task["id"]] = task
+        self.endInsertRows()
+
+    def remove_task(self, task_id):
+        """Удаляет задачу из модели и возвращает её запись или None."""
+        task = self._by_id.get(task_id)
+        if task is None:
+            return None
+        row = self._row_of(task)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._tasks[row]
+        del self._by_id[task_id]
+        self.endRemoveRows()
+        return task
+
+    def refresh_task(self, task_id):
+        """Перерисовывает задачу, изменившуюся на месте (например, её подзадачи).
+
+        Возвращает False, если задачи нет в модели.
+        """
+        task = self._by_id.get(task_id)
+        if task is None:
+            return False
+        index = self.index(self._row_of(task))
+        self.dataChanged.emit(index, index, [TaskRole])
+        return True
+
+
+class TaskItemDelegate(QStyledItemDelegate):
+    """Рисует задачу, её подзадачи и кнопки управления без создания виджетов.
+
+    Задача с подзадачами рисуется свернутой: строкой "Подзадачи: выполнено/всего"
+    с полосой прогресса, нажатие на которую раскрывает список подзадач. Пока подзадачи раскрытой
+    задачи загружаются, вместо них показывается строка "Загрузка...".
+    """
+
+    # task_id, действие, subtask_id (0, если действие относится к задаче)
+    actionTriggered = pyqtSignal(int, str, int)
+
+    PADDING = 10
+    SPACING = 10
+    SUBTASK_INDENT = 20
+    SUBTASK_MARGIN = 5
+    SUBTASK_HEIGHT = 30
+    SUBTASK_SPACING = 5
+    BUTTON_HEIGHT = 35
+    SUBTASK_ICON_SIZE = 16
+    BUTTON_ICON_SIZE = 14
+    PROGRESS_HEIGHT = 6
+    RECURRENCE_ICON_SIZE = 14
+
+    LIGHT_COLORS = {
+        "background": "#F5F5F5",
+        "text": "#000000",
+        "muted": "#757575",
+        "accent": "#2196F3",
+        "accent_hover": "#1976D2",
+        "progress_track": "#E0E0E0",
+    }
+    DARK_COLORS = {
+        "background": "#3D3D3D",
+        "text": "#FFFFFF",
+        "muted": "#BDBDBD",
+        "accent": "#007ACC",
+        "accent_hover": "#0098FF",
+        "progress_track": "#555555",
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._colors = self.LIGHT_COLORS
+        # Элемент под курсором: (строка, ключ кнопки)
+        self._hover_index = QPersistentModelIndex()
+        self._hover_key = None
+
+        self._title_font = QFont()
+        self._title_font.setPixelSize(14)
+        self._small_font = QFont()
+        self._small_font.setPixelSize(13)
+        # Выполненные подзадачи - зачеркнутым шрифтом
+        self._done_font = QFont(self._small_font)
+        self._done_font.setStrikeOut(True)
+        self._title_metrics = QFontMetrics(self._title_font)
+        self._title_height = self._title_metrics.height()
+
+    def set_dark(self, dark):
+        """Переключает цвета делегата под выбранную тему."""
+        self._colors = self.DARK_COLORS if dark else self.LIGHT_COLORS
+
+    # --- Геометрия ---
+
+    def _subtask_lines(self, task):
+        """Число строк группы подзадач: сводка и, если задача раскрыта,
+        подзадачи или строка загрузки."""
+        if not task["subtask_total"]:
+            return 0
+        if not task["expanded"]:
+            return 1
+        subtasks = task["subtasks"]
+        return 1 + (1 if subtasks is None else len(subtasks))
+
+    def _height_for(self, task):
+        height = self.PADDING + self._title_height + self.SPACING
+        count = self._subtask_lines(task)
+        if count:
+            height += (
+                2 * self.SUBTASK_MARGIN
+                + count * self.SUBTASK_HEIGHT
+                + (count - 1) * self.SUBTASK_SPACING
+                + self.SPACING
+            )
+        return height + self.BUTTON_HEIGHT + self.PADDING
+
+    def _layout(self, rect, task):
+        """Вычисляет прямоугольники всех частей элемента задачи.
+
+        Возвращает (заголовок, значок повторения или None, сводка подзадач
+        или None, строка загрузки или None, подзадачи, кнопки).
+        """
+        inner = rect.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        y = inner.top()
+        title_rect = QRect(inner.left(), y, inner.width(), self._title_height)
+        y += self._title_height + self.SPACING
+
+        # Значок повторения - слева от текста дедлайна
+        recurrence_rect = None
+        if task["recurrence"] is not None and task["deadline"] is not None:
+            deadline_width = self._title_metrics.horizontalAdvance(self._deadline_text(task))
+            size = self.RECURRENCE_ICON_SIZE
+            recurrence_rect = QRect(
+                title_rect.right() - deadline_width - self.SPACING // 2 - size,
+                title_rect.center().y() - size // 2, size, size,
+            )
+
+        summary_rect = None
+        loading_rect = None
+        subtasks = []
+        if self._subtask_lines(task):
+            y += self.SUBTASK_MARGIN
+            summary_rect = QRect(inner.left(), y, inner.width(), self.SUBTASK_HEIGHT)
+            y += self.SUBTASK_HEIGHT + self.SUBTASK_SPACING
+            left = inner.left() + self.SUBTASK_INDENT
+            width = inner.right() - left + 1
+            if task["expanded"] and task["subtasks"] is None:
+                loading_rect = QRect(left, y, width, self.SUBTASK_HEIGHT)
+                y += self.SUBTASK_HEIGHT + self.SUBTASK_SPACING
+            elif task["expanded"]:
+                for subtask_id, subtask_text, subtask_status in task["subtasks"]:
+                    button_rect = QRect(
+                        left + width - self.SUBTASK_HEIGHT, y, self.SUBTASK_HEIGHT, self.SUBTASK_HEIGHT
+                    )
+                    label_rect = QRect(left, y, width - self.SUBTASK_HEIGHT - self.SPACING, self.SUBTASK_HEIGHT)
+                    subtasks.append((subtask_id, subtask_text, subtask_status, label_rect, button_rect))
+                    y += self.SUBTASK_HEIGHT + self.SUBTASK_SPACING
+            y += self.SUBTASK_MARGIN - self.SUBTASK_SPACING + self.SPACING
+
+        buttons = []
+        actions = [ACTION_ADD_SUBTASK, ACTION_COMPLETE if task["status"] == 0 else ACTION_UNDO, ACTION_DELETE]
+        button_width = (inner.width() - self.SPACING * (len(actions) - 1)) // len(actions)
+        x = inner.left()
+        for action in actions:
+            buttons.append((action, QRect(x, y, button_width, self.BUTTON_HEIGHT)))
+            x += button_width + self.SPACING
+
+        return title_rect, recurrence_rect, summary_rect, loading_rect, subtasks, buttons
+
+    def _deadline_text(self, task):
+        return f"Дедлайн: {format_deadline(task['deadline'])}"
+
+    def _hit_test(self, rect, task, pos):
+        """Определяет, какая кнопка находится в точке pos."""
+        _, recurrence_rect, summary_rect, _, subtasks, buttons = self._layout(rect, task)
+        if recurrence_rect is not None and recurrence_rect.contains(pos):
+            return ACTION_STOP_RECURRENCE, 0
+        if summary_rect is not None and summary_rect.contains(pos):
+            return ACTION_TOGGLE_SUBTASKS, 0
+        for subtask_id, _, subtask_status, _, button_rect in subtasks:
+            if button_rect.contains(pos):
+                action = ACTION_COMPLETE_SUBTASK if subtask_status == 0 else ACTION_UNDO_SUBTASK
+                return action, subtask_id
+        for action, button_rect in buttons:
+            if button_rect.contains(pos):
+                return action, 0
+        return None
+
+    def sizeHint(self, option, index):
+        task = index.data(TaskRole)
+        if task is None:
+            return super().sizeHint(option, index)
+        return QSize(200, self._height_for(task))
+
+    # --- Отрисовка ---
+
+    def paint(self, painter, option, index):
+        task = index.data(TaskRole)
+        if task is None:
+            return super().paint(painter, option, index)
+
+        colors = self._colors
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        # Фон элемента
+        background = option.rect.adjusted(2, 2, -2, -2)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(colors["background"]))
+        painter.drawRoundedRect(background, 5, 5)
+        if option.state & QStyle.State_Selected:
+            painter.setPen(QPen(QColor(colors["accent"]), 2))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRoundedRect(background, 5, 5)
+
+        title_rect, recurrence_rect, summary_rect, loading_rect, subtasks, buttons = self._layout(
+            option.rect, task
+        )
+        hovered = self._hover_key if self._hover_index == QPersistentModelIndex(index) else None
+
+        # Описание и дедлайн
+        painter.setFont(self._title_font)
+        metrics = painter.fontMetrics()
+        deadline = task["deadline"]
+        text_rect = QRect(title_rect)
+        if deadline is not None:
+            deadline_text = self._deadline_text(task)
+            deadline_width = metrics.horizontalAdvance(deadline_text)
+            painter.setPen(QColor("#FF5722"))
+            painter.drawText(title_rect, Qt.AlignRight | Qt.AlignVCenter, deadline_text)
+            text_rect.setRight(title_rect.right() - deadline_width - self.SPACING)
+        if recurrence_rect is not None:
+            hovered_recurrence = (ACTION_STOP_RECURRENCE, 0) == hovered
+            color = colors["accent_hover"] if hovered_recurrence else "#FF5722"
+            painter.drawPixmap(
+                recurrence_rect.topLeft(), icons.pixmap("fa5s.redo", color, self.RECURRENCE_ICON_SIZE)
+            )
+            text_rect.setRight(recurrence_rect.left() - self.SPACING)
+        overdue = deadline is not None and task["status"] == 0 and deadline < time.time()
+        painter.setPen(QColor("red") if overdue else QColor(colors["text"]))
+        painter.drawText(
+            text_rect,
+            Qt.AlignLeft | Qt.AlignVCenter,
+            metrics.elidedText(task["description"], Qt.ElideRight, text_rect.width()),
+        )
+
+        # Сводка подзадач: кнопка раскрытия
+        painter.setFont(self._small_font)
+        metrics = painter.fontMetrics()
+        if summary_rect is not None:
+            hovered_summary = (ACTION_TOGGLE_SUBTASKS, 0) == hovered
+            painter.setPen(QColor(colors["accent_hover"] if hovered_summary else colors["muted"]))
+            icon_size = 12
+            chevron = "fa5s.chevron-down" if task["expanded"] else "fa5s.chevron-right"
+            painter.drawPixmap(
+                summary_rect.left(), summary_rect.center().y() - icon_size // 2,
+                icons.pixmap(chevron, colors["muted"], icon_size),
+            )
+            summary_text = f"Подзадачи: {task['subtask_done']}/{task['subtask_total']}"
+            text_left = summary_rect.left() + self.SUBTASK_INDENT
+            painter.drawText(
+                QRect(text_left, summary_rect.top(), summary_rect.width(), summary_rect.height()),
+                Qt.AlignLeft | Qt.AlignVCenter,
+                summary_text,
+            )
+            # Полоса прогресса до правого края строки
+            bar_left = text_left + metrics.horizontalAdvance(summary_text) + self.SPACING
+            bar_width = summary_rect.right() - bar_left
+            if bar_width > 0:
+                bar = QRect(
+                    bar_left, summary_rect.center().y() - self.PROGRESS_HEIGHT // 2,
+                    bar_width, self.PROGRESS_HEIGHT,
+                )
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(QColor(colors["progress_track"]))
+                painter.drawRoundedRect(bar, 3, 3)
+                done_width = bar_width * task["subtask_done"] // task["subtask_total"]
+                if done_width:
+                    painter.setBrush(QColor("#4CAF50"))
+                    painter.drawRoundedRect(QRect(bar_left, bar.top(), done_width, bar.height()), 3, 3)
+        if loading_rect is not None:
+            painter.setPen(QColor(colors["muted"]))
+            painter.drawText(loading_rect, Qt.AlignLeft | Qt.AlignVCenter, "Загрузка...")
+
+        # Подзадачи
+        for subtask_id, subtask_text, subtask_status, label_rect, button_rect in subtasks:
+            if subtask_status == 1:
+                painter.setFont(self._done_font)
+                painter.setPen(QColor("#4CAF50"))
+            else:
+                painter.setFont(self._small_font)
+                painter.setPen(QColor(colors["muted"]))
+            painter.drawText(
+                label_rect,
+                Qt.AlignLeft | Qt.AlignVCenter,
+                metrics.elidedText(f"• {subtask_text}", Qt.ElideRight, label_rect.width()),
+            )
+            key = (ACTION_COMPLETE_SUBTASK if subtask_status == 0 else ACTION_UNDO_SUBTASK, subtask_id)
+            self._draw_button(painter, button_rect, key == hovered)
+            if subtask_status == 0:
+                icon = icons.pixmap("fa5s.check", "#4CAF50", self.SUBTASK_ICON_SIZE)
+            else:
+                icon = icons.pixmap("fa5s.undo", "#FFC107", self.SUBTASK_ICON_SIZE)
+            offset = (self.SUBTASK_HEIGHT - self.SUBTASK_ICON_SIZE) // 2
+            painter.drawPixmap(button_rect.left() + offset, button_rect.top() + offset, icon)
+
+        # Кнопки управления
+        painter.setFont(self._small_font)
+        for action, button_rect in buttons:
+            self._draw_button(painter, button_rect, (action, 0) == hovered)
+            text, icon_name = {
+                ACTION_ADD_SUBTASK: ("Добавить подзадачу", "fa5s.plus"),
+                ACTION_COMPLETE: ("Выполнено", "fa5s.check"),
+                ACTION_UNDO: ("Не выполнено", "fa5s.undo"),
+                ACTION_DELETE: ("Удалить", "fa5s.trash"),
+            }[action]
+            icon = icons.pixmap(icon_name, "white", self.BUTTON_ICON_SIZE)
+            self._draw_button_label(painter, button_rect, text, icon)
+
+        painter.restore()
+
+    def _draw_button(self, painter, rect, hovered):
+        color = self._colors["accent_hover"] if hovered else self._colors["accent"]
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(color))
+        painter.drawRoundedRect(rect, 5, 5)
+
+    def _draw_button_label(self, painter, rect, text, icon):
+        metrics = painter.fontMetrics()
+        icon_size = self.BUTTON_ICON_SIZE
+        text = metrics.elidedText(text, Qt.ElideRight, max(0, rect.width() - icon_size - 16))
+        content_width = icon_size + 6 + metrics.horizontalAdvance(text)
+        x = rect.left() + max(4, (rect.width() - content_width) // 2)
+        painter.drawPixmap(x, rect.center().y() - icon_size // 2, icon)
+        painter.setPen(QColor("white"))
+        painter.drawText(
+            QRect(x + icon_size + 6, rect.top(), rect.right() - x - icon_size - 6, rect.height()),
+            Qt.AlignLeft | Qt.AlignVCenter,
+            text,
+        )
+
+    # --- Обработка событий ---
+
+    def editorEvent(self, event, model, option, index):
+        task = index.data(TaskRole)
+        if task is None:
+            return False
+
+        if event.type() == QEvent.MouseMove:
+            hit = self._hit_test(option.rect, task, event.pos())
+            self.set_hover(option.widget, index, hit)
+            return False
+
+        if event.type() in (QEvent.MouseButtonPress, QEvent.MouseButtonDblClick):
+            return event.button() == Qt.LeftButton and self._hit_test(option.rect, task, event.pos()) is not None
+
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            hit = self._hit_test(option.rect, task, event.pos())
+            if hit is None:
+                return False
+            action, subtask_id = hit
+            self.actionTriggered.emit(task["id"], action, subtask_id)
+            return True
+
+        return False
+
+    def set_hover(self, view, index, key):
+        """Запоминает кнопку под курсором и перерисовывает затронутые строки."""
+        persistent = QPersistentModelIndex(index) if index is not None else QPersistentModelIndex()
+        if persistent == self._hover_index and key == self._hover_key:
+            return
+        previous = self._hover_index
+        self._hover_index = persistent
+        self._hover_key = key
+        if view is not None:
+            if previous.isValid():
+                view.update(QModelIndex(previous))
+            if persistent.isValid():
+                view.update(QModelIndex(persistent))
+
+    def helpEvent(self, event, view, option, index):
+        task = index.data(TaskRole)
+        if task is None or event.type() != QEvent.ToolTip:
+            return super().helpEvent(event, view, option, index)
+
+        hit = self._hit_test(option.rect, task, event.pos())
+        if hit is not None and hit[0] == ACTION_STOP_RECURRENCE:
+            text = self._recurrence_tooltip(task)
+        elif hit is not None:
+            text = {
+                ACTION_COMPLETE_SUBTASK: "Отметить как выполненное",
+                ACTION_UNDO_SUBTASK: "Отметить как невыполненное",
+                ACTION_TOGGLE_SUBTASKS: "Свернуть подзадачи" if task["expanded"] else "Показать подзадачи",
+            }.get(hit[0])
+        else:
+            text = task["description"]
+        if text:
+            QToolTip.showText(event.globalPos(), text, view)
+        else:
+            QToolTip.hideText()
+        return True
+
+    def _recurrence_tooltip(self, task):
+        # Повторения вычисляются только здесь - для задачи под курсором
+        rule = task["recurrence"]
+        upcoming = recurrence.upcoming(rule, task["deadline"], UPCOMING_COUNT)
+        lines = [f"Повторяется {recurrence.describe(rule)}", "Ближайшие повторения:"]
+        lines.extend(format_deadline(occurrence) for occurrence in upcoming)
+        lines.append("Нажмите, чтобы перестать повторять")
+        return "\n".join(lines)
+
+
+class TaskListView(QListView):
+    """Список задач, отрисовываемый делегатом."""
+
+    def __init__(self, delegate, parent=None):
+        super().__init__(parent)
+        self.setItemDelegate(delegate)
+        self.setMouseTracking(True)
+        self.setUniformItemSizes(False)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+    def leaveEvent(self, event):
+        self.itemDelegate().set_hover(self, None, None)
+        super().leaveEvent(event)
@@ -0,0 +1,296 @@
+"""Потоковые импорт и экспорт задач с подзадачами (JSON Lines и CSV).
+
+Экспорт читает базу курсорами порциями (db.iter_tasks_with_subtasks) и сразу
+пишет записи в файл, импорт читает файл построчно и добавляет задачи
+порциями по db.BULK_CHUNK_SIZE, каждая - отдельной транзакцией. Поэтому
+расход памяти не зависит от размера данных, а база не блокируется для
+других потоков на все время импорта. Прерванный импорт оставляет в базе
+уже добавленные порции.
+
+Модуль не зависит от Qt: GUI запускает его в пуле потоков
+(workers.TransferTask).
+
+Форматы:
+    ndjson - одна задача на строку:
+        {"description": ..., "status": 0, "deadline": ..., "created_at": ...,
+         "recurrence": ..., "subtasks": [{"description": ..., "status": 0,
+         "created_at": ...}]}
+    csv - колонки type,description,status,deadline,created_at,recurrence;
+        строки подзадач (type = subtask) следуют за строкой своей задачи
+        (type = task).
+
+recurrence - правило повторения (recurrence.py) или null/пустая строка;
+файлы без него, выгруженные до появления повторений, тоже импортируются.
+
+Даты записываются как Unix-время, как и в базе, поэтому файл переносится
+между машинами с разными часовыми поясами без сдвига. При импорте
+принимается и текст 'ГГГГ-ММ-ДД ЧЧ:ММ:СС' из файлов, выгруженных до
+перехода базы на Unix-время: дедлайн в местном времени, дата создания в UTC.
+"""
+import calendar
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+import db
+import recurrence
+
+FORMATS = ("ndjson", "csv")
+
+EXTENSIONS = {
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".json": "ndjson",
+    ".csv": "csv",
+}
+
+CSV_COLUMNS = ("type", "description", "status", "deadline", "created_at", "recurrence")
+# Заголовок файлов, выгруженных до появления правил повторения
+LEGACY_CSV_COLUMNS = CSV_COLUMNS[:5]
+
+# Текстовый формат дат в файлах, выгруженных до перехода базы на Unix-время
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class TransferError(ValueError):
+    """Файл импорта содержит некорректную запись."""
+
+    def __init__(self, line, message):
+        super().__init__(f"Строка {line}: {message}")
+        self.line = line
+
+
+def detect_format(path):
+    """Определяет формат по расширению файла."""
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Неизвестный формат файла: {path}")
+    return fmt
+
+
+# --- Экспорт ---
+
+def _write_ndjson(f, records):
+    for (description, status, deadline, created_at, rule), subtasks in records:
+        f.write(json.dumps({
+            "description": description,
+            "status": status,
+            "deadline": deadline,
+            "created_at": created_at,
+            "recurrence": rule,
+            "subtasks": [
+                {"description": d, "status": s, "created_at": c}
+                for d, s, c in subtasks
+            ],
+        }, ensure_ascii=False) + "\n")
+        yield
+
+
+def _write_csv(f, records):
+    writer = csv.writer(f)
+    writer.writerow(CSV_COLUMNS)
+    for (description, status, deadline, created_at, rule), subtasks in records:
+        writer.writerow(("task", description, status, deadline, created_at, rule))
+        for sub_description, sub_status, sub_created_at in subtasks:
+            writer.writerow(("subtask", sub_description, sub_status, "", sub_created_at, ""))
+        yield
+
+
+_WRITERS = {"ndjson": _write_ndjson, "csv": _write_csv}
+
+
+def export_to(f, fmt, progress=None, is_cancelled=None):
+    """Записывает все задачи в текстовый файл f в формате fmt.
+
+    progress(done, total) вызывается после каждой порции задач. Если
+    is_cancelled() вернет True, экспорт прерывается исключением
+    db.QueryCancelled. Возвращает число записанных задач.
+    """
+    total = db.count_tasks()
+    done = 0
+    records = db.iter_tasks_with_subtasks()
+    try:
+        for _ in _WRITERS[fmt](f, records):
+            done += 1
+            if done % db.BULK_CHUNK_SIZE == 0:
+                if is_cancelled is not None and is_cancelled():
+                    raise db.QueryCancelled()
+                if progress is not None:
+                    progress(done, total)
+    finally:
+        # Закрываем курсоры генератора сразу, а не при сборке мусора
+        records.close()
+    if progress is not None:
+        progress(done, done)
+    return done
+
+
+def export_file(path, fmt=None, progress=None, is_cancelled=None):
+    """Экспортирует задачи в файл path; формат по умолчанию - по расширению."""
+    fmt = fmt or detect_format(path)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        return export_to(f, fmt, progress, is_cancelled)
+
+
+# --- Импорт ---
+
+def _status(value, line):
+    if value in (0, 1, "0", "1"):
+        return int(value)
+    raise TransferError(line, f"некорректный статус {value!r}")
+
+
+def _text(value, line, field, required=False):
+    if value in (None, ""):
+        if required:
+            raise TransferError(line, f"не заполнено поле {field}")
+        return None
+    if not isinstance(value, str):
+        raise TransferError(line, f"поле {field} должно быть строкой")
+    return value
+
+
+def _timestamp(value, line, field, utc=False):
+    """Разбирает дату: Unix-время (число или строка из цифр в CSV) или
+    текст TIMESTAMP_FORMAT в местном времени (в UTC, если utc)."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.lstrip("-").isdigit():
+            return int(value)
+        try:
+            parsed = datetime.strptime(value, TIMESTAMP_FORMAT)
+        except ValueError:
+            pass
+        else:
+            return calendar.timegm(parsed.timetuple()) if utc else int(parsed.timestamp())
+    raise TransferError(line, f"поле {field} должно быть Unix-временем или датой ГГГГ-ММ-ДД ЧЧ:ММ:СС")
+
+
+def _recurrence(value, deadline, line):
+    rule = _text(value, line, "recurrence")
+    try:
+        rule = recurrence.validate(rule)
+    except recurrence.RecurrenceError as e:
+        raise TransferError(line, str(e)) from None
+    if rule is not None and deadline is None:
+        raise TransferError(line, "для повторяющейся задачи нужен дедлайн")
+    return rule
+
+
+def _read_ndjson(f):
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            raise TransferError(line, f"некорректный JSON ({e})") from None
+        if not isinstance(record, dict):
+            raise TransferError(line, "ожидается объект JSON")
+        subtasks = record.get("subtasks") or []
+        if not isinstance(subtasks, list):
+            raise TransferError(line, "поле subtasks должно быть списком")
+        deadline = _timestamp(record.get("deadline"), line, "deadline")
+        yield (
+            _text(record.get("description"), line, "description", required=True),
+            _status(record.get("status", 0), line),
+            deadline,
+            _timestamp(record.get("created_at"), line, "created_at", utc=True),
+            _recurrence(record.get("recurrence"), deadline, line),
+            [_ndjson_subtask(subtask, line) for subtask in subtasks],
+        )
+
+
+def _ndjson_subtask(subtask, line):
+    if not isinstance(subtask, dict):
+        raise TransferError(line, "подзадача должна быть объектом JSON")
+    return (
+        _text(subtask.get("description"), line, "description", required=True),
+        _status(subtask.get("status", 0), line),
+        _timestamp(subtask.get("created_at"), line, "created_at", utc=True),
+    )
+
+
+def _read_csv(f):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    if tuple(header) not in (CSV_COLUMNS, LEGACY_CSV_COLUMNS):
+        raise TransferError(1, f"ожидается заголовок {','.join(CSV_COLUMNS)}")
+    columns = len(header)
+    task = None
+    for row in reader:
+        line = reader.line_num
+        if not row:
+            continue
+        if len(row) != columns:
+            raise TransferError(line, f"ожидается {columns} колонок")
+        kind, description, status, deadline, created_at = row[:5]
+        rule = row[5] if columns > 5 else None
+        if kind == "task":
+            if task is not None:
+                yield task
+            deadline = _timestamp(deadline, line, "deadline")
+            task = (
+                _text(description, line, "description", required=True),
+                _status(status, line),
+                deadline,
+                _timestamp(created_at, line, "created_at", utc=True),
+                _recurrence(rule, deadline, line),
+                [],
+            )
+        elif kind == "subtask":
+            if task is None:
+                raise TransferError(line, "подзадача перед первой задачей")
+            task[5].append((
+                _text(description, line, "description", required=True),
+                _status(status, line),
+                _timestamp(created_at, line, "created_at", utc=True),
+            ))
+        else:
+            raise TransferError(line, f"неизвестный тип строки {kind!r}")
+    if task is not None:
+        yield task
+
+
+_READERS = {"ndjson": _read_ndjson, "csv": _read_csv}
+
+
+def import_from(f, fmt, progress=None, is_cancelled=None, size=None):
+    """Добавляет в базу задачи из текстового файла f в формате fmt.
+
+    Задачи добавляются порциями по db.BULK_CHUNK_SIZE. progress(done, total)
+    получает прочитанные байты и размер файла size (None, если неизвестен).
+    Отмена через is_cancelled() проверяется между порциями и прерывает
+    импорт исключением db.QueryCancelled; добавленные порции остаются в базе.
+    Возвращает число добавленных задач.
+    """
+    buffer = getattr(f, "buffer", None)
+    records = _READERS[fmt](f)
+    imported = 0
+    while True:
+        if is_cancelled is not None and is_cancelled():
+            raise db.QueryCancelled()
+        chunk = list(islice(records, db.BULK_CHUNK_SIZE))
+        if not chunk:
+            break
+        imported += db.import_tasks(chunk)
+        if progress is not None:
+            # Позиция буфера учитывает данные, уже прочитанные вперед
+            progress(buffer.tell() if buffer is not None else imported, size)
+    if progress is not None and size is not None:
+        progress(size, size)
+    return imported
+
+
+def import_file(path, fmt=None, progress=None, is_cancelled=None):
+    """Импортирует задачи из файла path; формат по умолчанию - по расширению."""
+    fmt = fmt or detect_format(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return import_from(f, fmt, progress, is_cancelled, os.path.getsize(path))
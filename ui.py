@@ -1,3 +1,6 @@
+import os
+from string import Template
+
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -6,8 +9,6 @@ from PyQt5.QtWidgets import (
     QWidget,
     QLineEdit,
     QPushButton,
-    QListWidget,
-    QListWidgetItem,
     QMessageBox,
     QLabel,
     QTabWidget,
@@ -17,11 +18,155 @@ from PyQt5.QtWidgets import (
     QFrame,
     QDialog,
     QDialogButtonBox,
+    QCheckBox,
+    QFileDialog,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QShortcut,
+    QProgressBar,
+    QComboBox,
 )
-from PyQt5.QtCore import Qt, QDateTime, QTimer, QPropertyAnimation, QEasingCurve
-from PyQt5.QtGui import QColor, QFont, QIcon
-import qtawesome as qta
+from PyQt5.QtCore import Qt, QDateTime, QTimer, QThreadPool, QPropertyAnimation, QEasingCurve, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QKeySequence
 import db
+import icons
+import profiling
+import recurrence
+import transfer
+from store import TaskStore
+from scheduler import DeadlineScheduler
+from task_view import (
+    TaskListModel,
+    TaskItemDelegate,
+    TaskListView,
+    ACTION_ADD_SUBTASK,
+    ACTION_COMPLETE,
+    ACTION_UNDO,
+    ACTION_DELETE,
+    ACTION_COMPLETE_SUBTASK,
+    ACTION_UNDO_SUBTASK,
+    ACTION_TOGGLE_SUBTASKS,
+    ACTION_STOP_RECURRENCE,
+)
+from workers import DbWorker, SearchTask, TransferTask
+
+# Варианты повторения новой задачи: (текст, правило recurrence)
+RECURRENCE_CHOICES = [
+    ("Без повтора", None),
+    ("Ежедневно", recurrence.DAILY),
+    ("Еженедельно", recurrence.WEEKLY),
+    ("По будням", recurrence.WEEKDAYS),
+]
+
+# Фильтры диалогов выбора файла импорта и экспорта
+TRANSFER_FILTER = "JSON Lines (*.ndjson *.jsonl);;CSV (*.csv)"
+
+# Задержка поиска после последнего нажатия клавиши, мс
+SEARCH_DEBOUNCE_MS = 250
+
+# Начиная с этого числа измененных задач списки перестраиваются целиком,
+# а не по одной строке
+BULK_REFRESH_THRESHOLD = 200
+
+
+# Единая таблица стилей окна; виджеты выбираются по классу и objectName,
+# а цвета подставляются из палитры темы
+STYLE_SHEET = Template("""
+    QMainWindow {
+        background-color: $window;
+    }
+    QWidget {
+        color: $text;
+    }
+    QLabel#titleLabel {
+        font-family: Arial;
+        font-size: 24pt;
+        font-weight: bold;
+    }
+    QFrame#inputContainer, QFrame#searchContainer {
+        background-color: $panel;
+        border-radius: 10px;
+        border: $panel_border;
+    }
+    QLineEdit, QDateTimeEdit, QComboBox {
+        background-color: $input;
+        color: $text;
+        border: 2px solid $input_border;
+        border-radius: 5px;
+        padding: 5px;
+        font-size: 14px;
+    }
+    QLineEdit:focus, QDateTimeEdit:focus, QComboBox:focus {
+        border: 2px solid $accent;
+    }
+    QPushButton {
+        background-color: $accent;
+        color: white;
+        border: none;
+        border-radius: 5px;
+        padding: 5px 15px;
+        font-size: 14px;
+    }
+    QPushButton:hover {
+        background-color: $accent_hover;
+    }
+    QListView {
+        background-color: $panel;
+        border: 2px solid $list_border;
+        border-radius: 10px;
+        padding: 5px;
+    }
+    QTabWidget::pane {
+        border: 2px solid $list_border;
+        border-radius: 10px;
+    }
+    QTabBar::tab {
+        background-color: $tab;
+        color: $text;
+        padding: 8px 20px;
+        border-top-left-radius: 5px;
+        border-top-right-radius: 5px;
+    }
+    QTabBar::tab:selected {
+        background-color: $accent;
+        color: $tab_selected_text;
+    }
+""")
+
+LIGHT_THEME = {
+    "window": "#F5F5F5",
+    "text": "#000000",
+    "panel": "#FFFFFF",
+    "panel_border": "1px solid #E0E0E0",
+    "input": "#FFFFFF",
+    "input_border": "#E0E0E0",
+    "accent": "#2196F3",
+    "accent_hover": "#1976D2",
+    "list_border": "#E0E0E0",
+    "tab": "#F5F5F5",
+    "tab_selected_text": "white",
+}
+
+DARK_THEME = {
+    "window": "#1E1E1E",
+    "text": "#FFFFFF",
+    "panel": "#2D2D2D",
+    "panel_border": "none",
+    "input": "#3D3D3D",
+    "input_border": "#4D4D4D",
+    "accent": "#007ACC",
+    "accent_hover": "#0098FF",
+    "list_border": "#3D3D3D",
+    "tab": "#2D2D2D",
+    "tab_selected_text": "#FFFFFF",
+}
+
+
+def set_profiling(enabled):
+    """Включает или выключает сбор статистики profiling и подсчет SQL-запросов."""
+    profiling.enable(enabled)
+    db.trace_queries(enabled)
 
 
 class AddSubtaskDialog(QDialog):
@@ -45,12 +190,123 @@ class AddSubtaskDialog(QDialog):
         layout.addWidget(buttons)
 
 
+class ProfilingDialog(QDialog):
+    """Панель отладки: статистика profiling по участкам кода."""
+
+    COLUMNS = [
+        ("name", "Участок", "{}"),
+        ("count", "Вызовов", "{}"),
+        ("total", "Всего, мс", "{:.1f}"),
+        ("p50", "p50, мс", "{:.2f}"),
+        ("p99", "p99, мс", "{:.2f}"),
+        ("queries", "SQL-запросов", "{}"),
+    ]
+    # Значения в секундах показываются в миллисекундах
+    SCALE = {"total": 1000, "p50": 1000, "p99": 1000}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Профилирование")
+        self.resize(760, 420)
+
+        layout = QVBoxLayout(self)
+
+        self.enabled_checkbox = QCheckBox("Собирать статистику")
+        self.enabled_checkbox.setChecked(profiling.is_enabled())
+        self.enabled_checkbox.toggled.connect(set_profiling)
+        layout.addWidget(self.enabled_checkbox)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for _, title, _ in self.COLUMNS])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        reset_button = QPushButton("Сбросить")
+        reset_button.clicked.connect(self.reset)
+        buttons.addWidget(reset_button)
+        self.cprofile_button = QPushButton()
+        self.cprofile_button.clicked.connect(self.toggle_cprofile)
+        buttons.addWidget(self.cprofile_button)
+        layout.addLayout(buttons)
+        self.cprofile_running = False
+        self.update_cprofile_button()
+
+        # Таблица обновляется, пока панель открыта
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        rows = profiling.snapshot()
+        self.table.setRowCount(len(rows))
+        for row_number, row in enumerate(rows):
+            for column, (key, _, fmt) in enumerate(self.COLUMNS):
+                value = row[key] * self.SCALE.get(key, 1)
+                item = QTableWidgetItem(fmt.format(value))
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row_number, column, item)
+
+    def reset(self):
+        profiling.reset()
+        self.refresh()
+
+    def update_cprofile_button(self):
+        if self.cprofile_running:
+            self.cprofile_button.setText("Сохранить cProfile...")
+        else:
+            self.cprofile_button.setText("Запустить cProfile")
+
+    def toggle_cprofile(self):
+        """Запускает cProfile в потоке GUI или сохраняет собранный профиль."""
+        if not self.cprofile_running:
+            profiling.start_cprofile()
+            self.cprofile_running = True
+        else:
+            path, _ = QFileDialog.getSaveFileName(
+                self, "Сохранить профиль", "todoapp.prof", "Профиль cProfile (*.prof)"
+            )
+            if not path:
+                return
+            profiling.dump_cprofile(path)
+            self.cprofile_running = False
+        self.update_cprofile_button()
+
+
 class ToDoApp(QMainWindow):
+    """Главное окно.
+
+    Окно показывается сразу: иконки создаются, а задачи начинают загружаться
+    после первого кадра (finish_startup).
+    """
+
+    # окно впервые нарисовано
+    firstFramePainted = pyqtSignal()
+    # загружены первые страницы задач - приложение готово к работе
+    tasksLoaded = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Умный планировщик задач")
         self.setGeometry(100, 100, 800, 800)
 
+        # Все запросы к базе данных выполняются в отдельном потоке,
+        # а задачи после загрузки обслуживаются из кэша в памяти
+        self.db_worker = DbWorker()
+        self.store = TaskStore(self.db_worker.submit)
+
         # Изначальная тема - светлая
         self.is_dark_theme = False
         self.set_style(self.is_dark_theme)
@@ -62,8 +318,8 @@ class ToDoApp(QMainWindow):
 
         # Заголовок
         self.title_label = QLabel("Умный планировщик задач")
+        self.title_label.setObjectName("titleLabel")
         self.title_label.setAlignment(Qt.AlignCenter)
-        self.title_label.setFont(QFont("Arial", 24, QFont.Bold))
         self.layout.addWidget(self.title_label)
 
         # Ввод текста для добавления задач и кнопка создания
@@ -83,8 +339,14 @@ class ToDoApp(QMainWindow):
         self.deadline_input.setMinimumHeight(40)
         input_layout.addWidget(self.deadline_input)
 
+        # Повторение отсчитывается от дедлайна (см. recurrence.py)
+        self.recurrence_input = QComboBox()
+        for text, rule in RECURRENCE_CHOICES:
+            self.recurrence_input.addItem(text, rule)
+        self.recurrence_input.setMinimumHeight(40)
+        input_layout.addWidget(self.recurrence_input)
+
         self.add_button = QPushButton()
-        self.add_button.setIcon(qta.icon('fa5s.plus-circle', color='white'))
         self.add_button.setText("Добавить")
         self.add_button.setMinimumHeight(40)
         self.add_button.clicked.connect(self.add_task)
@@ -101,7 +363,20 @@ class ToDoApp(QMainWindow):
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Поиск по задачам...")
         self.search_input.setMinimumHeight(40)
-        self.search_input.textChanged.connect(self.search_tasks)
+
+        # Поиск запускается после паузы в наборе и выполняется в фоновом потоке
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(2)
+        # Потоки пула не завершаются по простою: у каждого потока свое
+        # соединение с базой (db.get_connection), и новый поток открыл бы еще одно
+        self.search_pool.setExpiryTimeout(-1)
+        self.search_task = None
+        self.search_generation = 0
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_tasks)
+        self.search_input.textChanged.connect(lambda text: self.search_timer.start())
         search_layout.addWidget(self.search_input)
 
         self.layout.addWidget(search_container)
@@ -113,8 +388,20 @@ class ToDoApp(QMainWindow):
         self.complete_tab = QWidget()
 
         # Списки для невыполненных и выполненных задач
-        self.incomplete_task_list = QListWidget()
-        self.complete_task_list = QListWidget()
+        self.task_delegate = TaskItemDelegate(self)
+        self.task_delegate.actionTriggered.connect(self.on_task_action)
+
+        self.incomplete_model = TaskListModel(self)
+        self.complete_model = TaskListModel(self)
+
+        self.incomplete_task_list = TaskListView(self.task_delegate)
+        self.incomplete_task_list.setModel(self.incomplete_model)
+        self.complete_task_list = TaskListView(self.task_delegate)
+        self.complete_task_list.setModel(self.complete_model)
+
+        # Длинные списки загружаются страницами по мере прокрутки
+        self.incomplete_model.fetchMoreRequested.connect(lambda: self.load_more(0))
+        self.complete_model.fetchMoreRequested.connect(lambda: self.load_more(1))
 
         # Устанавливаем layout для каждой вкладки
         incomplete_layout = QVBoxLayout()
@@ -126,13 +413,56 @@ class ToDoApp(QMainWindow):
         self.complete_tab.setLayout(complete_layout)
 
         # Добавляем вкладки в основной виджет вкладок
-        self.tabs.addTab(self.incomplete_tab, qta.icon('fa5s.list', color='#2196F3'), "Активные задачи")
-        self.tabs.addTab(self.complete_tab, qta.icon('fa5s.check-circle', color='#4CAF50'), "Выполненные задачи")
+        self.tabs.addTab(self.incomplete_tab, "Активные задачи")
+        self.tabs.addTab(self.complete_tab, "Выполненные задачи")
         self.layout.addWidget(self.tabs)
 
+        # Действия над выбранными задачами (выбор - Ctrl/Shift + клик)
+        bulk_layout = QHBoxLayout()
+        self.complete_selected_button = QPushButton()
+        self.complete_selected_button.setText("Выполнить выбранные")
+        self.complete_selected_button.setMinimumHeight(40)
+        self.complete_selected_button.clicked.connect(self.toggle_selected_tasks)
+        bulk_layout.addWidget(self.complete_selected_button)
+
+        self.delete_selected_button = QPushButton()
+        self.delete_selected_button.setText("Удалить выбранные")
+        self.delete_selected_button.setMinimumHeight(40)
+        self.delete_selected_button.clicked.connect(self.delete_selected_tasks)
+        bulk_layout.addWidget(self.delete_selected_button)
+        self.layout.addLayout(bulk_layout)
+
+        # Импорт и экспорт файлов выполняются в фоновом потоке по одному
+        transfer_layout = QHBoxLayout()
+        self.import_button = QPushButton()
+        self.import_button.setText("Импорт...")
+        self.import_button.setMinimumHeight(40)
+        self.import_button.clicked.connect(self.import_tasks)
+        transfer_layout.addWidget(self.import_button)
+
+        self.export_button = QPushButton()
+        self.export_button.setText("Экспорт...")
+        self.export_button.setMinimumHeight(40)
+        self.export_button.clicked.connect(self.export_tasks)
+        transfer_layout.addWidget(self.export_button)
+
+        self.transfer_progress = QProgressBar()
+        self.transfer_progress.setMinimumHeight(40)
+        self.transfer_progress.hide()
+        transfer_layout.addWidget(self.transfer_progress)
+        self.layout.addLayout(transfer_layout)
+
+        self.transfer_pool = QThreadPool(self)
+        self.transfer_pool.setMaxThreadCount(1)
+        # Как и у search_pool: поток не завершается по простою, поэтому
+        # новые импорты и экспорты не открывают новых соединений
+        self.transfer_pool.setExpiryTimeout(-1)
+        self.transfer_task = None
+
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+
         # Кнопка переключения темы
         self.theme_button = QPushButton()
-        self.theme_button.setIcon(qta.icon('fa5s.moon', color='white'))
         self.theme_button.setText("Сменить тему")
         self.theme_button.setMinimumHeight(40)
         self.theme_button.clicked.connect(self.toggle_theme)
@@ -143,355 +473,339 @@ class ToDoApp(QMainWindow):
         container.setLayout(self.layout)
         self.setCentralWidget(container)
 
-        # Загрузка задач при запуске
-        self.load_tasks()
+        # Иконки и задачи загружаются после первого кадра (см. paintEvent)
+        self.started = False
+        self.icons_loaded = False
+
+        # Уведомления о дедлайнах: таймер взводится на ближайший дедлайн
+        self.deadline_scheduler = DeadlineScheduler(self)
+        self.deadline_scheduler.due.connect(self.on_tasks_due)
 
-        # Таймер для проверки дедлайнов
-        self.notification_timer = QTimer()
-        self.notification_timer.timeout.connect(self.check_deadlines)
-        self.notification_timer.start(60000)  # проверка каждые 60 секунд
+        # Панель профилирования открывается по F12
+        self.profiling_dialog = None
+        QShortcut(QKeySequence(Qt.Key_F12), self, activated=self.show_profiling_dialog)
 
     def set_style(self, dark):
         """Устанавливает стиль для приложения (темный или светлый)."""
-        if dark:
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #1E1E1E;
-                }
-                QWidget {
-                    color: #FFFFFF;
-                }
-                QFrame#inputContainer, QFrame#searchContainer {
-                    background-color: #2D2D2D;
-                    border-radius: 10px;
-                }
-                QLineEdit, QDateTimeEdit {
-                    background-color: #3D3D3D;
-                    color: #FFFFFF;
-                    border: 2px solid #4D4D4D;
-                    border-radius: 5px;
-                    padding: 5px;
-                    font-size: 14px;
-                }
-                QLineEdit:focus, QDateTimeEdit:focus {
-                    border: 2px solid #007ACC;
-                }
-                QPushButton {
-                    background-color: #007ACC;
-                    color: white;
-                    border: none;
-                    border-radius: 5px;
-                    padding: 5px 15px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #0098FF;
-                }
-                QListWidget {
-                    background-color: #2D2D2D;
-                    border: 2px solid #3D3D3D;
-                    border-radius: 10px;
-                    padding: 5px;
-                }
-                QListWidget::item {
-                    background-color: #3D3D3D;
-                    border-radius: 5px;
-                    margin: 2px;
-                    padding: 5px;
-                }
-                QListWidget::item:selected {
-                    background-color: #007ACC;
-                }
-                QTabWidget::pane {
-                    border: 2px solid #3D3D3D;
-                    border-radius: 10px;
-                }
-                QTabBar::tab {
-                    background-color: #2D2D2D;
-                    color: #FFFFFF;
-                    padding: 8px 20px;
-                    border-top-left-radius: 5px;
-                    border-top-right-radius: 5px;
-                }
-                QTabBar::tab:selected {
-                    background-color: #007ACC;
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #F5F5F5;
-                }
-                QWidget {
-                    color: #000000;
-                }
-                QFrame#inputContainer, QFrame#searchContainer {
-                    background-color: #FFFFFF;
-                    border-radius: 10px;
-                    border: 1px solid #E0E0E0;
-                }
-                QLineEdit, QDateTimeEdit {
-                    background-color: #FFFFFF;
-                    color: #000000;
-                    border: 2px solid #E0E0E0;
-                    border-radius: 5px;
-                    padding: 5px;
-                    font-size: 14px;
-                }
-                QLineEdit:focus, QDateTimeEdit:focus {
-                    border: 2px solid #2196F3;
-                }
-                QPushButton {
-                    background-color: #2196F3;
-                    color: white;
-                    border: none;
-                    border-radius: 5px;
-                    padding: 5px 15px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #1976D2;
-                }
-                QListWidget {
-                    background-color: #FFFFFF;
-                    border: 2px solid #E0E0E0;
-                    border-radius: 10px;
-                    padding: 5px;
-                }
-                QListWidget::item {
-                    background-color: #F5F5F5;
-                    border-radius: 5px;
-                    margin: 2px;
-                    padding: 5px;
-                }
-                QListWidget::item:selected {
-                    background-color: #2196F3;
-                    color: white;
-                }
-                QTabWidget::pane {
-                    border: 2px solid #E0E0E0;
-                    border-radius: 10px;
-                }
-                QTabBar::tab {
-                    background-color: #F5F5F5;
-                    color: #000000;
-                    padding: 8px 20px;
-                    border-top-left-radius: 5px;
-                    border-top-right-radius: 5px;
-                }
-                QTabBar::tab:selected {
-                    background-color: #2196F3;
-                    color: white;
-                }
-            """)
+        self.setStyleSheet(STYLE_SHEET.substitute(DARK_THEME if dark else LIGHT_THEME))
 
     def toggle_theme(self):
         """Переключает тему (светлая/темная)."""
         self.is_dark_theme = not self.is_dark_theme
         self.set_style(self.is_dark_theme)
-        if self.is_dark_theme:
-            self.theme_button.setIcon(qta.icon('fa5s.sun', color='white'))
+        self.task_delegate.set_dark(self.is_dark_theme)
+        self.incomplete_task_list.viewport().update()
+        self.complete_task_list.viewport().update()
+        self.update_icons()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.started:
+            self.started = True
+            self.firstFramePainted.emit()
+            # Продолжаем запуск, когда первый кадр уже выведен на экран
+            QTimer.singleShot(0, self.finish_startup)
+
+    @profiling.profiled
+    def finish_startup(self):
+        """Создает иконки и запускает загрузку задач после первого кадра окна."""
+        self.icons_loaded = True
+        self.update_icons()
+        self.load_tasks()
+
+    def update_icons(self):
+        """Назначает иконки кнопкам и вкладкам по текущей теме и вкладке."""
+        if not self.icons_loaded:
+            return
+        self.add_button.setIcon(icons.icon('fa5s.plus-circle', 'white'))
+        self.tabs.setTabIcon(self.tabs.indexOf(self.incomplete_tab), icons.icon('fa5s.list', '#2196F3'))
+        self.tabs.setTabIcon(self.tabs.indexOf(self.complete_tab), icons.icon('fa5s.check-circle', '#4CAF50'))
+        if self.tabs.currentWidget() is self.complete_tab:
+            self.complete_selected_button.setIcon(icons.icon('fa5s.undo', 'white'))
         else:
-            self.theme_button.setIcon(qta.icon('fa5s.moon', color='white'))
+            self.complete_selected_button.setIcon(icons.icon('fa5s.check-double', 'white'))
+        self.delete_selected_button.setIcon(icons.icon('fa5s.trash-alt', 'white'))
+        self.import_button.setIcon(icons.icon('fa5s.file-import', 'white'))
+        self.export_button.setIcon(icons.icon('fa5s.file-export', 'white'))
+        self.theme_button.setIcon(icons.icon('fa5s.sun' if self.is_dark_theme else 'fa5s.moon', 'white'))
 
+    @profiling.profiled
     def load_tasks(self):
-        """Загружает задачи из базы данных и отображает их в списке."""
-        try:
-            # Очищаем списки
-        self.incomplete_task_list.clear()
-        self.complete_task_list.clear()
-
-            # Загружаем задачи
-            tasks = db.load_tasks()
-            
-            for task_id, description, status, deadline in tasks:
-                # Создаем виджет для задачи
-                task_widget = QWidget()
-                task_layout = QVBoxLayout(task_widget)
-                task_layout.setSpacing(10)  # Увеличиваем отступ между элементами
-                task_layout.setContentsMargins(10, 10, 10, 10)  # Увеличиваем отступы от краев
-                
-                # Создаем виджет для основной информации о задаче
-                info_widget = QWidget()
-                info_layout = QHBoxLayout(info_widget)
-                info_layout.setContentsMargins(0, 0, 0, 0)
-                
-                # Добавляем описание задачи
-                task_label = QLabel(description)
-                task_label.setWordWrap(True)
-                task_label.setStyleSheet("font-size: 14px;")  # Увеличиваем размер шрифта
-                info_layout.addWidget(task_label, stretch=1)
-                
-                # Добавляем дедлайн, если он есть
-                if deadline:
-                    deadline_label = QLabel(f"Дедлайн: {deadline}")
-                    deadline_label.setStyleSheet("color: #FF5722; font-size: 14px;")
-                    info_layout.addWidget(deadline_label)
-                
-                task_layout.addWidget(info_widget)
-                
-                # Загружаем подзадачи
-                subtasks = db.load_subtasks(task_id)
-                if subtasks:
-                    subtasks_widget = QWidget()
-                    subtasks_layout = QVBoxLayout(subtasks_widget)
-                    subtasks_layout.setSpacing(5)  # Отступ между подзадачами
-                    subtasks_layout.setContentsMargins(20, 5, 0, 5)  # Отступы для подзадач
-                    
-                    for subtask_id, subtask_text, subtask_status in subtasks:
-                        # Создаем виджет для подзадачи
-                        subtask_widget = QWidget()
-                        subtask_layout = QHBoxLayout(subtask_widget)
-                        subtask_layout.setContentsMargins(0, 0, 0, 0)
-                        subtask_layout.setSpacing(10)  # Отступ между текстом и кнопкой
-                        
-                        # Добавляем текст подзадачи
-                        subtask_label = QLabel(f"• {subtask_text}")
-                        subtask_label.setStyleSheet("font-size: 13px;")  # Размер шрифта подзадач
-                        if subtask_status == 1:
-                            subtask_label.setStyleSheet("color: #4CAF50; text-decoration: line-through; font-size: 13px;")
-                        else:
-                            subtask_label.setStyleSheet("color: #757575; font-size: 13px;")
-                        subtask_layout.addWidget(subtask_label, stretch=1)
-                        
-                        # Добавляем кнопку для изменения статуса подзадачи
-                        subtask_status_btn = QPushButton()
-                        subtask_status_btn.setFixedSize(30, 30)  # Фиксированный размер кнопки
-                        if subtask_status == 0:
-                            subtask_status_btn.setIcon(qta.icon('fa5s.check', color='#4CAF50'))
-                            subtask_status_btn.setToolTip("Отметить как выполненное")
-                            subtask_status_btn.clicked.connect(
-                                lambda checked, sid=subtask_id: self.complete_subtask(sid))
-                        else:
-                            subtask_status_btn.setIcon(qta.icon('fa5s.undo', color='#FFC107'))
-                            subtask_status_btn.setToolTip("Отметить как невыполненное")
-                            subtask_status_btn.clicked.connect(
-                                lambda checked, sid=subtask_id: self.undo_subtask(sid))
-                        subtask_layout.addWidget(subtask_status_btn)
-                        
-                        subtasks_layout.addWidget(subtask_widget)
-                    
-                    task_layout.addWidget(subtasks_widget)
-                
-                # Добавляем кнопки управления
-                buttons_layout = self.add_task_buttons(task_widget, subtasks, status)
-                task_layout.addLayout(buttons_layout)
-                
-                # Создаем элемент списка
-                list_item = QListWidgetItem()
-                list_item.setData(Qt.UserRole, task_id)
-                
-                # Устанавливаем размер элемента списка
-                list_item.setSizeHint(task_widget.sizeHint())
-                
-                # Добавляем элемент в соответствующий список
-                if status == 0:
-                    self.incomplete_task_list.addItem(list_item)
-                    self.incomplete_task_list.setItemWidget(list_item, task_widget)
-                else:
-                    self.complete_task_list.addItem(list_item)
-                    self.complete_task_list.setItemWidget(list_item, task_widget)
-                    
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить задачи: {str(e)}")
-
-    def add_task_buttons(self, task_widget, subtasks, status):
-        """Добавляет кнопки управления для задачи."""
-        button_layout = QHBoxLayout()
-        button_layout.setSpacing(10)  # Увеличиваем отступ между кнопками
-
-        # Кнопка для добавления подзадачи
-        add_subtask_btn = QPushButton("Добавить подзадачу")
-        add_subtask_btn.setIcon(qta.icon('fa5s.plus', color='white'))
-        add_subtask_btn.setMinimumHeight(35)  # Увеличиваем высоту кнопки
-        add_subtask_btn.setStyleSheet("font-size: 13px;")  # Размер шрифта кнопки
-        add_subtask_btn.clicked.connect(lambda: self.add_subtask(task_widget))
-        button_layout.addWidget(add_subtask_btn)
-
-        # Кнопка для изменения статуса задачи
-        status_btn = QPushButton()
-        status_btn.setMinimumHeight(35)  # Увеличиваем высоту кнопки
-        status_btn.setStyleSheet("font-size: 13px;")  # Размер шрифта кнопки
-        if status == 0:
-            status_btn.setText("Выполнено")
-            status_btn.setIcon(qta.icon('fa5s.check', color='white'))
-            status_btn.clicked.connect(lambda: self.complete_task(task_widget))
+        """Загружает задачи из базы данных в кэш (один раз при запуске) и отображает их."""
+        self.store.load(
+            on_done=self.on_tasks_loaded,
+            on_error=lambda e: self.show_error("Не удалось загрузить задачи", e),
+        )
+
+    def show_profiling_dialog(self):
+        if self.profiling_dialog is None:
+            self.profiling_dialog = ProfilingDialog(self)
+        self.profiling_dialog.show()
+        self.profiling_dialog.raise_()
+
+    def show_error(self, message, error):
+        QMessageBox.critical(self, "Ошибка", f"{message}: {str(error)}")
+
+    def shutdown(self):
+        """Останавливает фоновые потоки, дождавшись завершения записи в базу."""
+        self.deadline_scheduler.stop()
+        self.search_timer.stop()
+        if self.search_task is not None:
+            self.search_task.cancel()
+        self.search_pool.waitForDone()
+        if self.transfer_task is not None:
+            self.transfer_task.cancel()
+        self.transfer_pool.waitForDone()
+        self.db_worker.shutdown()
+
+    @profiling.profiled
+    def on_tasks_loaded(self):
+        """Показывает первые страницы задач и начинает следить за дедлайнами."""
+        self.show_all_tasks()
+        # Дедлайны нужны для всех задач, а не только для загруженных страниц
+        self.store.pending_deadlines(
+            on_done=self.deadline_scheduler.reset,
+            on_error=lambda e: self.show_error("Не удалось загрузить дедлайны", e),
+        )
+        self.tasksLoaded.emit()
+
+    @profiling.profiled
+    def show_all_tasks(self):
+        """Показывает загруженные задачи из кэша без обращения к базе данных."""
+        self.incomplete_model.set_tasks(self.store.tasks(0), has_more=self.store.has_more(0))
+        self.complete_model.set_tasks(self.store.tasks(1), has_more=self.store.has_more(1))
+
+    def load_more(self, status):
+        """Загружает следующую страницу списка, прокрученного до конца."""
+        model = self.model_for_status(status)
+
+        def failed(error):
+            model.fetch_failed()
+            self.show_error("Не удалось загрузить задачи", error)
+
+        self.store.load_more(
+            status,
+            on_done=lambda tasks: model.append_tasks(tasks, self.store.has_more(status)),
+            on_error=failed,
+        )
+
+    @profiling.profiled
+    def show_tasks(self, tasks, ordered=True):
+        """Распределяет записи задач по спискам вкладок.
+
+        ordered=False - задачи упорядочены по релевантности поиска.
+        """
+        incomplete = []
+        complete = []
+        for task in tasks:
+            if task["status"] == 0:
+                incomplete.append(task)
+            else:
+                complete.append(task)
+
+        self.incomplete_model.set_tasks(incomplete, ordered)
+        self.complete_model.set_tasks(complete, ordered)
+
+    def on_task_action(self, task_id, action, subtask_id):
+        """Обрабатывает нажатие кнопки, нарисованной делегатом."""
+        if action == ACTION_ADD_SUBTASK:
+            self.add_subtask(task_id)
+        elif action == ACTION_COMPLETE:
+            self.complete_task(task_id)
+        elif action == ACTION_UNDO:
+            self.undo_task(task_id)
+        elif action == ACTION_DELETE:
+            self.delete_task(task_id)
+        elif action == ACTION_COMPLETE_SUBTASK:
+            self.complete_subtask(subtask_id)
+        elif action == ACTION_UNDO_SUBTASK:
+            self.undo_subtask(subtask_id)
+        elif action == ACTION_TOGGLE_SUBTASKS:
+            self.toggle_subtasks(task_id)
+        elif action == ACTION_STOP_RECURRENCE:
+            self.stop_recurrence(task_id)
+
+    def model_for_status(self, status):
+        """Возвращает модель списка, в котором отображаются задачи со статусом."""
+        return self.incomplete_model if status == 0 else self.complete_model
+
+    def remove_task_from_lists(self, task_id):
+        """Убирает задачу из списков и возвращает её запись или None."""
+        task = self.incomplete_model.remove_task(task_id)
+        if task is None:
+            task = self.complete_model.remove_task(task_id)
+        return task
+
+    @profiling.profiled
+    def apply_task_change(self, task):
+        """Обновляет в списках только одну измененную задачу."""
+        if task is None:
+            return
+        if task["status"] == 0:
+            self.deadline_scheduler.schedule(task["id"], task["deadline"])
         else:
-            status_btn.setText("Не выполнено")
-            status_btn.setIcon(qta.icon('fa5s.undo', color='white'))
-            status_btn.clicked.connect(lambda: self.undo_task(task_widget))
-        button_layout.addWidget(status_btn)
-
-        # Кнопка для удаления задачи
-        delete_btn = QPushButton("Удалить")
-        delete_btn.setIcon(qta.icon('fa5s.trash', color='white'))
-        delete_btn.setMinimumHeight(35)  # Увеличиваем высоту кнопки
-        delete_btn.setStyleSheet("font-size: 13px;")  # Размер шрифта кнопки
-        delete_btn.clicked.connect(lambda: self.delete_task(task_widget))
-        button_layout.addWidget(delete_btn)
-
-        return button_layout
-
-    def get_task_id_from_widget(self, task_widget):
-        """Получает ID задачи из виджета."""
-        # Находим элемент списка, содержащий этот виджет
-        for list_widget in [self.incomplete_task_list, self.complete_task_list]:
-            for i in range(list_widget.count()):
-                item = list_widget.item(i)
-                if list_widget.itemWidget(item) == task_widget:
-                    return item.data(Qt.UserRole)
-        return None
-
-    def add_subtask(self, task_widget):
+            self.deadline_scheduler.cancel(task["id"])
+
+        previous = self.remove_task_from_lists(task["id"])
+        if self.search_input.text():
+            if previous is None:
+                # Новая задача может не подходить под активный фильтр поиска
+                self.search_tasks()
+                return
+        elif not self.store.is_loaded(task):
+            # Задача старше загруженных страниц появится вместе со своей страницей
+            return
+        self.model_for_status(task["status"]).insert_task(task)
+
+    @profiling.profiled
+    def apply_task_deleted(self, task_id):
+        """Убирает из списков задачу, удаленную из базы данных."""
+        if task_id is not None:
+            self.deadline_scheduler.cancel(task_id)
+            self.remove_task_from_lists(task_id)
+
+    @profiling.profiled
+    def apply_subtask_change(self, task):
+        """Перерисовывает задачу, у которой изменились подзадачи."""
+        if task is None:
+            return
+        if not self.incomplete_model.refresh_task(task["id"]):
+            self.complete_model.refresh_task(task["id"])
+
+    @profiling.profiled
+    def apply_task_changes(self, tasks):
+        """Обновляет списки после массового изменения задач."""
+        if len(tasks) < BULK_REFRESH_THRESHOLD:
+            for task in tasks:
+                self.apply_task_change(task)
+            return
+        for task in tasks:
+            if task["status"] == 0:
+                self.deadline_scheduler.schedule(task["id"], task["deadline"])
+            else:
+                self.deadline_scheduler.cancel(task["id"])
+        self.refresh_lists()
+
+    @profiling.profiled
+    def apply_tasks_deleted(self, task_ids):
+        """Убирает из списков задачи, удаленные массовой операцией."""
+        for task_id in task_ids:
+            self.deadline_scheduler.cancel(task_id)
+        if len(task_ids) < BULK_REFRESH_THRESHOLD:
+            for task_id in task_ids:
+                self.remove_task_from_lists(task_id)
+        else:
+            self.refresh_lists()
+
+    def refresh_lists(self):
+        """Перестраивает списки из кэша с учетом активного поиска."""
+        if self.search_input.text().strip():
+            self.search_tasks()
+        else:
+            self.show_all_tasks()
+
+    def current_task_list(self):
+        """Возвращает список задач открытой вкладки."""
+        if self.tabs.currentWidget() is self.complete_tab:
+            return self.complete_task_list
+        return self.incomplete_task_list
+
+    def selected_task_ids(self):
+        """Возвращает ID задач, выбранных в списке открытой вкладки."""
+        selection = self.current_task_list().selectionModel()
+        return [index.data(Qt.UserRole) for index in selection.selectedRows()]
+
+    def on_tab_changed(self, index):
+        if self.tabs.widget(index) is self.complete_tab:
+            self.complete_selected_button.setText("Вернуть выбранные")
+        else:
+            self.complete_selected_button.setText("Выполнить выбранные")
+        self.update_icons()
+
+    @pyqtSlot()
+    @profiling.profiled
+    def toggle_selected_tasks(self):
+        """Выполняет выбранные активные задачи или возвращает выбранные выполненные."""
+        task_ids = self.selected_task_ids()
+        if not task_ids:
+            return
+        status = 0 if self.tabs.currentWidget() is self.complete_tab else 1
+        self.store.set_tasks_status(
+            task_ids, status,
+            on_done=self.apply_task_changes,
+            on_error=lambda e: self.show_error("Не удалось обновить статус задач", e),
+        )
+
+    def delete_selected_tasks(self):
+        """Удаляет выбранные задачи одной транзакцией."""
+        task_ids = self.selected_task_ids()
+        if not task_ids:
+            return
+        reply = QMessageBox.question(
+            self, 'Подтверждение',
+            f'Вы уверены, что хотите удалить выбранные задачи ({len(task_ids)})?',
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+
+        if reply == QMessageBox.Yes:
+            with profiling.span("ui.ToDoApp.delete_selected_tasks"):
+                self.store.delete_tasks(
+                    task_ids,
+                    on_done=self.apply_tasks_deleted,
+                    on_error=lambda e: self.show_error("Не удалось удалить задачи", e),
+                )
+
+    def add_subtask(self, task_id):
         """Добавляет подзадачу к выбранной задаче."""
         dialog = AddSubtaskDialog(self)
         if dialog.exec_() == QDialog.Accepted:
-            task_id = self.get_task_id_from_widget(task_widget)
-            if task_id is None:
-                QMessageBox.critical(self, "Ошибка", "Не удалось определить ID задачи")
-                return
-                
             subtask_text = dialog.subtask_input.text().strip()
             if subtask_text:
-                try:
-                    db.add_subtask(task_id, subtask_text)
-                    self.load_tasks()  # Перезагружаем список задач
-                except Exception as e:
-                    QMessageBox.critical(self, "Ошибка", f"Не удалось добавить подзадачу: {str(e)}")
-
-    def complete_task(self, task_widget):
+                with profiling.span("ui.ToDoApp.add_subtask"):
+                    self.store.add_subtask(
+                        task_id, subtask_text,
+                        on_done=self.apply_subtask_change,
+                        on_error=lambda e: self.show_error("Не удалось добавить подзадачу", e),
+                    )
+
+    @profiling.profiled
+    def complete_task(self, task_id):
         """Отмечает задачу как выполненную."""
-        task_id = self.get_task_id_from_widget(task_widget)
-        if task_id is None:
-            QMessageBox.critical(self, "Ошибка", "Не удалось определить ID задачи")
-            return
-            
-        try:
-            db.update_task_status(task_id, 1)
-        self.load_tasks()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить статус задачи: {str(e)}")
+        self.store.set_task_status(
+            task_id, 1,
+            on_done=self.apply_task_change,
+            on_error=lambda e: self.show_error("Не удалось обновить статус задачи", e),
+        )
+
+    def stop_recurrence(self, task_id):
+        """Снимает правило повторения: задача становится однократной с
+        текущим дедлайном."""
+        reply = QMessageBox.question(
+            self,
+            "Подтверждение",
+            "Перестать повторять задачу? Текущий дедлайн сохранится.",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            self.store.set_task_recurrence(
+                task_id, None,
+                on_done=self.apply_task_change,
+                on_error=lambda e: self.show_error("Не удалось изменить повторение задачи", e),
+            )
 
-    def undo_task(self, task_widget):
+    @profiling.profiled
+    def undo_task(self, task_id):
         """Отмечает задачу как невыполненную."""
-        task_id = self.get_task_id_from_widget(task_widget)
-        if task_id is None:
-            QMessageBox.critical(self, "Ошибка", "Не удалось определить ID задачи")
-            return
-            
-        try:
-            db.update_task_status(task_id, 0)
-        self.load_tasks()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить статус задачи: {str(e)}")
+        self.store.set_task_status(
+            task_id, 0,
+            on_done=self.apply_task_change,
+            on_error=lambda e: self.show_error("Не удалось обновить статус задачи", e),
+        )
 
-    def delete_task(self, task_widget):
+    def delete_task(self, task_id):
         """Удаляет задачу."""
-        task_id = self.get_task_id_from_widget(task_widget)
-        if task_id is None:
-            QMessageBox.critical(self, "Ошибка", "Не удалось определить ID задачи")
-            return
-            
         reply = QMessageBox.question(
             self, 'Подтверждение',
             'Вы уверены, что хотите удалить эту задачу?',
@@ -500,80 +814,198 @@ class ToDoApp(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            try:
-                db.delete_task(task_id)
-                self.load_tasks()
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить задачу: {str(e)}")
-
-    def check_deadlines(self):
-        """Проверка просроченных задач."""
-        overdue_tasks = db.check_overdue_tasks(
-            QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
-        )
+            # Замеряется только запись: ожидание подтверждения не учитывается
+            with profiling.span("ui.ToDoApp.delete_task"):
+                self.store.delete_task(
+                    task_id,
+                    on_done=self.apply_task_deleted,
+                    on_error=lambda e: self.show_error("Не удалось удалить задачу", e),
+                )
+
+    @profiling.profiled
+    def on_tasks_due(self, task_ids):
+        """Сообщает о задачах, дедлайн которых только что наступил."""
+        # Задачи с незагруженных страниц сначала догружаются из базы
+        missing = [task_id for task_id in task_ids if self.store.task(task_id) is None]
+        if missing:
+            self.store.fetch_tasks(
+                missing,
+                on_done=lambda tasks: self.warn_overdue(task_ids),
+                on_error=lambda e: self.show_error("Не удалось загрузить задачи", e),
+            )
+        else:
+            self.warn_overdue(task_ids)
+
+    def warn_overdue(self, task_ids):
+        overdue_tasks = [
+            task for task in map(self.store.task, task_ids)
+            if task is not None and task["status"] == 0
+        ]
+        # Просроченные задачи выделяются цветом
+        self.incomplete_task_list.viewport().update()
         if overdue_tasks:
             QMessageBox.warning(
                 self,
                 "Просроченные задачи",
-                f"Обнаружены просроченные задачи: {', '.join([task[0] for task in overdue_tasks])}",
+                f"Обнаружены просроченные задачи: {', '.join([task['description'] for task in overdue_tasks])}",
             )
 
+    @pyqtSlot()
+    @profiling.profiled
     def add_task(self):
         """Добавляет новую задачу в базу данных и обновляет список."""
         task_text = self.task_input.text().strip()
-        deadline = self.deadline_input.dateTime().toString("yyyy-MM-dd HH:mm:ss")
+        deadline = self.deadline_input.dateTime().toSecsSinceEpoch()
+        rule = self.recurrence_input.currentData()
         if task_text:
-            db.add_task(task_text, deadline)
-            self.load_tasks()
+            self.store.add_task(
+                task_text, deadline, rule,
+                on_done=self.apply_task_change,
+                on_error=lambda e: self.show_error("Не удалось добавить задачу", e),
+            )
             self.task_input.clear()
             self.deadline_input.setDateTime(QDateTime.currentDateTime())
+            self.recurrence_input.setCurrentIndex(0)
         else:
             QMessageBox.warning(self, "Ошибка", "Задача не может быть пустой")
 
+    @profiling.profiled
     def search_tasks(self):
-        """Фильтрует задачи по тексту поиска."""
-        search_term = self.search_input.text().lower()
-        self.incomplete_task_list.clear()
-        self.complete_task_list.clear()
-
-        tasks = db.search_tasks(search_term)
-        for row in tasks:
-            task_id, description, status, deadline = row
-            deadline_display = QDateTime.fromString(deadline, "yyyy-MM-dd HH:mm:ss")
-            deadline_text = (
-                deadline_display.toString("dd.MM.yyyy HH:mm")
-                if deadline
-                else "Без дедлайна"
-            )
-
-            task_item = QListWidgetItem(f"{description} (Дедлайн: {deadline_text})")
-            task_item.setData(Qt.UserRole, task_id)
+        """Запускает поиск в базе данных в фоновом потоке, отменяя предыдущий.
+
+        Поиск всегда выполняется в базе: подзадачи большинства задач в
+        памяти не хранятся.
+        """
+        if self.search_task is not None:
+            self.search_task.cancel()
+            self.search_task = None
+        self.search_generation += 1
+
+        search_term = self.search_input.text().strip()
+        if not search_term:
+            self.show_all_tasks()
+            return
 
-            # Загружаем подзадачи для каждой задачи
-            sub_task_list = db.load_subtasks(task_id)
+        task = SearchTask(self.search_generation, search_term)
+        task.signals.finished.connect(self.on_search_finished)
+        task.signals.failed.connect(self.on_search_failed)
+        self.search_task = task
+        self.search_pool.start(task)
 
-            # Выделяем просроченные задачи красным цветом
-            if (
-                deadline
-                and QDateTime.currentDateTime() > deadline_display
-                and status == 0
-            ):
-                task_item.setForeground(QColor("red"))
+    @profiling.profiled
+    def on_search_finished(self, generation, search_term, rows):
+        """Кэширует и показывает результаты поиска, если они еще актуальны."""
+        if generation != self.search_generation:
+            return
+        self.search_task = None
+        self.show_tasks(self.store.apply_rows(rows), ordered=False)
 
-            self.add_task_buttons(task_item, sub_task_list, status)
+    def on_search_failed(self, generation, message):
+        if generation != self.search_generation:
+            return
+        self.search_task = None
+        QMessageBox.critical(self, "Ошибка", f"Не удалось выполнить поиск: {message}")
+
+    @profiling.profiled
+    def toggle_subtasks(self, task_id):
+        """Раскрывает или сворачивает подзадачи задачи."""
+        task = self.store.task(task_id)
+        if task is None:
+            return
+        if task["expanded"]:
+            self.store.collapse(task_id)
+        else:
+            self.store.expand(
+                task_id,
+                on_done=self.apply_subtask_change,
+                on_error=lambda e: self.show_error("Не удалось загрузить подзадачи", e),
+            )
+        # Строка меняет высоту сразу: до загрузки подзадач в ней "Загрузка..."
+        self.apply_subtask_change(task)
 
+    @profiling.profiled
     def complete_subtask(self, subtask_id):
         """Отмечает подзадачу как выполненную."""
-        try:
-            db.update_subtask_status(subtask_id, 1)
-            self.load_tasks()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить статус подзадачи: {str(e)}")
+        self.store.set_subtask_status(
+            subtask_id, 1,
+            on_done=self.apply_subtask_change,
+            on_error=lambda e: self.show_error("Не удалось обновить статус подзадачи", e),
+        )
 
+    @profiling.profiled
     def undo_subtask(self, subtask_id):
         """Отмечает подзадачу как невыполненную."""
+        self.store.set_subtask_status(
+            subtask_id, 0,
+            on_done=self.apply_subtask_change,
+            on_error=lambda e: self.show_error("Не удалось обновить статус подзадачи", e),
+        )
+
+    @pyqtSlot()
+    def import_tasks(self):
+        """Импортирует задачи из файла JSON Lines или CSV."""
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт задач", "", TRANSFER_FILTER)
+        if path:
+            self.start_transfer(transfer.import_file, path, "Импорт")
+
+    @pyqtSlot()
+    def export_tasks(self):
+        """Экспортирует все задачи в файл JSON Lines или CSV."""
+        path, selected = QFileDialog.getSaveFileName(self, "Экспорт задач", "tasks.ndjson", TRANSFER_FILTER)
+        if path and not os.path.splitext(path)[1]:
+            # Расширение не указано - берем его из выбранного фильтра
+            path += ".csv" if selected.startswith("CSV") else ".ndjson"
+        if path:
+            self.start_transfer(transfer.export_file, path, "Экспорт")
+
+    def start_transfer(self, action, path, title):
+        """Запускает импорт или экспорт в фоновом потоке и показывает прогресс."""
         try:
-            db.update_subtask_status(subtask_id, 0)
+            transfer.detect_format(path)
+        except ValueError as e:
+            self.show_error(f"{title} невозможен", e)
+            return
+        task = self.transfer_task = TransferTask(action, path)
+        task.signals.progress.connect(self.on_transfer_progress)
+        task.signals.finished.connect(lambda count: self.on_transfer_finished(task, title, count))
+        task.signals.failed.connect(lambda message: self.on_transfer_failed(task, title, message))
+        task.signals.cancelled.connect(lambda: self.end_transfer(task))
+        self.import_button.setEnabled(False)
+        self.export_button.setEnabled(False)
+        self.transfer_progress.setRange(0, 0)
+        self.transfer_progress.show()
+        self.transfer_pool.start(task)
+
+    def on_transfer_progress(self, done, total):
+        if total:
+            # Размер файла может не поместиться в int диапазона QProgressBar
+            self.transfer_progress.setRange(0, 1000)
+            self.transfer_progress.setValue(int(done * 1000 / total))
+        else:
+            self.transfer_progress.setRange(0, 0)
+
+    def end_transfer(self, task):
+        """Возвращает кнопки импорта и экспорта после завершения операции."""
+        if task is not self.transfer_task:
+            return False
+        self.transfer_task = None
+        self.transfer_progress.hide()
+        self.import_button.setEnabled(True)
+        self.export_button.setEnabled(True)
+        return True
+
+    def on_transfer_finished(self, task, title, count):
+        if not self.end_transfer(task):
+            return
+        QMessageBox.information(self, title, f"{title} завершен, задач: {count}")
+        if task.action is transfer.import_file:
+            # Импортированные задачи попадают в списки и поиск после перезагрузки кэша
+            self.load_tasks()
+
+    def on_transfer_failed(self, task, title, message):
+        if not self.end_transfer(task):
+            return
+        self.show_error(f"{title} не выполнен", message)
+        if task.action is transfer.import_file:
+            # Порции, добавленные до ошибки, остаются в базе
             self.load_tasks()
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось обновить статус подзадачи: {str(e)}")
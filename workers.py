@@ -0,0 +1,190 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, pyqtSignal, pyqtSlot
+
+import db
+import profiling
+
+
+class SearchSignals(QObject):
+    """Сигналы задачи поиска. Объект живет в потоке GUI, поэтому
+    подключенные к нему слоты вызываются в потоке GUI."""
+
+    # номер запроса, строка поиска, список найденных строк задач
+    finished = pyqtSignal(int, str, object)
+    # номер запроса, текст ошибки
+    failed = pyqtSignal(int, str)
+
+
+class SearchTask(QRunnable):
+    """Выполняет поиск в базе данных (FTS5) в пуле потоков.
+
+    finished передает строки задач из db.search_tasks; их нужно закэшировать
+    через TaskStore.apply_rows в потоке GUI. Устаревший поиск можно
+    отменить: запрос к базе прервется.
+    """
+
+    def __init__(self, generation, search_term):
+        super().__init__()
+        self.generation = generation
+        self.search_term = search_term
+        self.signals = SearchSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    @profiling.profiled
+    def run(self):
+        if self.is_cancelled():
+            return
+        try:
+            rows = db.search_tasks(self.search_term, is_cancelled=self.is_cancelled)
+        except db.QueryCancelled:
+            return
+        except Exception as e:
+            if not self.is_cancelled():
+                self.signals.failed.emit(self.generation, str(e))
+            return
+        if not self.is_cancelled():
+            self.signals.finished.emit(self.generation, self.search_term, rows)
+
+
+class TransferSignals(QObject):
+    """Сигналы импорта и экспорта; слоты вызываются в потоке GUI."""
+
+    # выполнено, всего (всего может быть None)
+    progress = pyqtSignal(object, object)
+    # число импортированных или экспортированных задач
+    finished = pyqtSignal(int)
+    # текст ошибки
+    failed = pyqtSignal(str)
+    # операция отменена
+    cancelled = pyqtSignal()
+
+
+class TransferTask(QRunnable):
+    """Выполняет импорт или экспорт файла (transfer.py) в пуле потоков.
+
+    action - transfer.import_file или transfer.export_file. Отмена
+    проверяется между порциями задач.
+    """
+
+    def __init__(self, action, path):
+        super().__init__()
+        self.action = action
+        self.path = path
+        self.signals = TransferSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    @profiling.profiled
+    def run(self):
+        try:
+            count = self.action(self.path, progress=self.signals.progress.emit,
+                                is_cancelled=self.is_cancelled)
+        except db.QueryCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(count)
+
+
+class DbRequest(QObject):
+    """Запрос к базе данных, поставленный в очередь DbWorker.
+
+    Объект создается в потоке GUI, поэтому подключенные к нему обработчики
+    вызываются в потоке GUI, даже если сигнал испущен потоком базы данных.
+    """
+
+    # результат функции db
+    finished = pyqtSignal(object)
+    # исключение, выброшенное функцией db
+    failed = pyqtSignal(object)
+
+    def __init__(self, func, args, kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        # Действие интерфейса, которому засчитываются запросы (см. profiling)
+        self.action = profiling.current_action()
+
+
+class _RequestRegistry(QObject):
+    """Хранит ссылки на невыполненные запросы в потоке GUI."""
+
+    def __init__(self):
+        super().__init__()
+        self._requests = set()
+
+    def add(self, request):
+        self._requests.add(request)
+        request.finished.connect(self._release)
+        request.failed.connect(self._release)
+
+    @pyqtSlot(object)
+    def _release(self, _):
+        self._requests.discard(self.sender())
+
+
+class DbWorker(QObject):
+    """Поток, который владеет соединением с базой данных и выполняет
+    запросы строго по очереди, чтобы поток GUI никогда не ждал SQLite."""
+
+    _submitted = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self._registry = _RequestRegistry()
+        self._thread = QThread()
+        self._thread.setObjectName("db-worker")
+        self.moveToThread(self._thread)
+        # Сигнал испускается в потоке GUI, а слот выполняется в потоке базы данных
+        self._submitted.connect(self._execute)
+        self._thread.start()
+
+    def submit(self, func, *args, on_done=None, on_error=None, **kwargs):
+        """Ставит вызов func(*args, **kwargs) в очередь и возвращает DbRequest.
+
+        on_done(результат) и on_error(исключение) вызываются в потоке GUI.
+        """
+        request = DbRequest(func, args, kwargs)
+        if on_done is not None:
+            request.finished.connect(on_done)
+        if on_error is not None:
+            request.failed.connect(on_error)
+        # Держим ссылку на запрос, пока он не выполнится
+        self._registry.add(request)
+        self._submitted.emit(request)
+        return request
+
+    @pyqtSlot(object)
+    def _execute(self, request):
+        if request is None:
+            # Все ранее поставленные запросы выполнены - можно завершаться
+            self._thread.quit()
+            return
+        try:
+            with profiling.attributed(request.action):
+                result = request.func(*request.args, **request.kwargs)
+        except Exception as e:
+            request.failed.emit(e)
+        else:
+            request.finished.emit(result)
+
+    def shutdown(self):
+        """Дожидается выполнения поставленных запросов и останавливает поток."""
+        if self._thread.isRunning():
+            self._submitted.emit(None)
+            self._thread.wait()